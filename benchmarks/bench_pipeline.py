@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Benchmark de todas las etapas del pipeline, desde la creación de la BD hasta la decisión.
+
+Cargas de trabajo fijas (semilla constante) sobre catálogos sintéticos de varios tamaños
+(src/database/generate_catalog.py):
+- create_db.create_db, load_data.load_and_insert_data (modos full, bulk y sync sin cambios desde
+  Excel; bulk desde un directorio CSV)
+- grafo.build_MDO_graph (desde SQLite y desde el snapshot binario)
+- grafo.get_infected_nodes sobre un grafo poco profundo (con hubs) y otro profundo (cadenas), y
+  grafo.get_infected_nodes_sql (calculado en SQLite) sobre las mismas BD
+Y, sin depender del tamaño del catálogo:
+- consultas de la red bayesiana (C_res, I_res, A_res), calculate_numeric_impact y los tres
+  diagramas de influencia (create_and_solve_dimension)
+
+De cada etapa se registra el mejor tiempo de pared de `--repeat` ejecuciones y el pico de memoria
+(tracemalloc) de una ejecución adicional. El informe se escribe en JSON.
+
+Falla (exit code 1) si alguna etapa supera su umbral en benchmarks/pipeline_thresholds.json
+(claves "etapa" o "etapa@tamaño", en segundos).
+
+Uso (desde la raíz del repositorio):
+  python benchmarks/bench_pipeline.py
+  python benchmarks/bench_pipeline.py --sizes 1000,10000 --out report.json
+  python benchmarks/bench_pipeline.py --write-thresholds 3   # regenera los umbrales (3x lo medido)
+"""
+
+#===============================================[IMPORTS]===============================================
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from src.database.generate_catalog import CatalogSpec, asset_ids, generate_catalog  # noqa: E402
+
+#===============================================[CONSTANTS]===============================================
+DEFAULT_SIZES = "1000,10000,100000"
+DEFAULT_THRESHOLDS = Path(__file__).resolve().parent / "pipeline_thresholds.json"
+SEED = 0
+# Concentración de dependencias en hubs del grafo poco profundo
+SHALLOW_FAN_IN_SKEW = 4.0
+# Vecindad de proveedores del grafo profundo
+DEEP_LOCALITY = 4
+# Umbral mínimo (s) al regenerar umbrales: evita falsos positivos en etapas de microsegundos
+MIN_THRESHOLD = 0.05
+DIMENSIONS = (("C", "C_res", "CONFIDENTIALITY"), ("I", "I_res", "INTEGRITY"), ("A", "A_res", "AVAILABILITY"))
+
+#===============================================[WORKLOADS]===============================================
+def workload_specs(n_assets: int) -> dict:
+    """
+    Catálogos sintéticos de la carga de trabajo (ver src/database/generate_catalog.py):
+    - "shallow": dependencias concentradas en pocos activos hub; comprometer el primer activo
+      alcanza a muchos activos en pocos saltos.
+    - "deep": cada activo depende de 2 de los 4 anteriores de su dominio; la propagación desde
+      el primer activo recorre cadenas de profundidad del orden de n / 15.
+    """
+    return dict(
+        shallow=CatalogSpec(n_assets, fan_in_skew=SHALLOW_FAN_IN_SKEW, seed=SEED),
+        deep=CatalogSpec(n_assets, fan_out=2, fan_out_dist="fixed", locality=DEEP_LOCALITY,
+                         inter_domain_ratio=0.0, fan_in_skew=1.0, seed=SEED),
+    )
+
+#===============================================[MEASUREMENT]===============================================
+def measure(func, repeat: int, memory: bool, setup=None) -> dict:
+    """
+    Mejor tiempo de pared de `repeat` ejecuciones de func() y pico de memoria (MB) de una más.
+    `setup` se ejecuta antes de cada ejecución, fuera de la medida.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+    result = dict(seconds=min(timings), runs=repeat)
+    if memory:
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def catalog_stages(n_assets: int, workdir: Path, repeat: int, memory: bool) -> dict:
+    """
+    Etapas que dependen del tamaño del catálogo.
+    """
+    import src.database.create_db as create_db
+    import src.database.load_data as load_data
+    import src.graph.grafo as grafo
+
+    db_path = workdir / f"catalog_{n_assets}.db"
+    excel_path = workdir / f"catalog_{n_assets}.xlsx"
+    csv_dir = workdir / f"catalog_{n_assets}_csv"
+    deep_db = workdir / f"deep_{n_assets}.db"
+
+    specs = workload_specs(n_assets)
+    generate_catalog(excel_path, specs["shallow"])
+    generate_catalog(csv_dir, specs["shallow"])
+    generate_catalog(deep_db, specs["deep"])
+    source = asset_ids(0, 1, n_assets)[0]
+
+    def recreate():
+        create_db.create_db(db_path, recreate=True)
+
+    stages = {}
+    stages["create_db"] = measure(recreate, repeat, memory)
+    stages["load_full"] = measure(
+        lambda: load_data.load_and_insert_data(excel_path, db_path, mode="full"), repeat, memory, setup=recreate,
+    )
+    stages["load_bulk"] = measure(
+        lambda: load_data.load_and_insert_data(excel_path, db_path, mode="bulk"), repeat, memory, setup=recreate,
+    )
+    stages["load_bulk_csv"] = measure(
+        lambda: load_data.load_and_insert_data(csv_dir, db_path, mode="bulk"), repeat, memory, setup=recreate,
+    )
+    stages["load_sync_noop"] = measure(lambda: load_data.load_and_insert_data(excel_path, db_path), repeat, memory)
+    stages["build_graph_sqlite"] = measure(lambda: grafo.build_MDO_graph(str(db_path)), repeat, memory)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        grafo.build_MDO_graph(str(db_path), use_snapshot=True)  # crea el snapshot fuera de la medida
+    stages["build_graph_snapshot"] = measure(
+        lambda: grafo.build_MDO_graph(str(db_path), use_snapshot=True), repeat, memory,
+    )
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        shallow_graph = grafo.build_MDO_graph(str(db_path))
+        deep_graph = grafo.build_MDO_graph(str(deep_db))
+    for name, graph in (("infected_shallow", shallow_graph), ("infected_deep", deep_graph)):
+        levels = grafo.get_infected_nodes(graph, source)
+        stages[name] = measure(lambda: grafo.get_infected_nodes(graph, source), repeat, memory)
+        stages[name].update(depth=max(levels), affected=sum(len(nodes) for nodes in levels.values()))
+    for name, path in (("infected_sql_shallow", db_path), ("infected_sql_deep", deep_db)):
+        stages[name] = measure(lambda: grafo.get_infected_nodes_sql(str(path), source), repeat, memory)
+    return stages
+
+
+def decision_stages(repeat: int, memory: bool) -> dict:
+    """
+    Etapas de decisión: no dependen del tamaño del catálogo.
+    """
+    import src.risk.red_bayes as red_bayes
+    import src.risk.influence_diagram as influence_diagram
+    import src.risk.id_test as id_test
+
+    confidence = 0.7
+
+    def bn_cold():
+        red_bayes.get_inference_engine().invalidate()
+        bn_queries()
+
+    def bn_queries():
+        engine = red_bayes.get_inference_engine()
+        for _, node_name, _ in DIMENSIONS:
+            engine.query(variables=[node_name], evidence={"CM": "firewall"}, threat_confidence=confidence)
+
+    def id_solves():
+        for dimension_name, node_name, display_name in DIMENSIONS:
+            id_test.create_and_solve_dimension(dimension_name, node_name, display_name, confidence)
+
+    red_bayes.get_inference_engine()  # importa pgmpy fuera de la medida
+    stages = {}
+    stages["bn_queries_cold"] = measure(bn_cold, repeat, memory)
+    stages["bn_queries_cached"] = measure(bn_queries, repeat, memory)
+    stages["numeric_impact"] = measure(
+        lambda: influence_diagram.calculate_numeric_impact(confidence=confidence), repeat, memory,
+    )
+    stages["id_solves"] = measure(id_solves, repeat, memory)
+    return stages
+
+#===============================================[THRESHOLDS]===============================================
+def check_thresholds(report: dict, thresholds: dict) -> list:
+    """
+    Compara cada etapa con su umbral ("etapa@tamaño" o "etapa"); retorna las regresiones.
+    """
+    failures = []
+    for key, stage in flatten(report).items():
+        limit = thresholds.get(key, thresholds.get(key.split("@")[0]))
+        if limit is not None and stage["seconds"] > limit:
+            failures.append(f"{key} tarda {stage['seconds']:.3f}s (umbral {limit:.3f}s)")
+    return failures
+
+
+def flatten(report: dict) -> dict:
+    stages = {f"{name}@{size}": stage for size, by_stage in report["catalog"].items() for name, stage in by_stage.items()}
+    stages.update(report["decision"])
+    return stages
+
+#===============================================[MAIN]===============================================
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del pipeline, de create_db a la decisión.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Tamaños de catálogo (activos), separados por comas")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por etapa (se usa el mejor tiempo)")
+    parser.add_argument("--no-memory", action="store_true", help="No mide el pico de memoria (tracemalloc)")
+    parser.add_argument("--out", default=None, help="Fichero JSON del informe (por defecto, salida estándar)")
+    parser.add_argument("--thresholds", default=str(DEFAULT_THRESHOLDS), help="JSON de umbrales (segundos)")
+    parser.add_argument("--write-thresholds", type=float, default=None, metavar="FACTOR",
+                        help="Escribe en --thresholds los tiempos medidos multiplicados por FACTOR")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    memory = not args.no_memory
+    report = dict(
+        python=platform.python_version(), machine=platform.machine(), repeat=args.repeat,
+        catalog={}, decision={},
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_assets in sizes:
+            start = time.perf_counter()
+            report["catalog"][str(n_assets)] = catalog_stages(n_assets, Path(tmp), args.repeat, memory)
+            print(f"Catálogo de {n_assets} activos medido en {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    report["decision"] = decision_stages(args.repeat, memory)
+
+    for key, stage in flatten(report).items():
+        peak = f"  pico {stage['peak_mb']:8.1f} MB" if "peak_mb" in stage else ""
+        print(f"{key:32s} {stage['seconds']:9.4f}s{peak}", file=sys.stderr)
+
+    if args.write_thresholds is not None:
+        thresholds = {
+            key: round(max(stage["seconds"] * args.write_thresholds, MIN_THRESHOLD), 4)
+            for key, stage in flatten(report).items()
+        }
+        Path(args.thresholds).write_text(json.dumps(thresholds, indent=2) + "\n", encoding="utf-8")
+        print(f"Umbrales escritos en {args.thresholds}", file=sys.stderr)
+
+    thresholds_path = Path(args.thresholds)
+    thresholds = json.loads(thresholds_path.read_text(encoding="utf-8")) if thresholds_path.exists() else {}
+    failures = check_thresholds(report, thresholds)
+    report["failures"] = failures
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if failures:
+        print("FAIL: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+    print("OK", file=sys.stderr)
+
+#===============================================[ENTRY_POINT]===============================================
+if __name__ == "__main__":
+    main()
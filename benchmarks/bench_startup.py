@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque en frío del motor (src/cyberrecom/main.py).
+
+Mide, lanzando procesos nuevos de Python:
+- "--help": no debe importar pandas, networkx, pgmpy, pyagrum ni mitreattack.
+- una recomendación completa sin datos MITRE y sin recargar el catálogo (--skip-load).
+
+Falla (exit code 1) si la mediana supera los umbrales indicados.
+
+Uso (desde la raíz del repositorio):
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --runs 5 --help-threshold 0.5 --recommend-threshold 8
+"""
+
+#===============================================[IMPORTS]===============================================
+import argparse
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+#===============================================[CONSTANTS]===============================================
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DB_PATH = REPO_ROOT / "src" / "database" / "tfg_catalog_v1.0.0.db"
+HEAVY_MODULES = ("pandas", "networkx", "pgmpy", "pyagrum", "mitreattack")
+
+#===============================================[FUNCTIONS]===============================================
+def time_command(cmd: list[str], runs: int) -> float:
+    """
+    Ejecuta el comando `runs` veces y retorna la mediana del tiempo de pared (segundos).
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def heavy_modules_on_import() -> list[str]:
+    """
+    Retorna las librerías pesadas que se cargan al importar el módulo principal.
+    """
+    probe = (
+        "import sys, src.cyberrecom.main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], cwd=REPO_ROOT, check=True, capture_output=True, text=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+#===============================================[MAIN]===============================================
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío del motor.")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones por medida (se usa la mediana)")
+    parser.add_argument("--help-threshold", type=float, default=0.5, help="Máximo (s) para main --help")
+    parser.add_argument("--recommend-threshold", type=float, default=8.0, help="Máximo (s) para una recomendación")
+    parser.add_argument("--asset", default="asset_001", help="Activo atacado en la recomendación")
+    args = parser.parse_args()
+
+    failures = []
+
+    heavy = heavy_modules_on_import()
+    print(f"Librerías pesadas cargadas al importar main: {heavy or 'ninguna'}")
+    if heavy:
+        failures.append(f"importar main carga {heavy}")
+
+    t_help = time_command([sys.executable, "-m", "src.cyberrecom.main", "--help"], args.runs)
+    print(f"main --help: {t_help:.3f}s (umbral {args.help_threshold:.3f}s)")
+    if t_help > args.help_threshold:
+        failures.append(f"--help tarda {t_help:.3f}s")
+
+    # Copia de la BD para no modificar el catálogo versionado
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = Path(tmp) / DB_PATH.name
+        shutil.copy(DB_PATH, db_copy)
+        cmd = [sys.executable, "-m", "src.cyberrecom.main", "--db", str(db_copy), "--skip-load", "--asset", args.asset]
+        t_rec = time_command(cmd, args.runs)
+    print(f"Recomendación sin MITRE (--skip-load): {t_rec:.3f}s (umbral {args.recommend_threshold:.3f}s)")
+    if t_rec > args.recommend_threshold:
+        failures.append(f"la recomendación tarda {t_rec:.3f}s")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+#===============================================[ENTRY_POINT]===============================================
+if __name__ == "__main__":
+    main()
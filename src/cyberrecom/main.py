@@ -1,25 +1,95 @@
 #=============================[IMPORTS]===========================================#
+# Los módulos del motor (pandas, networkx, pgmpy, pyagrum...) se importan dentro de main()
+# para que "--help" y las consultas triviales no paguen el coste de arranque completo.
+import argparse
+import contextlib
+import logging
 import random
-import networkx as nx
+import sys
+from collections import Counter
 from pathlib import Path
 
-import src.database.load_data as load_data
-import src.cyberrecom.mitre as mitre
-import src.graph.grafo as grafo
-import src.database.create_db as create_db
+from src.instrumentation import metrics
 
-
-
-import src.risk.red_bayes as red_bayes
-import src.risk.id_test as id_test
+logger = logging.getLogger(__name__)
 
 #=============================[CONSTANTS]===========================================#
+# Niveles del radio de impacto y recomendaciones con más activos se resumen en la salida (la lista va al log)
+MAX_LISTED_NODES = 20
 DB_PATH = Path(__file__).parent.parent / "database" / "tfg_catalog_v1.0.0.db"
 EXCEL_PATH = Path(__file__).parent.parent.parent / "data" / "asset_catalog_validado_v1.0.0_ajustado.xlsx"
 
+#==============================[ARGUMENTS]===========================================#
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Argumentos de línea de comandos del motor.
+    """
+    parser = argparse.ArgumentParser(description="Motor de recomendación de contramedidas en entornos MDO.")
+    parser.add_argument("--db", default=str(DB_PATH), help=f"Ruta del fichero .db (por defecto: {DB_PATH})")
+    parser.add_argument("--catalog", default=str(EXCEL_PATH),
+                        help="Catálogo: Excel, o directorio con assets y dependencies en CSV, Parquet o JSONL")
+    parser.add_argument("--skip-load", action="store_true", help="No recarga el catálogo: usa la BD existente")
+    parser.add_argument("--load-mode", choices=["sync", "full", "bulk"], default="sync",
+                        help="sync: aplica solo los cambios del catálogo; full: borra y reinserta todo; "
+                             "bulk: como full, con carga masiva para catálogos grandes")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="Construye el grafo desde SQLite en lugar de usar el snapshot binario del catálogo")
+    parser.add_argument("--asset", default=None, help="Activo atacado (por defecto: uno aleatorio)")
+    parser.add_argument("--stream", default=None, metavar="SOURCE",
+                        help='Modo streaming: alertas JSONL desde un fichero, "-" (stdin) o "unix:/ruta"')
+    parser.add_argument("--stream-out", default="-", help='Salida JSONL del modo streaming ("-" = stdout)')
+    parser.add_argument("--queue-size", type=int, default=64, help="Tamaño de las colas del modo streaming")
+    parser.add_argument("--tactic", default=None,
+                        help="Modo streaming: táctica por defecto de las alertas sin 'tactic' cuya técnica no tiene táctica conocida")
+    parser.add_argument("--coalesce-window", type=float, default=0.0,
+                        help="Modo streaming: segundos durante los que se fusionan alertas repetidas (0 = desactivado)")
+    parser.add_argument("--log-level", choices=metrics.LOG_LEVELS, default=metrics.DEFAULT_LOG_LEVEL,
+                        help="Nivel de los logs del motor (a stderr)")
+    parser.add_argument("--log-format", choices=metrics.LOG_FORMATS, default="text",
+                        help="Formato de los logs: texto o una línea JSON por registro")
+    parser.add_argument("--metrics-out", default=None, metavar="PATH",
+                        help="Exporta tiempos por PASO y contadores: JSON (.json) o Prometheus text-file (.prom)")
+    return parser.parse_args(argv)
+
+#==============================[CATALOG]===========================================#
+def prepare_catalog(args: argparse.Namespace, db_path: Path, catalog_path: Path) -> None:
+    """
+    PASOS 1 y 2: crea (o migra) la base de datos y carga el catálogo (Excel o directorio columnar).
+    """
+    import src.database.create_db as create_db
+
+    # ============ PASO 1: Crear base de datos ============
+    print("\n" + "="*80)
+    print("PASO 1: CREANDO ESTRUCTURA DE BASE DE DATOS")
+    print("="*80)
+    with metrics.stage("paso_1_create_db"):
+        if db_path.exists():
+            # El esquema es idempotente (IF NOT EXISTS): se aplican los índices/tablas nuevos
+            create_db.create_db(db_path, recreate=False)
+            print(f"Base de datos ya existe: {db_path}.")
+        else:
+            create_db.create_db(db_path, recreate=True)
+            print(f"Base de datos creada: {db_path}\n")
+    
+    
+    # ============ PASO 2: Cargar catálogo ============
+    print("\n" + "="*80)
+    print("PASO 2: CARGAR CATÁLOGO (EXCEL, CSV, PARQUET O JSONL)")
+    print("="*80)
+    
+    
+    if args.skip_load:
+        print(f"Carga omitida (--skip-load): se usa el catálogo existente en {db_path}")
+    else:
+        import src.database.load_data as load_data
+        with metrics.stage("paso_2_load_catalog"):
+            result = load_data.load_and_insert_data(catalog_path, db_path, mode=args.load_mode)
+        status = "cargado" if result["changed"] else "sin cambios"
+        print(f"Catálogo {status} (versión {result['version']}, modo {args.load_mode})")
+
 #==============================[MAIN FUNCTION]===========================================#
 
-def main() -> None:
+def main(argv=None) -> None:
     """
     Función principal: orquesta todo el flujo.
     1. Crear estructura BD
@@ -28,29 +98,34 @@ def main() -> None:
     4. Cargar TTPs MITRE ATT&CK
     5. Realizar simulaciones de ataque TTP
     """   
+    args = parse_args(argv)
+    metrics.configure_logging(args.log_level, args.log_format)
+    db_path = Path(args.db)
+    catalog_path = Path(args.catalog)
+
+    import src.cyberrecom.mitre as mitre
+    import src.graph.grafo as grafo
+    import src.risk.red_bayes as red_bayes
+    import src.risk.id_test as id_test
+    import src.risk.joint_decision as joint_decision
+
+    if args.stream is not None:
+        # La salida estándar queda reservada para las recomendaciones JSONL
+        import src.cyberrecom.stream as stream
+        with contextlib.redirect_stdout(sys.stderr):
+            prepare_catalog(args, db_path, catalog_path)
+        with metrics.stage("stream"):
+            stream.run_stream(str(db_path), args.stream, args.stream_out, queue_size=args.queue_size,
+                              tactic=args.tactic, coalesce_window=args.coalesce_window)
+        if args.metrics_out:
+            metrics.export_metrics(args.metrics_out)
+        return
+
     print("\n" + "#"*80)
     print("# Motor de recomendacion de contramedidas en entornos MDO - TFG V1.0.0")
     print("#"*80)
     
-    
-    # ============ PASO 1: Crear base de datos ============
-    print("\n" + "="*80)
-    print("PASO 1: CREANDO ESTRUCTURA DE BASE DE DATOS")
-    print("="*80)
-    if DB_PATH.exists():
-        print(f"Base de datos ya existe: {DB_PATH}.")
-    else:
-        create_db.create_db(DB_PATH, recreate=True)
-        print(f"Base de datos creada: {DB_PATH}\n")
-    
-    
-    # ============ PASO 2: Cargar datos desde Excel ============
-    print("\n" + "="*80)
-    print("PASO 2: CARGAR DATOS DESDE EXCEL")
-    print("="*80)
-    
-    
-    load_data.load_and_insert_data(EXCEL_PATH, DB_PATH)
+    prepare_catalog(args, db_path, catalog_path)
     
     
     # ============ PASO 3: Construir grafo MDO ============
@@ -58,7 +133,16 @@ def main() -> None:
     print("PASO 3: CONSTRUIR GRAFO MDO")
     print("="*80)
     
-    G_global = grafo.build_MDO_graph(str(DB_PATH))
+    with metrics.stage("paso_3_build_graph"):
+        G_global = grafo.build_MDO_graph(str(db_path), use_snapshot=not args.no_snapshot)
+    n_nodes, n_edges = grafo.graph_size(G_global)
+    print(f"Grafo global MDO: {n_nodes} nodos, {n_edges} aristas")
+    # Analítica estructural calculada en la carga del catálogo (ver src/database/analytics.py)
+    analytics = grafo.get_graph_analytics(str(db_path))
+    if analytics is not None:
+        print(f"Estructura: {analytics['n_cyclic_components']} ciclos de dependencias "
+              f"({analytics['n_cyclic_assets']} activos), {analytics['n_orphans']} activos huérfanos, "
+              f"{analytics['n_bridges']} dependencias entre dominios, profundidad máxima {analytics['max_depth']}")
     
     
     # ============ PASO 4: Simular llegada de una amenaza ============
@@ -66,9 +150,10 @@ def main() -> None:
     print("PASO 4: SIMULAR LLEGADA DE UNA AMENAZA")
     print("="*80)
     
-    random_asset = random.choice(list(G_global.nodes))
-    random_threat_vector = mitre.ttp_simulation()
-    random_threat_vector['asset'] = random_asset
+    with metrics.stage("paso_4_threat"):
+        random_asset = args.asset if args.asset is not None else random.choice(grafo.graph_node_ids(G_global))
+        random_threat_vector = mitre.ttp_simulation()
+        random_threat_vector['asset'] = random_asset
     
     print(f"\nSimulación de amenaza: TTP={random_threat_vector['ttp_id']}, Confidence={random_threat_vector['confidence']:.2f}, Asset={random_threat_vector['asset']}")
   
@@ -78,34 +163,76 @@ def main() -> None:
     print("PASO TEST: ANALIZAR IMPACTO EN EL GRAFO MDO")
     print("="*80)
     
-    affected_nodes = grafo.get_infected_nodes(G_global, random_threat_vector['asset'])
+    with metrics.stage("paso_5_blast_radius"):
+        affected_nodes = grafo.get_infected_nodes(G_global, random_threat_vector['asset'])
     
+    if analytics is not None:
+        attacked = grafo.get_asset_metrics(str(db_path), [random_threat_vector['asset']]).get(random_threat_vector['asset'])
+        if attacked is not None:
+            cycle = f", en un ciclo de {attacked['scc_size']} activos" if attacked["scc_size"] > 1 else ""
+            print(f"Activo atacado: {attacked['fan_in']} dependientes directos, {attacked['fan_out']} proveedores, "
+                  f"profundidad {attacked['depth']}{cycle}")
     for level, nodes in affected_nodes.items():
-        print(f"Nivel {level}: {nodes}")
+        # En catálogos grandes solo se resume el nivel; la lista completa va al log (DEBUG)
+        print(f"Nivel {level}: {nodes if len(nodes) <= MAX_LISTED_NODES else f'{len(nodes)} activos'}")
+        logger.debug("Nivel %d: %s", level, nodes, extra=dict(level=level, affected=len(nodes)))
     
     
     # ============ PASO 6: Construcción de la red de bayes para el activo atacado ============
-    red_bayes_model = red_bayes.bayesian_network_construction()
-    
-    # Pregunta: ¿Cuál es C_res si aplico firewall?
-    qC = red_bayes_model.query(variables=["C_res"], evidence={"CM": "firewall"})
-    print("\nP(C_res | CM=firewall):")
-    print(qC)
+    # La confianza de la amenaza simulada fija P(Threat=yes) en la red y en los diagramas de influencia
+    threat_confidence = random_threat_vector['confidence']
+    with metrics.stage("paso_6_bayesian_network"):
+        red_bayes_model = red_bayes.get_inference_engine()
+        
+        # Pregunta: ¿Cuál es C_res si aplico firewall?
+        qC = red_bayes_model.query(variables=["C_res"], evidence={"CM": "firewall"}, threat_confidence=threat_confidence)
+        # Pregunta: ¿Cuál es I_res si aplico firewall?
+        qI = red_bayes_model.query(variables=["I_res"], evidence={"CM": "firewall"}, threat_confidence=threat_confidence)
+        # Pregunta: ¿Cuál es A_res si aplico firewall?
+        qA = red_bayes_model.query(variables=["A_res"], evidence={"CM": "firewall"}, threat_confidence=threat_confidence)
 
-    # Pregunta: ¿Cuál es I_res si aplico firewall?
-    qI = red_bayes_model.query(variables=["I_res"], evidence={"CM": "firewall"})
-    print("\nP(I_res | CM=firewall):")
-    print(qI)
-
-    # Pregunta: ¿Cuál es A_res si aplico firewall?
-    qA = red_bayes_model.query(variables=["A_res"], evidence={"CM": "firewall"})
-    print("\nP(A_res | CM=firewall):")
-    print(qA)
+    for node_name, q in (("C_res", qC), ("I_res", qI), ("A_res", qA)):
+        print(f"\nP({node_name} | CM=firewall):")
+        print(q)
     
     # ================ PASO 7: Construcción y resolución de diagramas de influencia para cada dimensión CIA ===============
-    ie_C, decision_C = id_test.create_and_solve_dimension("C", "C_res", "CONFIDENTIALITY")
-    ie_I, decision_I = id_test.create_and_solve_dimension("I", "I_res", "INTEGRITY")
-    ie_A, decision_A = id_test.create_and_solve_dimension("A", "A_res", "AVAILABILITY")
+    with metrics.stage("paso_7_influence_diagrams"):
+        ie_C, decision_C = id_test.create_and_solve_dimension("C", "C_res", "CONFIDENTIALITY", threat_confidence)
+        ie_I, decision_I = id_test.create_and_solve_dimension("I", "I_res", "INTEGRITY", threat_confidence)
+        ie_A, decision_A = id_test.create_and_solve_dimension("A", "A_res", "AVAILABILITY", threat_confidence)
+
+    for display_name, ie, decision in (("CONFIDENTIALITY", ie_C, decision_C), ("INTEGRITY", ie_I, decision_I),
+                                       ("AVAILABILITY", ie_A, decision_A)):
+        print(f"\n=== {display_name} ===")
+        print(f"MEU: {ie.MEU()}")
+        print(f"Optimal decision: {ie.optimalDecision(decision)}")
+    
+    # ================ PASO 8: Decisión conjunta CIA para todos los activos afectados ===============
+    print("\n" + "="*80)
+    print("PASO 8: DECISIÓN CONJUNTA CIA POR ACTIVO AFECTADO")
+    print("="*80)
+    
+    with metrics.stage("paso_8_joint_decision"):
+        recommendations = joint_decision.recommend_for_blast_radius(G_global, affected_nodes, confidence=threat_confidence)
+    # En catálogos grandes solo se listan los primeros activos y un resumen por contramedida;
+    # la lista completa va al log (DEBUG)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for i, (asset_id, rec) in enumerate(recommendations.items()):
+        if i >= MAX_LISTED_NODES and not debug:
+            break
+        ranking = ", ".join(f"{cm}={utility:.3f}" for cm, utility in rec["ranking"])
+        if i < MAX_LISTED_NODES:
+            print(f"Nivel {rec['level']} | {asset_id}: {rec['countermeasure']} ({ranking})")
+        logger.debug("Nivel %d | %s: %s (%s)", rec["level"], asset_id, rec["countermeasure"], ranking,
+                     extra=dict(level=rec["level"], asset=asset_id, countermeasure=rec["countermeasure"]))
+    if len(recommendations) > MAX_LISTED_NODES:
+        totals = Counter(rec["countermeasure"] for rec in recommendations.values())
+        print(f"... y {len(recommendations) - MAX_LISTED_NODES} activos más. Total por contramedida: "
+              + ", ".join(f"{cm}={count}" for cm, count in totals.most_common()))
+
+    if args.metrics_out:
+        metrics.export_metrics(args.metrics_out)
+        print(f"\nMétricas de la ejecución exportadas a {args.metrics_out}")
     
     
     
@@ -1,7 +1,8 @@
 #===========================================[IMPORTS]===========================================#
 from pathlib import Path
-from mitreattack.stix20 import MitreAttackData
-from tabulate import tabulate
+import hashlib
+import json
+import sqlite3
 
 
 #======TEST=====
@@ -10,33 +11,308 @@ import random
 
 #=============================[CONSTANTS]===========================================#
 MITRE_ATTACK_JSON_PATH = Path(__file__).parent.parent.parent / "data" / "enterprise-attack.json"
-MITRE_ATTACK_DATA = MitreAttackData(stix_filepath=str(MITRE_ATTACK_JSON_PATH))
+
+# Índice compilado del bundle STIX (se regenera solo si cambia el hash del JSON)
+MITRE_CACHE_PATH = MITRE_ATTACK_JSON_PATH.with_suffix(".cache.db")
+MITRE_CACHE_SCHEMA_VERSION = "2"
+
+MitreCacheDefinitionLanguage = """
+CREATE TABLE IF NOT EXISTS meta (
+  key   TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+
+-- Técnicas ATT&CK indexadas por su ID (T1190, T1059.001, ...)
+CREATE TABLE IF NOT EXISTS techniques (
+  attack_id         TEXT PRIMARY KEY,
+  stix_id           TEXT NOT NULL,
+  name              TEXT NOT NULL,
+  description       TEXT NOT NULL,
+  kill_chain_phases TEXT NOT NULL, -- lista JSON de phase_name
+  tactics           TEXT NOT NULL, -- lista JSON de nombres de táctica
+  is_subtechnique   INTEGER NOT NULL,
+  deprecated        INTEGER NOT NULL
+);
+
+-- Tácticas ATT&CK (TA0001, ...)
+CREATE TABLE IF NOT EXISTS tactics (
+  attack_id  TEXT PRIMARY KEY,
+  stix_id    TEXT NOT NULL,
+  name       TEXT NOT NULL,
+  shortname  TEXT NOT NULL,
+  revoked    INTEGER NOT NULL,
+  deprecated INTEGER NOT NULL
+);
+
+-- Mitigaciones (course-of-action) asociadas a cada técnica
+CREATE TABLE IF NOT EXISTS mitigations (
+  technique_id  TEXT NOT NULL,
+  mitigation_id TEXT NOT NULL,
+  name          TEXT NOT NULL,
+  description   TEXT NOT NULL,
+  PRIMARY KEY (technique_id, mitigation_id)
+);
+"""
+
+# Conexiones memoizadas (se crean en el primer uso)
+_mitre_cache_con = None
+_mitre_attack_data = None
+
+
+#===========================================[MITRE CACHE]===========================================#
+def _file_sha256(path: Path) -> str:
+    """
+    Calcula el hash SHA-256 de un fichero leyéndolo por bloques.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat_signature(path: Path) -> str:
+    """
+    Firma barata del fichero (tamaño + mtime) para evitar recalcular el hash en cada arranque.
+    """
+    st = path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _attack_external_id(stix_object: dict):
+    """
+    Devuelve el ID ATT&CK (T1190, TA0001, M1050...) de un objeto STIX o None si no lo tiene.
+    """
+    for ref in stix_object.get("external_references", []):
+        if ref.get("source_name") == "mitre-attack" and ref.get("external_id"):
+            return ref["external_id"]
+    return None
+
+
+def build_mitre_cache(stix_path: Path = MITRE_ATTACK_JSON_PATH, cache_path: Path = MITRE_CACHE_PATH) -> None:
+    """
+    Compila el bundle STIX de MITRE ATT&CK en un índice SQLite indexado por ID ATT&CK.
+    Guarda técnicas (nombre, fases de kill chain, descripción, tácticas), tácticas y mitigaciones.
+    El índice se escribe en un fichero temporal y se sustituye de forma atómica.
+    """
+    with open(stix_path, "r", encoding="utf-8") as f:
+        objects = json.load(f)["objects"]
+
+    stix_hash = _file_sha256(stix_path)
+
+    # Tácticas (con sus marcas de revocada / obsoleta): shortname (initial-access) -> nombre legible
+    # (Initial Access), solo de las vigentes
+    tactic_rows = []
+    tactic_names = {}
+    for obj in objects:
+        if obj.get("type") != "x-mitre-tactic":
+            continue
+        attack_id = _attack_external_id(obj)
+        if attack_id is None:
+            continue
+        revoked, deprecated = bool(obj.get("revoked")), bool(obj.get("x_mitre_deprecated"))
+        tactic_rows.append((attack_id, obj["id"], obj["name"], obj["x_mitre_shortname"], int(revoked), int(deprecated)))
+        if not (revoked or deprecated):
+            tactic_names[obj["x_mitre_shortname"]] = obj["name"]
+
+    # Técnicas: se omiten las revocadas y se indexan por su ID ATT&CK
+    technique_rows = []
+    technique_ids = {}  # stix_id -> attack_id
+    for obj in objects:
+        if obj.get("type") != "attack-pattern" or obj.get("revoked"):
+            continue
+        attack_id = _attack_external_id(obj)
+        if attack_id is None:
+            continue
+        phases = [
+            p["phase_name"] for p in obj.get("kill_chain_phases", [])
+            if p.get("kill_chain_name") == "mitre-attack"
+        ]
+        technique_rows.append((
+            attack_id,
+            obj["id"],
+            obj["name"],
+            obj.get("description", ""),
+            json.dumps(phases),
+            json.dumps([tactic_names.get(p, p) for p in phases]),
+            int(bool(obj.get("x_mitre_is_subtechnique", False))),
+            int(bool(obj.get("x_mitre_deprecated", False))),
+        ))
+        technique_ids[obj["id"]] = attack_id
+
+    # Mitigaciones: relaciones "mitigates" course-of-action -> attack-pattern
+    courses = {
+        obj["id"]: obj for obj in objects
+        if obj.get("type") == "course-of-action" and not obj.get("revoked")
+    }
+    mitigation_rows = {}
+    for obj in objects:
+        if obj.get("type") != "relationship" or obj.get("relationship_type") != "mitigates" or obj.get("revoked"):
+            continue
+        technique_id = technique_ids.get(obj.get("target_ref"))
+        course = courses.get(obj.get("source_ref"))
+        if technique_id is None or course is None:
+            continue
+        mitigation_id = _attack_external_id(course) or course["id"]
+        mitigation_rows[(technique_id, mitigation_id)] = (
+            technique_id, mitigation_id, course["name"], course.get("description", "")
+        )
+
+    tmp_path = cache_path.with_suffix(".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    con = sqlite3.connect(str(tmp_path))
+    try:
+        con.executescript(MitreCacheDefinitionLanguage)
+        con.executemany("INSERT INTO techniques VALUES (?, ?, ?, ?, ?, ?, ?, ?);", technique_rows)
+        con.executemany("INSERT INTO tactics VALUES (?, ?, ?, ?, ?, ?);", tactic_rows)
+        con.executemany("INSERT INTO mitigations VALUES (?, ?, ?, ?);", mitigation_rows.values())
+        con.executemany("INSERT INTO meta VALUES (?, ?);", [
+            ("schema_version", MITRE_CACHE_SCHEMA_VERSION),
+            ("stix_sha256", stix_hash),
+            ("stix_stat", _stat_signature(stix_path)),
+        ])
+        con.commit()
+    finally:
+        con.close()
+
+    tmp_path.replace(cache_path)
+
+
+def _read_meta(con: sqlite3.Connection) -> dict:
+    try:
+        return dict(con.execute("SELECT key, value FROM meta;").fetchall())
+    except sqlite3.DatabaseError:
+        return {}
+
+
+def _cache_is_valid(stix_path: Path, cache_path: Path) -> bool:
+    """
+    Comprueba si el índice corresponde al bundle STIX actual.
+    Primero compara la firma (tamaño + mtime); solo si difiere se recalcula el hash.
+    """
+    if not cache_path.exists():
+        return False
+
+    con = sqlite3.connect(str(cache_path))
+    try:
+        meta = _read_meta(con)
+        if meta.get("schema_version") != MITRE_CACHE_SCHEMA_VERSION:
+            return False
+
+        stat = _stat_signature(stix_path)
+        if meta.get("stix_stat") == stat:
+            return True
+
+        if meta.get("stix_sha256") != _file_sha256(stix_path):
+            return False
+
+        # Mismo contenido con otra firma (p. ej. tras un checkout): se actualiza la firma
+        con.execute("UPDATE meta SET value = ? WHERE key = 'stix_stat';", (stat,))
+        con.commit()
+        return True
+    finally:
+        con.close()
+
+
+def get_mitre_cache() -> sqlite3.Connection:
+    """
+    Devuelve la conexión (memoizada) al índice compilado de MITRE ATT&CK.
+    Si el índice no existe o el hash del bundle STIX ha cambiado, se reconstruye.
+    """
+    global _mitre_cache_con
+    if _mitre_cache_con is None:
+        if not _cache_is_valid(MITRE_ATTACK_JSON_PATH, MITRE_CACHE_PATH):
+            build_mitre_cache(MITRE_ATTACK_JSON_PATH, MITRE_CACHE_PATH)
+        _mitre_cache_con = sqlite3.connect(str(MITRE_CACHE_PATH))
+        _mitre_cache_con.row_factory = sqlite3.Row
+    return _mitre_cache_con
+
+
+def get_mitre_attack_data():
+    """
+    Devuelve el objeto MitreAttackData completo (memoizado) para consultas que no cubre el índice.
+    Parsear el bundle completo es costoso: usar solo cuando sea imprescindible.
+    """
+    global _mitre_attack_data
+    if _mitre_attack_data is None:
+        from mitreattack.stix20 import MitreAttackData
+        _mitre_attack_data = MitreAttackData(stix_filepath=str(MITRE_ATTACK_JSON_PATH))
+    return _mitre_attack_data
 
 
 #===========================================[MITRE FUNCTIONS]===========================================#
 def get_mitre_tactics(remove_revoked_deprecated: bool = True):
     """
-    Obtiene la lista de tácticas ATT&CK desde el conjunto de datos MITRE ATT&CK.
+    Obtiene la lista de tácticas ATT&CK desde el índice compilado de MITRE ATT&CK.
+    Con remove_revoked_deprecated=True se omiten las tácticas revocadas u obsoletas.
     """
-    tactics = MITRE_ATTACK_DATA.get_tactics(remove_revoked_deprecated=remove_revoked_deprecated)
+    where = "WHERE revoked = 0 AND deprecated = 0 " if remove_revoked_deprecated else ""
+    rows = get_mitre_cache().execute(
+        f"SELECT stix_id, attack_id, name, shortname FROM tactics {where}ORDER BY attack_id;"
+    ).fetchall()
+    tactics = [
+        dict(id=row["stix_id"], external_id=row["attack_id"], name=row["name"], shortname=row["shortname"])
+        for row in rows
+    ]
     return tactics
 
+def get_mitre_techniques(include_subtechniques: bool = True):
+    """
+    Lista las técnicas ATT&CK no obsoletas del índice compilado con sus fases de kill chain
+    (p. ej. "initial-access"), ordenadas por ID.
+    """
+    rows = get_mitre_cache().execute(
+        "SELECT attack_id, kill_chain_phases, is_subtechnique FROM techniques WHERE deprecated = 0 ORDER BY attack_id;"
+    ).fetchall()
+    return [
+        dict(ttp_id=row["attack_id"], kill_chain_phases=json.loads(row["kill_chain_phases"]))
+        for row in rows
+        if include_subtechniques or not row["is_subtechnique"]
+    ]
+
+def get_ttp_record(ttp_id: str):
+    """
+    Obtiene del índice compilado los datos de una TTP: nombre, descripción, fases de kill chain,
+    tácticas y mitigaciones. Retorna None si la TTP no existe.
+    """
+    con = get_mitre_cache()
+    row = con.execute("SELECT * FROM techniques WHERE attack_id = ?;", (ttp_id,)).fetchone()
+    if row is None:
+        return None
+
+    mitigations = con.execute(
+        "SELECT mitigation_id, name, description FROM mitigations WHERE technique_id = ? ORDER BY mitigation_id;",
+        (ttp_id,),
+    ).fetchall()
+
+    return dict(
+        ttp_id=row["attack_id"],
+        name=row["name"],
+        description=row["description"],
+        kill_chain_phases=json.loads(row["kill_chain_phases"]),
+        tactics=json.loads(row["tactics"]),
+        is_subtechnique=bool(row["is_subtechnique"]),
+        mitigations=[dict(m) for m in mitigations],
+    )
+
 def get_ttp_details_from_ttp_id(ttp_id: str):
     """
     Obtiene la táctica asociada a una TTP específica.
     """
-    try:
-        ttp = MITRE_ATTACK_DATA.get_object_by_attack_id(ttp_id, "attack-pattern")
-        #MITRE_ATTACK_DATA.print_stix_object(ttp, pretty=True)
-    except ValueError:
+    ttp = get_ttp_record(ttp_id)
+    if ttp is None:
         print(f"TTP with ID {ttp_id} not found.")
         return
-        
+
     #Details
     ttp_name = ttp['name']
     ttp_description = ttp['description']
-    ttp_kill_chain_phases = ttp['kill_chain_phases'][0]['phase_name']
-    
+    ttp_kill_chain_phases = ttp['kill_chain_phases'][0] if ttp['kill_chain_phases'] else "-"
+
+    from tabulate import tabulate
+
     # Crear tabla
     table_data = [
         ["Nombre", ttp_name],
@@ -47,35 +323,38 @@ def get_ttp_details_from_ttp_id(ttp_id: str):
 
     # Imprimir tabla
     print(tabulate(table_data, tablefmt="simple"))
-   
-    
-def ttp_simulation():
+
+    return ttp
+
+
+def ttp_simulation(verbose: bool = True):
     '''
     Simula la llegada de un TTP sobe un activo con un cierto nivel de confidence
     '''
     ttp_sim= 'T' + str(random.randint(1001,1681))
     confidence = random.random()
-    print(f"Simulación de TTP: {ttp_sim}, Confidence: {confidence:.2f}")
-    
+    if verbose:
+        print(f"Simulación de TTP: {ttp_sim}, Confidence: {confidence:.2f}")
+
     return dict(ttp_id=ttp_sim, confidence=confidence)
-    
-      
-    
-    
+
+
+
+
 
 
 #===========================================[MAIN FUNCTION]===========================================#
 def main():
-    
+
     tactics = get_mitre_tactics()
     for tactic in tactics:
         print(f"Tactic ID: {tactic['id']}, Name: {tactic['name']}")
-    
+
     #ttp_id = "T1190"
     #get_ttp_details_from_ttp_id(ttp_id)
     ttp_sim = ttp_simulation()
     get_ttp_details_from_ttp_id(ttp_sim['ttp_id'])
-    
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
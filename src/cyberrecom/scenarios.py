@@ -0,0 +1,268 @@
+"""
+Ejecución por lotes de escenarios: recomendación para cada par (activo, técnica ATT&CK) del catálogo.
+
+Los activos se reparten en shards que se procesan en un pool de procesos:
+- El estado pesado (snapshot del grafo, adyacencia CSR, utilidades por táctica) se prepara una vez en el
+  proceso padre y los workers lo heredan por fork (copy-on-write; los arrays del snapshot están además
+  mapeados en memoria). Con otros métodos de arranque cada worker lo reconstruye desde la BD una vez.
+  A las tareas solo se les pasa el rango de activos del shard.
+- La utilidad conjunta CIA de un activo afectado solo depende de sus atributos y de la táctica, no de
+  qué activo se ataque: se calcula una vez para todo el catálogo y táctica (matriz táctica x activo x
+  contramedida). Por cada activo atacado basta con su BFS y con indexar/sumar esa matriz; todas las
+  técnicas de una táctica comparten el resultado.
+- Cada shard se escribe en su propio fichero CSV (chunk_NNNNN.csv, escritura atómica) y el proceso padre
+  registra los shards terminados en manifest.json. Si la ejecución se interrumpe, al relanzarla con el
+  mismo directorio de salida solo se procesan los shards pendientes.
+
+Uso:
+  python -m src.cyberrecom.scenarios --out data/scenarios --workers 8
+  python -m src.cyberrecom.scenarios --out data/scenarios --techniques techniques.json
+"""
+
+#===============================================[IMPORTS]===============================================
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+#===============================================[CONSTANTS]===============================================
+MANIFEST_NAME = "manifest.json"
+CHUNK_PATTERN = "chunk_{:05d}.csv"
+DEFAULT_SHARD_SIZE = 64
+MATRIX_COLUMNS = (
+    "asset_id", "ttp_id", "tactic", "affected",
+    "countermeasure", "utility", "radius_countermeasure", "radius_utility",
+)
+
+#===============================================[TECHNIQUES]===============================================
+def technique_tactic(kill_chain_phases) -> str:
+    """
+    Primera fase de kill chain de la técnica que corresponde a una táctica de las matrices de
+    configuración, o None si ninguna la tiene.
+    """
+    from src.graph.impact import normalize_tactic
+
+    for phase in kill_chain_phases:
+        try:
+            return normalize_tactic(phase)
+        except ValueError:
+            continue
+    return None
+
+
+def load_techniques(path: str = None) -> list:
+    """
+    Técnicas a evaluar como lista de (ttp_id, táctica).
+
+    Sin `path` se leen del índice compilado de MITRE ATT&CK; con `path`, de un JSON
+    {ttp_id: [fases de kill chain]}.
+    """
+    if path is not None:
+        with open(path, "r", encoding="utf-8") as f:
+            phases = json.load(f)
+    else:
+        from src.cyberrecom.mitre import get_mitre_techniques
+
+        phases = {t["ttp_id"]: t["kill_chain_phases"] for t in get_mitre_techniques()}
+    return [(ttp_id, technique_tactic(kill_chain)) for ttp_id, kill_chain in sorted(phases.items())]
+
+#===============================================[WORKER STATE]===============================================
+# Estado compartido por los workers (heredado por fork o creado en el initializer)
+_state = None
+
+def _build_state(db_path: str, techniques: list, confidence: float) -> dict:
+    from src.graph.snapshot import get_graph_snapshot
+    from src.graph.propagation import reverse_csr_from_snapshot
+    from src.risk.joint_decision import solve_joint_decision
+
+    snapshot = get_graph_snapshot(db_path)
+    by_tactic = {}
+    for ttp_id, tactic in techniques:
+        by_tactic.setdefault(tactic, []).append(ttp_id)
+
+    # utilities[t, v, cm]: utilidad conjunta del activo v bajo la táctica t (independiente del origen)
+    asset_types = np.asarray(snapshot.vocab["asset_type"], dtype=object)[np.asarray(snapshot.asset_type)].tolist()
+    criticality = np.asarray(snapshot.criticality, dtype=np.float64)
+    cia = np.asarray(snapshot.cia, dtype=np.float64)
+    results = [
+        solve_joint_decision(asset_types, criticality, cia, confidence=confidence, tactic=tactic)
+        for tactic in by_tactic
+    ]
+    return dict(
+        content_hash=snapshot.content_hash,
+        csr=reverse_csr_from_snapshot(snapshot),
+        node_ids=np.asarray(snapshot.node_ids),
+        tactics=list(by_tactic),
+        ttp_ids=list(by_tactic.values()),
+        countermeasures=results[0]["countermeasures"] if results else [],
+        utilities=np.stack([r["utility"] for r in results]) if results else np.zeros((0, 0, 0)),
+    )
+
+
+def _init_worker(db_path: str, techniques: list, confidence: float) -> None:
+    global _state
+    if _state is None:
+        _state = _build_state(db_path, techniques, confidence)
+
+
+def _run_shard(shard_id: int, start: int, stop: int, out_dir: str) -> tuple:
+    """
+    Evalúa los activos [start, stop) contra todas las técnicas y escribe el chunk del shard.
+    Retorna (shard_id, filas escritas).
+    """
+    from src.graph.propagation import infected_levels
+
+    state = _state
+    node_ids, cms, utilities = state["node_ids"], state["countermeasures"], state["utilities"]
+    rows = []
+    for source in range(start, stop):
+        nodes = np.concatenate(list(infected_levels(state["csr"], source).values()))
+
+        # Todas las tácticas a la vez: el activo atacado y el radio completo (por utilidad total)
+        own = utilities[:, source, :]                          # (T, n_cm)
+        radius = utilities[:, nodes, :].sum(axis=1)            # (T, n_cm)
+        best, radius_best = own.argmax(axis=1).tolist(), radius.argmax(axis=1).tolist()
+
+        asset_id = node_ids[source]
+        for t, (tactic, ttp_ids) in enumerate(zip(state["tactics"], state["ttp_ids"])):
+            row = (
+                tactic or "", len(nodes),
+                cms[best[t]], round(float(own[t, best[t]]), 6),
+                cms[radius_best[t]], round(float(radius[t, radius_best[t]]), 6),
+            )
+            rows.extend((asset_id, ttp_id) + row for ttp_id in ttp_ids)
+
+    path = Path(out_dir) / CHUNK_PATTERN.format(shard_id)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(MATRIX_COLUMNS)
+        writer.writerows(rows)
+    os.replace(tmp, path)
+    return shard_id, len(rows)
+
+#===============================================[MANIFEST]===============================================
+def _write_manifest(out_dir: Path, manifest: dict) -> None:
+    tmp = out_dir / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, out_dir / MANIFEST_NAME)
+
+
+def _load_manifest(out_dir: Path, config: dict) -> dict:
+    """
+    Manifest de una ejecución previa con la misma configuración, o uno nuevo.
+    Lanza ValueError si el directorio contiene una ejecución con otra configuración.
+    """
+    path = out_dir / MANIFEST_NAME
+    if not path.exists():
+        return dict(config=config, completed={})
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest["config"] != config:
+        raise ValueError(
+            f"{out_dir} contiene una ejecución con otra configuración (catálogo, técnicas o parámetros): "
+            "usa otro directorio de salida"
+        )
+    return manifest
+
+#===============================================[RUNNER]===============================================
+def run_scenarios(db_path: str, out_dir: str, techniques: list = None, confidence: float = None,
+                  workers: int = None, shard_size: int = DEFAULT_SHARD_SIZE) -> dict:
+    """
+    Calcula la matriz activo x técnica en `out_dir`, reanudando una ejecución previa si la hay.
+
+    Returns:
+        dict con "shards", "pending" (shards procesados en esta llamada), "rows" y "elapsed".
+    """
+    global _state
+    import src.risk.red_bayes as red_bayes
+
+    start_time = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    techniques = load_techniques() if techniques is None else list(techniques)
+    confidence = red_bayes.confidence if confidence is None else confidence
+    workers = workers or os.cpu_count() or 1
+
+    _state = _build_state(db_path, techniques, confidence)
+    n_assets = len(_state["node_ids"])
+    shards = [(i, lo, min(lo + shard_size, n_assets)) for i, lo in enumerate(range(0, n_assets, shard_size))]
+
+    config = dict(
+        content_hash=_state["content_hash"],
+        techniques_hash=hashlib.sha256(json.dumps(techniques).encode("utf-8")).hexdigest(),
+        confidence=confidence,
+        shard_size=shard_size,
+        n_assets=n_assets,
+    )
+    manifest = _load_manifest(out_dir, config)
+    pending = [s for s in shards if str(s[0]) not in manifest["completed"]]
+    print(f"Escenarios: {n_assets} activos x {len(techniques)} técnicas | "
+          f"{len(shards)} shards ({len(shards) - len(pending)} ya completados)")
+
+    if workers > 1 and len(pending) > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=context,
+            initializer=_init_worker, initargs=(db_path, techniques, confidence),
+        ) as executor:
+            futures = [executor.submit(_run_shard, shard_id, lo, hi, str(out_dir)) for shard_id, lo, hi in pending]
+            for future in as_completed(futures):
+                shard_id, n_rows = future.result()
+                manifest["completed"][str(shard_id)] = n_rows
+                _write_manifest(out_dir, manifest)
+    else:
+        for shard_id, lo, hi in pending:
+            shard_id, n_rows = _run_shard(shard_id, lo, hi, str(out_dir))
+            manifest["completed"][str(shard_id)] = n_rows
+            _write_manifest(out_dir, manifest)
+
+    _write_manifest(out_dir, manifest)
+    elapsed = time.perf_counter() - start_time
+    rows = sum(manifest["completed"].values())
+    print(f"Escenarios completados: {rows} filas en {elapsed:.2f}s ({len(pending)} shards en esta ejecución)")
+    return dict(shards=len(shards), pending=len(pending), rows=rows, elapsed=elapsed)
+
+
+def read_matrix(out_dir: str):
+    """
+    Carga la matriz completa (todos los chunks) como DataFrame de pandas.
+    """
+    import pandas as pd
+
+    chunks = sorted(Path(out_dir).glob("chunk_*.csv"))
+    if not chunks:
+        return pd.DataFrame(columns=list(MATRIX_COLUMNS))
+    return pd.concat((pd.read_csv(c, keep_default_na=False) for c in chunks), ignore_index=True)
+
+#===============================================[MAIN]===============================================
+def main(argv=None) -> None:
+    from src.cyberrecom.main import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Matriz de recomendaciones activo x técnica ATT&CK.")
+    parser.add_argument("--db", default=str(DB_PATH), help="Ruta del fichero .db")
+    parser.add_argument("--out", required=True, help="Directorio de salida (chunks CSV + manifest.json)")
+    parser.add_argument("--techniques", default=None,
+                        help="JSON {ttp_id: [fases de kill chain]} (por defecto, el índice de MITRE ATT&CK)")
+    parser.add_argument("--confidence", type=float, default=None, help="Confianza de la amenaza")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="Activos por shard")
+    args = parser.parse_args(argv)
+
+    try:
+        run_scenarios(args.db, args.out, load_techniques(args.techniques), args.confidence, args.workers, args.shard_size)
+    except ValueError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""
+Modo streaming del motor: ingesta continua de alertas y emisión de recomendaciones en JSONL.
+
+Cada alerta es una línea JSON {"ttp_id": ..., "confidence": ..., "asset": ...} (opcionalmente "id" y
+"tactic") leída de un fichero, de la entrada estándar ("-") o de un socket local ("unix:/ruta").
+Si la alerta no trae "tactic", se deriva de su técnica con el índice de MITRE ATT&CK (como en
+scenarios.technique_tactic) y, si tampoco así se obtiene, se usa la táctica por defecto del motor.
+Las alertas atraviesan un pipeline asyncio de etapas unidas por colas acotadas:
+
+    lectura -> propagación (BFS CSR) -> decisión conjunta CIA -> escritura JSONL
+
+Cuando una etapa se retrasa su cola se llena y las anteriores esperan (backpressure), de modo que
+la memoria queda acotada aunque la fuente produzca más rápido de lo que se procesa.
+Al terminar se informa del throughput y de la latencia p50/p99 (desde la lectura a la emisión).
+
+Con una ventana de coalescencia (coalesce_window > 0) las alertas repetidas de un mismo
+(activo, táctica explícita o técnica, tramo de confianza) que llegan dentro de la ventana se fusionan: la
+confianza del grupo es la máxima recibida y todo el grupo comparte una única recomendación.
+
+Uso:
+  python -m src.cyberrecom.stream replay --events 10000 --out data/replay.jsonl
+  python -m src.cyberrecom.stream run data/replay.jsonl --out recommendations.jsonl
+  python -m src.cyberrecom.main --skip-load --stream data/replay.jsonl
+"""
+
+#===============================================[IMPORTS]===============================================
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#===============================================[CONSTANTS]===============================================
+DEFAULT_QUEUE_SIZE = 64
+# Líneas leídas por cada salto al hilo de lectura (ficheros y stdin)
+READ_BATCH_BYTES = 1 << 16
+SOCKET_PREFIX = "unix:"
+DEFAULT_CONFIDENCE_BUCKETS = 10
+
+#===============================================[METRICS]===============================================
+@dataclass
+class StreamMetrics:
+    """
+    Contadores y latencias del pipeline.
+
+    events:  alertas recibidas (incluidas las fusionadas).
+    outputs: registros emitidos; cada uno es un cálculo de propagación + decisión (o un error).
+    """
+    events: int = 0
+    outputs: int = 0
+    errors: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: float = None
+    latencies: list = field(default_factory=list)
+
+    def record(self, received: tuple, error: bool = False) -> None:
+        """
+        Registra un registro emitido que agrupa las alertas recibidas en los instantes `received`.
+        """
+        now = time.perf_counter()
+        self.events += len(received)
+        self.outputs += 1
+        self.errors += error
+        self.latencies.extend(now - t for t in received)
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        latencies = np.asarray(self.latencies) * 1e3
+        percentile = (lambda q: float(np.percentile(latencies, q))) if len(latencies) else (lambda q: 0.0)
+        return dict(
+            events=self.events,
+            computations=self.outputs,
+            saved_computations=self.events - self.outputs,
+            errors=self.errors,
+            elapsed_s=elapsed,
+            throughput_eps=self.events / elapsed if elapsed > 0 else 0.0,
+            latency_p50_ms=percentile(50),
+            latency_p99_ms=percentile(99),
+            latency_max_ms=float(latencies.max()) if len(latencies) else 0.0,
+        )
+
+#===============================================[STAGES]===============================================
+class StreamEngine:
+    """
+    Estado compartido por las etapas: snapshot del grafo, adyacencia CSR, perfiles de activos y
+    tácticas de las técnicas ya vistas. `tactic` es la táctica por defecto de las alertas cuya
+    técnica no tiene una táctica conocida.
+    """
+
+    def __init__(self, db_path: str, tactic: str = None):
+        from src.cyberrecom.mitre import get_mitre_cache
+        from src.graph.snapshot import get_graph_snapshot
+        from src.graph.propagation import reverse_csr_from_snapshot
+        from src.risk.bn_template import get_bn_template
+
+        self.snapshot = get_graph_snapshot(db_path)
+        self.csr = reverse_csr_from_snapshot(self.snapshot)
+        self.tactic = tactic
+        self.node_ids = np.asarray(self.snapshot.node_ids)
+        self.asset_types = np.asarray(self.snapshot.vocab["asset_type"], dtype=object)[np.asarray(self.snapshot.asset_type)]
+        self.criticality = np.asarray(self.snapshot.criticality, dtype=np.float64)
+        self.cia = np.asarray(self.snapshot.cia, dtype=np.float64)
+        # Compilar la plantilla bayesiana y abrir el índice MITRE antes de la primera alerta (no cuenta como latencia)
+        get_bn_template()
+        self._ttp_tactics = {}
+        try:
+            get_mitre_cache()
+        except FileNotFoundError as error:
+            logger.warning("Sin índice MITRE ATT&CK (%s): las alertas sin 'tactic' usan la táctica por defecto (%s)",
+                           error, tactic)
+            self._ttp_tactics = None
+
+    def tactic_of(self, event: dict) -> str:
+        """
+        Táctica de la alerta: la explícita; si no, la de su técnica (primera fase de kill chain con
+        matriz de configuración, memoizada por ttp_id); si no, la táctica por defecto del motor.
+        """
+        from src.cyberrecom.mitre import get_ttp_record
+        from src.cyberrecom.scenarios import technique_tactic
+
+        if event.get("tactic"):
+            return event["tactic"]
+        ttp_id = event["ttp_id"]
+        if self._ttp_tactics is None:
+            return self.tactic
+        if ttp_id not in self._ttp_tactics:
+            record = get_ttp_record(ttp_id)
+            self._ttp_tactics[ttp_id] = technique_tactic(record["kill_chain_phases"]) if record else None
+        return self._ttp_tactics[ttp_id] or self.tactic
+
+    def propagate(self, event: dict) -> dict:
+        """
+        Etapa de propagación: niveles de salto (índices) de los activos afectados.
+        """
+        from src.graph.propagation import infected_levels
+
+        source = self.csr.node_index.get(event["asset"])
+        if source is None:
+            raise KeyError(f"El activo '{event['asset']}' no existe en el grafo")
+        event["levels"] = infected_levels(self.csr, source)
+        return event
+
+    def decide(self, event: dict) -> dict:
+        """
+        Etapa de riesgo y decisión: decisión conjunta CIA para todos los activos afectados.
+        """
+        from src.risk.joint_decision import solve_joint_decision
+
+        levels = event.pop("levels")
+        event["tactic"] = self.tactic_of(event)
+        nodes = np.concatenate(list(levels.values()))
+        hops = np.concatenate([np.full(len(idx), level) for level, idx in levels.items()])
+        result = solve_joint_decision(
+            self.asset_types[nodes].tolist(), self.criticality[nodes], self.cia[nodes],
+            confidence=float(event["confidence"]), tactic=event["tactic"],
+        )
+
+        cms = result["countermeasures"]
+        best = result["ranking"][:, 0]
+        utility = result["utility"][np.arange(len(nodes)), best]
+        event["affected"] = int(len(nodes))
+        event["recommendations"] = [
+            {"asset": asset_id, "level": int(hop), "countermeasure": cms[cm], "utility": round(float(u), 6)}
+            for asset_id, hop, cm, u in zip(self.node_ids[nodes].tolist(), hops.tolist(), best.tolist(), utility.tolist())
+        ]
+        return event
+
+
+def parse_event(line: str) -> dict:
+    """
+    Valida una línea de alerta. Lanza ValueError si falta algún campo, si asset, ttp_id o tactic
+    no son texto o si la confianza no es válida.
+    """
+    event = json.loads(line)
+    if not isinstance(event, dict):
+        raise ValueError(f"La alerta debe ser un objeto JSON: {line.strip()}")
+    missing = [k for k in ("ttp_id", "confidence", "asset") if k not in event]
+    if missing:
+        raise ValueError(f"Faltan campos en la alerta: {missing}")
+    # tactic es opcional (puede faltar o ser null)
+    not_text = [k for k in ("asset", "ttp_id", "tactic")
+                if not isinstance(event.get(k), str) and not (k == "tactic" and event.get(k) is None)]
+    if not_text:
+        raise ValueError(f"Campos de la alerta que deben ser texto: {not_text}")
+    if not 0.0 <= float(event["confidence"]) <= 1.0:
+        raise ValueError(f"Confianza fuera de [0, 1]: {event['confidence']}")
+    return event
+
+#===============================================[SOURCES]===============================================
+async def _read_file(source: str, queue: asyncio.Queue) -> None:
+    """
+    Lee líneas de un fichero o de stdin ("-") en un hilo, por bloques, y las encola.
+    """
+    handle = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        while True:
+            lines = await asyncio.to_thread(handle.readlines, READ_BATCH_BYTES)
+            if not lines:
+                break
+            for line in lines:
+                if line.strip():
+                    await queue.put((time.perf_counter(), line))
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+async def _read_socket(path: str, queue: asyncio.Queue, once: bool) -> None:
+    """
+    Acepta conexiones en un socket Unix local y encola sus líneas. Con once=True termina al
+    cerrarse la primera conexión; si no, sirve hasta que se cancele el pipeline.
+    """
+    finished = asyncio.Event()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            async for raw in reader:
+                line = raw.decode("utf-8")
+                if line.strip():
+                    await queue.put((time.perf_counter(), line))
+        finally:
+            writer.close()
+            if once:
+                finished.set()
+
+    Path(path).unlink(missing_ok=True)
+    server = await asyncio.start_unix_server(handle, path=path)
+    async with server:
+        if once:
+            await finished.wait()
+        else:
+            await server.serve_forever()
+
+#===============================================[PIPELINE]===============================================
+async def _stage(func, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+    """
+    Aplica `func` a cada elemento; los errores se propagan como registros {"error": ...}.
+    """
+    while True:
+        item = await inbox.get()
+        if item is None:
+            await outbox.put(None)
+            return
+        received, payload = item
+        if "error" not in payload:
+            try:
+                payload = func(payload)
+            except Exception as error:
+                message = error.args[0] if isinstance(error, KeyError) and error.args else str(error)
+                payload = {"error": message, "event": {k: v for k, v in payload.items() if k != "levels"}}
+        await outbox.put((received, payload))
+
+
+async def _parse(inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+    while True:
+        item = await inbox.get()
+        if item is None:
+            await outbox.put(None)
+            return
+        received, line = item
+        try:
+            payload = parse_event(line)
+        except (ValueError, TypeError) as error:
+            payload = {"error": str(error), "line": line.strip()}
+        await outbox.put(((received,), payload))
+
+
+def coalesce_key(event: dict, buckets: int) -> tuple:
+    """
+    Clave de coalescencia: (activo, táctica explícita -o técnica, que determina la táctica-, tramo de confianza).
+    """
+    bucket = min(int(float(event["confidence"]) * buckets), buckets - 1)
+    return event["asset"], event.get("tactic") or event["ttp_id"], bucket
+
+
+async def _coalesce(inbox: asyncio.Queue, outbox: asyncio.Queue, window: float, buckets: int) -> None:
+    """
+    Agrupa las alertas con la misma clave (ver coalesce_key) durante `window` segundos desde la
+    primera del grupo y emite un único evento por grupo con la confianza máxima y los ids fusionados.
+    Los errores de parseo pasan sin esperar; una alerta sin clave válida se emite como error.
+    """
+    pending = {}   # clave -> [plazo, instantes de recepción, evento]; en orden de plazo
+
+    async def flush(until: float) -> None:
+        while pending:
+            key, (deadline, received, event) = next(iter(pending.items()))
+            if deadline > until:
+                return
+            del pending[key]
+            if len(received) > 1:
+                event["coalesced"] = len(received)
+            await outbox.put((tuple(received), event))
+
+    while True:
+        timeout = None
+        if pending:
+            timeout = max(0.0, next(iter(pending.values()))[0] - time.perf_counter())
+        if not inbox.empty():
+            item = inbox.get_nowait()
+        else:
+            try:
+                item = await asyncio.wait_for(inbox.get(), timeout)
+            except asyncio.TimeoutError:
+                item = ()
+        await flush(time.perf_counter())
+
+        if item is None:
+            await flush(float("inf"))
+            await outbox.put(None)
+            return
+        if not item:
+            continue
+
+        received, event = item
+        if "error" in event:
+            await outbox.put(item)
+            continue
+
+        try:
+            key = coalesce_key(event, buckets)
+            group = pending.get(key)
+        except (KeyError, TypeError, ValueError) as error:
+            await outbox.put((received, {"error": f"Alerta no agrupable: {error}", "event": event}))
+            continue
+        if group is None:
+            pending[key] = [received[0] + window, list(received), event]
+            continue
+
+        group[1].extend(received)
+        merged = group[2]
+        merged["confidence"] = max(float(merged["confidence"]), float(event["confidence"]))
+        if "id" in event:
+            merged.setdefault("merged_ids", [merged["id"]] if "id" in merged else []).append(event["id"])
+
+
+async def _write(inbox: asyncio.Queue, sink, metrics: StreamMetrics) -> None:
+    while True:
+        item = await inbox.get()
+        if item is None:
+            sink.flush()
+            return
+        received, payload = item
+        sink.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        metrics.record(received, error="error" in payload)
+        if inbox.empty():
+            sink.flush()
+
+
+async def run_pipeline(engine: StreamEngine, source: str, sink, queue_size: int = DEFAULT_QUEUE_SIZE,
+                       once: bool = True, coalesce_window: float = 0.0,
+                       confidence_buckets: int = DEFAULT_CONFIDENCE_BUCKETS) -> StreamMetrics:
+    """
+    Ejecuta el pipeline completo desde `source` (ruta, "-" o "unix:/ruta") hasta `sink`
+    (objeto con write/flush). Retorna las métricas al agotarse la fuente.
+    Con coalesce_window > 0 se añade la etapa de coalescencia tras el parseo.
+    """
+    metrics = StreamMetrics()
+    lines, parsed, events, propagated, decided = (asyncio.Queue(maxsize=queue_size) for _ in range(5))
+
+    if source.startswith(SOCKET_PREFIX):
+        reader = _read_socket(source[len(SOCKET_PREFIX):], lines, once)
+    else:
+        reader = _read_file(source, lines)
+
+    async def read_all() -> None:
+        try:
+            await reader
+        finally:
+            await lines.put(None)
+
+    if coalesce_window > 0:
+        coalesce = _coalesce(parsed, events, coalesce_window, confidence_buckets)
+    else:
+        parsed = events
+        coalesce = asyncio.sleep(0)
+
+    await asyncio.gather(
+        read_all(),
+        _parse(lines, parsed),
+        coalesce,
+        _stage(engine.propagate, events, propagated),
+        _stage(engine.decide, propagated, decided),
+        _write(decided, sink, metrics),
+    )
+    metrics.finished = time.perf_counter()
+    return metrics
+
+
+def run_stream(db_path: str, source: str, out: str = "-", queue_size: int = DEFAULT_QUEUE_SIZE,
+               tactic: str = None, once: bool = True, coalesce_window: float = 0.0,
+               confidence_buckets: int = DEFAULT_CONFIDENCE_BUCKETS) -> dict:
+    """
+    Punto de entrada síncrono: procesa la fuente completa, escribe las recomendaciones en `out`
+    ("-" = stdout) e imprime el resumen de métricas por stderr. Retorna el resumen.
+    """
+    engine = StreamEngine(db_path, tactic=tactic)
+    sink = sys.stdout if out == "-" else open(out, "w", encoding="utf-8")
+    try:
+        metrics = asyncio.run(run_pipeline(
+            engine, source, sink, queue_size=queue_size, once=once,
+            coalesce_window=coalesce_window, confidence_buckets=confidence_buckets,
+        ))
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+
+    summary = metrics.summary()
+    print(
+        f"Stream: {summary['events']} alertas ({summary['errors']} con error) en {summary['elapsed_s']:.2f}s | "
+        f"{summary['throughput_eps']:.1f} alertas/s | p50 {summary['latency_p50_ms']:.2f} ms | "
+        f"p99 {summary['latency_p99_ms']:.2f} ms | cálculos {summary['computations']} "
+        f"(ahorrados por coalescencia: {summary['saved_computations']})",
+        file=sys.stderr,
+    )
+    return summary
+
+#===============================================[REPLAY]===============================================
+def generate_replay(path: str, n_events: int, asset_ids, seed: int = 0, burst: int = 1) -> Path:
+    """
+    Genera un fichero JSONL de `n_events` alertas con mitre.ttp_simulation() sobre activos aleatorios.
+    Con burst > 1 cada alerta simulada se repite hasta `burst` veces seguidas (misma técnica y activo,
+    confianza ligeramente creciente), como las ráfagas de un sensor real.
+    """
+    from src.cyberrecom.mitre import ttp_simulation
+
+    random.seed(seed)
+    asset_ids = list(asset_ids)
+    path = Path(path)
+    with open(path, "w", encoding="utf-8") as f:
+        i = 0
+        while i < n_events:
+            event = ttp_simulation(verbose=False)
+            event["asset"] = random.choice(asset_ids)
+            for _ in range(min(random.randint(1, burst), n_events - i)):
+                event["id"] = i
+                f.write(json.dumps(event) + "\n")
+                event["confidence"] = min(1.0, event["confidence"] + random.uniform(0.0, 0.02))
+                i += 1
+    return path
+
+#===============================================[MAIN]===============================================
+def main(argv=None) -> None:
+    from src.cyberrecom.main import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Modo streaming del motor de contramedidas.")
+    parser.add_argument("--db", default=str(DB_PATH), help="Ruta del fichero .db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay = commands.add_parser("replay", help="Genera un fichero de alertas simuladas (JSONL)")
+    replay.add_argument("--events", type=int, default=10_000)
+    replay.add_argument("--seed", type=int, default=0)
+    replay.add_argument("--burst", type=int, default=1, help="Repeticiones máximas de cada alerta (ráfagas)")
+    replay.add_argument("--out", required=True)
+
+    run = commands.add_parser("run", help="Procesa alertas JSONL y emite recomendaciones JSONL")
+    run.add_argument("source", help='Fichero JSONL, "-" (stdin) o "unix:/ruta" (socket local)')
+    run.add_argument("--out", default="-", help='Fichero de salida ("-" = stdout)')
+    run.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    run.add_argument("--tactic", default=None,
+                     help="Táctica por defecto de las alertas sin 'tactic' cuya técnica no tiene táctica conocida")
+    run.add_argument("--serve", action="store_true", help="Con un socket, seguir aceptando conexiones")
+    run.add_argument("--coalesce-window", type=float, default=0.0,
+                     help="Segundos durante los que se fusionan alertas repetidas (0 = sin coalescencia)")
+    run.add_argument("--confidence-buckets", type=int, default=DEFAULT_CONFIDENCE_BUCKETS,
+                     help="Tramos de confianza de la clave de coalescencia")
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        from src.graph.snapshot import get_graph_snapshot
+
+        snapshot = get_graph_snapshot(args.db)
+        path = generate_replay(args.out, args.events, snapshot.node_ids.tolist(), seed=args.seed, burst=args.burst)
+        print(f"Replay generado: {path} ({args.events} alertas)", file=sys.stderr)
+    else:
+        run_stream(args.db, args.source, args.out, args.queue_size, args.tactic, once=not args.serve,
+                   coalesce_window=args.coalesce_window, confidence_buckets=args.confidence_buckets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Analítica estructural del grafo de dependencias, calculada una vez por carga del catálogo.
+
+Se ejecuta dentro de la transacción de load_data (tras registrar la versión) y guarda en la BD:
+- asset_metrics: por activo, fan-in (consumidores directos), fan-out (proveedores directos),
+  profundidad (cadena de dependencias más larga hasta un proveedor raíz, que no depende de nadie),
+  componente fuertemente conexa (ciclo de dependencias si tiene más de un activo) y si es huérfano
+  (sin dependencias en ningún sentido).
+- domain_bridges: dependencias entre activos de dominios distintos.
+- graph_analytics: resumen y versión del catálogo analizada (para detectar tablas desactualizadas).
+
+Todo en tiempo lineal: grados con bincount, componentes con el algoritmo de scipy (Pearce) y
+profundidades con Kahn por capas sobre la condensación (DAG de componentes).
+
+Política (Configs/constants.json, "acyclic_dependency_types"): las dependencias de esos tipos no pueden
+formar ciclos entre sí. Si los forman, analyze_catalog lanza ValueError y la carga se deshace.
+
+Uso (recalcula la analítica de una BD existente):
+  python -m src.database.analytics --db ruta/al/catalogo.db
+"""
+
+#===============================================[IMPORTS]===============================================
+import argparse
+import json
+import logging
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+from src.instrumentation.metrics import incr
+
+logger = logging.getLogger(__name__)
+
+#===============================================[CONSTANTS]===============================================
+CONSTANTS_PATH = Path(__file__).parent.parent.parent / "Configs" / "constants.json"
+POLICY_KEY = "acyclic_dependency_types"
+# Ciclos y activos por ciclo que se incluyen en el mensaje de error de la política
+MAX_REPORTED_CYCLES = 5
+MAX_REPORTED_ASSETS = 10
+
+#===============================================[POLICY]===============================================
+def load_acyclic_policy() -> list:
+    """
+    Tipos de dependencia que no pueden formar ciclos (vacío si la configuración no los define).
+    """
+    with open(CONSTANTS_PATH, "r", encoding="utf-8") as f:
+        return list(json.load(f).get(POLICY_KEY, []))
+
+#===============================================[ALGORITHMS]===============================================
+def strong_components(n: int, src: np.ndarray, dst: np.ndarray):
+    """
+    Componentes fuertemente conexas del grafo de aristas src -> dst. Retorna (n_components, labels).
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    matrix = csr_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+    n_components, labels = connected_components(matrix, directed=True, connection="strong")
+    return n_components, labels.astype(np.int64)
+
+
+def component_depths(labels: np.ndarray, n_components: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Profundidad de cada componente en la condensación: 0 si no depende de otra componente y,
+    si no, 1 + la mayor profundidad de sus proveedores (Kahn por capas, desde los proveedores raíz).
+    """
+    consumer, provider = labels[src], labels[dst]
+    mask = consumer != provider
+    pairs = np.unique(provider[mask] * n_components + consumer[mask])
+    provider, consumer = pairs // n_components, pairs % n_components
+
+    # Consumidores de cada componente proveedora (CSR; `pairs` ya viene ordenado por proveedor)
+    indptr = np.zeros(n_components + 1, dtype=np.int64)
+    np.cumsum(np.bincount(provider, minlength=n_components), out=indptr[1:])
+    pending = np.bincount(consumer, minlength=n_components)
+
+    depth = np.zeros(n_components, dtype=np.int64)
+    frontier = np.flatnonzero(pending == 0)
+    level = 0
+    while frontier.size:
+        depth[frontier] = level
+        starts, stops = indptr[frontier], indptr[frontier + 1]
+        counts = stops - starts
+        if not counts.sum():
+            break
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        reached, times = np.unique(consumer[offsets], return_counts=True)
+        pending[reached] -= times
+        frontier = reached[pending[reached] == 0]
+        level += 1
+    return depth
+
+
+def compute_graph_analytics(nodes: np.ndarray, domain: np.ndarray, src: np.ndarray, dst: np.ndarray) -> dict:
+    """
+    Métricas por activo (en el orden de `nodes`) y máscara de aristas entre dominios.
+    domain: código de dominio de cada nodo; src/dst: índices de consumidor y proveedor de cada dependencia.
+    """
+    n = len(nodes)
+    fan_out = np.bincount(src, minlength=n)
+    fan_in = np.bincount(dst, minlength=n)
+    n_components, labels = strong_components(n, src, dst)
+    scc_size = np.bincount(labels, minlength=n_components)
+    depth = component_depths(labels, n_components, src, dst)
+    return dict(
+        fan_in=fan_in,
+        fan_out=fan_out,
+        depth=depth[labels],
+        scc_id=labels,
+        scc_size=scc_size[labels],
+        is_orphan=(fan_in == 0) & (fan_out == 0),
+        n_components=n_components,
+        bridges=domain[src] != domain[dst],
+    )
+
+
+def forbidden_cycles(n: int, src: np.ndarray, dst: np.ndarray) -> list:
+    """
+    Ciclos del grafo de aristas src -> dst (las dependencias de los tipos acíclicos), como arrays
+    de índices de nodo (una por componente fuertemente conexa de más de un activo).
+    """
+    if not len(src):
+        return []
+    n_components, labels = strong_components(n, src, dst)
+    sizes = np.bincount(labels, minlength=n_components)
+    members = np.flatnonzero(sizes[labels] > 1)
+    members = members[np.argsort(labels[members], kind="stable")]
+    return [group for group in np.split(members, np.cumsum(sizes[sizes > 1])[:-1]) if group.size]
+
+#===============================================[DATABASE]===============================================
+def _fetch_array(cur: sqlite3.Cursor, width: int, batch: int = 100_000) -> np.ndarray:
+    """
+    Resultado entero de una consulta como array (filas, width), leído por lotes.
+    """
+    blocks = []
+    while True:
+        rows = cur.fetchmany(batch)
+        if not rows:
+            break
+        blocks.append(np.array(rows, dtype=np.int64))
+    return np.concatenate(blocks) if blocks else np.zeros((0, width), dtype=np.int64)
+
+
+def _read_graph(con: sqlite3.Connection, acyclic_types: list):
+    """
+    Grafo del catálogo como arrays enteros (sin materializar los identificadores de texto):
+    asset_pk y dominio (código) de cada nodo, aristas src = consumidor y dst = proveedor como índices
+    de nodo y máscara de las dependencias de tipos acíclicos.
+    """
+    pks = _fetch_array(con.execute("SELECT asset_pk FROM assets ORDER BY asset_pk;"), 1)[:, 0]
+    domain = np.zeros(len(pks), dtype=np.int64)
+    domains = [row[0] for row in con.execute("SELECT DISTINCT domain FROM assets;")]
+    for code, name in enumerate(domains):
+        # Índice cubriente idx_assets_domain
+        members = _fetch_array(con.execute("SELECT asset_pk FROM assets WHERE domain = ?;", (name,)), 1)[:, 0]
+        domain[np.searchsorted(pks, members)] = code
+
+    # Sin política, ninguna dependencia es de tipo acíclico (IN () no es SQL válido)
+    is_acyclic = f"d.dependency_type IN ({', '.join('?' for _ in acyclic_types)})" if acyclic_types else "0"
+    edges = _fetch_array(con.execute(f"""
+        SELECT d.dep_pk, fa.asset_pk, ta.asset_pk, {is_acyclic}
+        FROM dependencies d
+        JOIN assets fa ON fa.asset_id = d.from_asset
+        JOIN assets ta ON ta.asset_id = d.to_asset;
+    """, tuple(acyclic_types)), 4)
+    incr("sql_rows_read", len(pks) + len(edges))
+    return dict(
+        pks=pks, domain=domain, domains=domains, dep_pks=edges[:, 0],
+        src=np.searchsorted(pks, edges[:, 1]), dst=np.searchsorted(pks, edges[:, 2]), acyclic=edges[:, 3] == 1,
+    )
+
+
+def _asset_ids(con: sqlite3.Connection, pks) -> list:
+    return [con.execute("SELECT asset_id FROM assets WHERE asset_pk = ?;", (pk,)).fetchone()[0] for pk in pks]
+
+
+def analyze_catalog(con: sqlite3.Connection, version: int, acyclic_types: list = None) -> dict:
+    """
+    Calcula la analítica del catálogo de la conexión y la guarda en asset_metrics, domain_bridges y
+    graph_analytics, dentro de la transacción actual (la del registro de la versión `version`).
+    Lanza ValueError si hay ciclos prohibidos por la política. Retorna el resumen guardado.
+    """
+    acyclic_types = load_acyclic_policy() if acyclic_types is None else list(acyclic_types)
+    graph = _read_graph(con, acyclic_types)
+    pks, src, dst, acyclic = graph["pks"], graph["src"], graph["dst"], graph["acyclic"]
+
+    cycles = forbidden_cycles(len(pks), src[acyclic], dst[acyclic])
+    if cycles:
+        examples = [sorted(_asset_ids(con, pks[cycle[:MAX_REPORTED_ASSETS]].tolist())) for cycle in cycles[:MAX_REPORTED_CYCLES]]
+        raise ValueError(
+            f"{len(cycles)} ciclo(s) de dependencias de tipos acíclicos {acyclic_types} "
+            f"(ver {POLICY_KEY} en Configs/constants.json): {examples}"
+        )
+
+    result = compute_graph_analytics(pks, graph["domain"], src, dst)
+    content_hash = con.execute("SELECT content_hash FROM catalog_versions WHERE version = ?;", (version,)).fetchone()[0]
+    cyclic = result["scc_size"] > 1
+    summary = dict(
+        version=version,
+        content_hash=content_hash,
+        n_assets=len(pks),
+        n_dependencies=len(src),
+        n_components=int(result["n_components"]),
+        n_cyclic_components=len(np.unique(result["scc_id"][cyclic])),
+        n_cyclic_assets=int(cyclic.sum()),
+        n_orphans=int(result["is_orphan"].sum()),
+        n_bridges=int(result["bridges"].sum()),
+        max_depth=int(result["depth"].max()) if len(pks) else 0,
+    )
+
+    con.execute("DELETE FROM asset_metrics;")
+    con.execute("DELETE FROM domain_bridges;")
+    con.execute("DELETE FROM graph_analytics;")
+    # Los resultados se escriben por claves enteras (asset_pk / dep_pk) en tablas temporales y los
+    # identificadores de texto se copian con un único INSERT ... SELECT: no pasan por Python
+    con.execute("DROP TABLE IF EXISTS temp.analytics_metrics;")
+    con.execute("DROP TABLE IF EXISTS temp.analytics_bridges;")
+    con.execute("""
+        CREATE TEMP TABLE analytics_metrics (
+          asset_pk INTEGER PRIMARY KEY, fan_in, fan_out, depth, scc_id, scc_size, is_orphan
+        );
+    """)
+    con.execute("CREATE TEMP TABLE analytics_bridges (dep_pk INTEGER PRIMARY KEY, from_domain, to_domain);")
+    con.executemany(
+        "INSERT INTO temp.analytics_metrics VALUES (?, ?, ?, ?, ?, ?, ?);",
+        zip(pks.tolist(), result["fan_in"].tolist(), result["fan_out"].tolist(), result["depth"].tolist(),
+            result["scc_id"].tolist(), result["scc_size"].tolist(), result["is_orphan"].astype(int).tolist()),
+    )
+    b = result["bridges"]
+    domains = graph["domains"]
+    con.executemany(
+        "INSERT INTO temp.analytics_bridges VALUES (?, ?, ?);",
+        ((pk, domains[f], domains[t]) for pk, f, t in zip(graph["dep_pks"][b].tolist(),
+                                                          graph["domain"][src[b]].tolist(),
+                                                          graph["domain"][dst[b]].tolist())),
+    )
+    con.execute("""
+        INSERT INTO asset_metrics (asset_id, fan_in, fan_out, depth, scc_id, scc_size, is_orphan)
+        SELECT a.asset_id, m.fan_in, m.fan_out, m.depth, m.scc_id, m.scc_size, m.is_orphan
+        FROM temp.analytics_metrics m JOIN assets a ON a.asset_pk = m.asset_pk;
+    """)
+    con.execute("""
+        INSERT INTO domain_bridges (dependency_id, from_asset, to_asset, from_domain, to_domain, dependency_type)
+        SELECT d.dependency_id, d.from_asset, d.to_asset, b.from_domain, b.to_domain, d.dependency_type
+        FROM temp.analytics_bridges b JOIN dependencies d ON d.dep_pk = b.dep_pk;
+    """)
+    con.execute("DROP TABLE temp.analytics_metrics;")
+    con.execute("DROP TABLE temp.analytics_bridges;")
+    con.execute(
+        f"INSERT INTO graph_analytics ({', '.join(summary)}) VALUES ({', '.join('?' for _ in summary)});",
+        tuple(summary.values()),
+    )
+    logger.info("Analítica del grafo (versión %s): %d ciclos, %d huérfanos, %d puentes, profundidad máxima %d",
+                version, summary["n_cyclic_components"], summary["n_orphans"], summary["n_bridges"],
+                summary["max_depth"], extra=summary)
+    return summary
+
+
+def analytics_version(db_path: Path):
+    """
+    Versión del catálogo a la que corresponde la analítica guardada, o None si no la hay.
+    """
+    con = sqlite3.connect(db_path)
+    try:
+        row = con.execute("SELECT version FROM graph_analytics;").fetchone()
+    except sqlite3.OperationalError:
+        # BD creada antes de existir la analítica
+        return None
+    finally:
+        con.close()
+    return None if row is None else row[0]
+
+
+def refresh_graph_analytics(db_path: Path, acyclic_types: list = None) -> dict:
+    """
+    Recalcula la analítica de la última versión del catálogo de una BD existente.
+    """
+    import src.database.create_db as create_db
+
+    create_db.create_db(Path(db_path), recreate=False)
+    con = sqlite3.connect(db_path)
+    try:
+        row = con.execute("SELECT MAX(version) FROM catalog_versions;").fetchone()
+        if row[0] is None:
+            raise ValueError(f"{db_path} no tiene ninguna versión del catálogo registrada")
+        with con:
+            return analyze_catalog(con, row[0], acyclic_types)
+    finally:
+        con.close()
+
+#===============================================[MAIN]===============================================
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Recalcula la analítica estructural del grafo del catálogo.")
+    parser.add_argument("--db", required=True, help="Ruta del fichero .db")
+    args = parser.parse_args(argv)
+    summary = refresh_graph_analytics(Path(args.db))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Versionado del catálogo de activos cargado en la BD SQLite.
+
+Cada carga del catálogo registra una fila en catalog_versions con el hash del fichero origen
+y un hash del contenido de assets + dependencies. Las cachés derivadas del catálogo
+(snapshots del grafo, índices de alcanzabilidad...) usan ese hash de contenido como clave.
+"""
+
+#===============================================[IMPORTS]===============================================
+import hashlib
+import sqlite3
+from pathlib import Path
+
+from src.database.create_db import ASSET_COLUMNS, DEPENDENCY_COLUMNS
+
+#===============================================[CATALOG_VERSIONING]===============================================
+def hash_source_file(path: Path) -> str:
+    """
+    Calcula el hash SHA-256 del fichero origen del catálogo (leído por bloques).
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def compute_content_hash(con: sqlite3.Connection) -> str:
+    """
+    Calcula un hash SHA-256 del contenido de assets y dependencies (ordenado por clave estable),
+    independiente de las claves autoincrementales. Sirve de clave para cachés derivadas del catálogo.
+    """
+    h = hashlib.sha256()
+    for table, columns in (("assets", ASSET_COLUMNS), ("dependencies", DEPENDENCY_COLUMNS)):
+        h.update(table.encode())
+        cur = con.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {columns[0]};")
+        for row in cur:
+            h.update(repr(row).encode())
+    return h.hexdigest()
+
+def get_catalog_version(db_path: Path):
+    """
+    Retorna la última versión del catálogo registrada en la BD como dict
+    (version, source_hash, content_hash, loaded_at) o None si aún no hay ninguna.
+    """
+    con = sqlite3.connect(db_path)
+    try:
+        row = con.execute("""
+            SELECT version, source_hash, content_hash, loaded_at
+            FROM catalog_versions ORDER BY version DESC LIMIT 1;
+        """).fetchone()
+    except sqlite3.OperationalError:
+        # BD creada antes de existir el versionado
+        return None
+    finally:
+        con.close()
+
+    if row is None:
+        return None
+    return dict(version=row[0], source_hash=row[1], content_hash=row[2], loaded_at=row[3])
+
+def record_catalog_version(con: sqlite3.Connection, source_path: Path, source_hash: str, mode: str,
+                           stats: dict, changelog: list) -> int:
+    """
+    Registra una nueva versión del catálogo y su changelog dentro de la transacción actual.
+    - stats: contadores {assets_inserted, assets_updated, ..., deps_deleted}
+    - changelog: lista de tuplas (table_name, row_key, operation)
+    Retorna el número de versión asignado.
+    """
+    cur = con.execute("""
+        INSERT INTO catalog_versions (
+            source_path, source_hash, content_hash, mode,
+            assets_inserted, assets_updated, assets_deleted,
+            deps_inserted, deps_updated, deps_deleted
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+    """, (
+        str(source_path), source_hash, compute_content_hash(con), mode,
+        stats.get("assets_inserted", 0), stats.get("assets_updated", 0), stats.get("assets_deleted", 0),
+        stats.get("deps_inserted", 0), stats.get("deps_updated", 0), stats.get("deps_deleted", 0),
+    ))
+    version = cur.lastrowid
+    con.executemany(
+        "INSERT INTO catalog_changelog (version, table_name, row_key, operation) VALUES (?, ?, ?, ?);",
+        ((version, table, key, op) for table, key, op in changelog),
+    )
+    return version
+
+
+def get_content_hash(db_path: Path) -> str:
+    """
+    Retorna el hash de contenido del catálogo: el registrado en la última versión
+    o, si la BD no tiene versionado, el calculado directamente sobre las tablas.
+    """
+    current = get_catalog_version(db_path)
+    if current is not None:
+        return current["content_hash"]
+
+    con = sqlite3.connect(db_path)
+    try:
+        return compute_content_hash(con)
+    finally:
+        con.close()
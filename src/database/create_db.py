@@ -3,6 +3,8 @@
 Crea una base de datos SQLite para el TFG con tablas:
 - assets
 - dependencies
+- catalog_versions / catalog_changelog (versionado de las cargas del catálogo)
+- graph_analytics / asset_metrics / domain_bridges (analítica del grafo, ver src/database/analytics.py)
 
 Por defecto se crea la BD en el directorio actual (working directory).
 
@@ -19,6 +21,16 @@ from pathlib import Path
 
 #===============================================[DATABASE_SCHEMA]===============================================
 
+# Columnas de negocio (sin claves autoincrementales) de cada tabla, en el orden del esquema
+ASSET_COLUMNS = [
+    "asset_id", "name", "asset_type", "domain", "criticality",
+    "cia_c", "cia_i", "cia_a", "operational_state",
+]
+DEPENDENCY_COLUMNS = [
+    "dependency_id", "from_asset", "to_asset", "dependency_type",
+    "cia_couple_c", "cia_couple_i", "cia_couple_a",
+]
+
 # Definición del esquema de la base de datos en lenguaje SQL
 DataDefinitionLanguage = """
 PRAGMA foreign_keys = ON;
@@ -59,7 +71,79 @@ CREATE TABLE IF NOT EXISTS dependencies (
 
 -- Índices útiles para consultas y construcción de grafo
 CREATE INDEX IF NOT EXISTS idx_deps_from_asset ON dependencies(from_asset);
-CREATE INDEX IF NOT EXISTS idx_deps_to_asset   ON dependencies(to_asset);
+-- Índice cubriente para la propagación hacia los consumidores (grafo.get_infected_nodes_sql):
+-- cada salto se resuelve solo con el índice, sin leer las filas de dependencies.
+-- Sustituye a idx_deps_to_asset(to_asset), que se elimina de las bases ya creadas
+DROP INDEX IF EXISTS idx_deps_to_asset;
+CREATE INDEX IF NOT EXISTS idx_deps_to_from    ON dependencies(to_asset, from_asset, dependency_type);
+-- Índice cubriente para las subconsultas por dominio (SELECT asset_id FROM assets WHERE domain = ?)
+CREATE INDEX IF NOT EXISTS idx_assets_domain   ON assets(domain, asset_id);
+
+-- Versiones del catálogo: una fila por carga/sincronización que cambia el fichero origen
+CREATE TABLE IF NOT EXISTS catalog_versions (
+  version             INTEGER PRIMARY KEY AUTOINCREMENT,
+  source_path         TEXT NOT NULL,
+  source_hash         TEXT NOT NULL, -- SHA-256 del fichero origen (Excel)
+  content_hash        TEXT NOT NULL, -- SHA-256 del contenido de assets + dependencies tras la carga
+  mode                TEXT NOT NULL CHECK (mode IN ('full', 'sync')),
+  loaded_at           TEXT NOT NULL DEFAULT (datetime('now')),
+  assets_inserted     INTEGER NOT NULL DEFAULT 0,
+  assets_updated      INTEGER NOT NULL DEFAULT 0,
+  assets_deleted      INTEGER NOT NULL DEFAULT 0,
+  deps_inserted       INTEGER NOT NULL DEFAULT 0,
+  deps_updated        INTEGER NOT NULL DEFAULT 0,
+  deps_deleted        INTEGER NOT NULL DEFAULT 0
+);
+
+-- Registro de cambios por versión (claves asset_id / dependency_id afectadas)
+CREATE TABLE IF NOT EXISTS catalog_changelog (
+  version    INTEGER NOT NULL,
+  table_name TEXT NOT NULL CHECK (table_name IN ('assets', 'dependencies')),
+  row_key    TEXT NOT NULL,
+  operation  TEXT NOT NULL CHECK (operation IN ('insert', 'update', 'delete')),
+  PRIMARY KEY (version, table_name, row_key),
+  FOREIGN KEY (version) REFERENCES catalog_versions(version) ON DELETE CASCADE
+);
+
+-- Analítica estructural del grafo, recalculada en cada carga dentro de la misma transacción.
+-- Son datos derivados: sin claves foráneas, para no interferir con el borrado/recarga del catálogo.
+CREATE TABLE IF NOT EXISTS graph_analytics (
+  version             INTEGER PRIMARY KEY, -- versión del catálogo analizada
+  content_hash        TEXT NOT NULL,
+  computed_at         TEXT NOT NULL DEFAULT (datetime('now')),
+  n_assets            INTEGER NOT NULL,
+  n_dependencies      INTEGER NOT NULL,
+  n_components        INTEGER NOT NULL, -- componentes fuertemente conexas
+  n_cyclic_components INTEGER NOT NULL, -- componentes de más de un activo (ciclos de dependencias)
+  n_cyclic_assets     INTEGER NOT NULL,
+  n_orphans           INTEGER NOT NULL,
+  n_bridges           INTEGER NOT NULL,
+  max_depth           INTEGER NOT NULL
+);
+
+-- Métricas por activo
+CREATE TABLE IF NOT EXISTS asset_metrics (
+  asset_id  TEXT PRIMARY KEY,
+  fan_in    INTEGER NOT NULL, -- consumidores directos (dependencias con to_asset = asset_id)
+  fan_out   INTEGER NOT NULL, -- proveedores directos (dependencias con from_asset = asset_id)
+  depth     INTEGER NOT NULL, -- cadena de dependencias más larga hasta un proveedor raíz
+  scc_id    INTEGER NOT NULL, -- componente fuertemente conexa
+  scc_size  INTEGER NOT NULL,
+  is_orphan INTEGER NOT NULL CHECK (is_orphan IN (0, 1))
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_asset_metrics_scc    ON asset_metrics(scc_size, scc_id);
+CREATE INDEX IF NOT EXISTS idx_asset_metrics_orphan ON asset_metrics(is_orphan);
+
+-- Dependencias entre activos de dominios distintos
+CREATE TABLE IF NOT EXISTS domain_bridges (
+  dependency_id   TEXT PRIMARY KEY,
+  from_asset      TEXT NOT NULL,
+  to_asset        TEXT NOT NULL,
+  from_domain     TEXT NOT NULL,
+  to_domain       TEXT NOT NULL,
+  dependency_type TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bridges_domains ON domain_bridges(from_domain, to_domain);
 """
 
 #===============================================[FUNCTIONS]===============================================
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Generador de catálogos MDO sintéticos para pruebas de carga.
+
+Escribe catálogos válidos directamente en el esquema de create_db (.db), o en los formatos que
+acepta load_data: Excel (.xlsx, hojas "Assets" y "Dependencies") o CSV (directorio con
+assets.csv y dependencies.csv).
+
+- Dominios, tipos de activo y tipos de dependencia salen de Configs/constants.json.
+- Los pesos CIA de cada activo suman exactamente 1 (centésimas enteras) y no hay autobucles
+  ni dependencias duplicadas.
+- Parámetros ajustables: número de activos, distribución del fan-out (dependencias por activo),
+  sesgo del fan-in (concentración en activos "hub"), proporción de dependencias entre dominios
+  y densidad de ciclos (fracción de dependencias hacia activos posteriores). Las dependencias de
+  los tipos de acyclic_dependency_types siempre apuntan a activos anteriores: el catálogo cumple
+  la política de ciclos que aplica load_data.
+- Las filas se generan por bloques y se escriben según se generan: la memoria no depende del
+  número de filas (solo se mantiene el dominio de cada activo, 1 byte por activo, y un índice
+  de activos por dominio).
+- Reproducible: cada bloque usa su propio generador derivado de (semilla, tabla, bloque).
+
+Uso:
+  python -m src.database.generate_catalog --assets 1000000 --out /tmp/catalog.db
+  python -m src.database.generate_catalog --assets 50000 --out /tmp/catalog.xlsx --fan-out 2.5
+  python -m src.database.generate_catalog --assets 10000 --out /tmp/catalog_csv --cycle-density 0.05
+"""
+
+#===============================================[IMPORTS]===============================================
+import argparse
+import csv
+import hashlib
+import json
+import sqlite3
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+import src.database.create_db as create_db
+from src.database.create_db import ASSET_COLUMNS, DEPENDENCY_COLUMNS
+from src.database.catalog_version import record_catalog_version
+from src.database.analytics import POLICY_KEY, analyze_catalog
+
+#===============================================[CONSTANTS]===============================================
+CONSTANTS_PATH = Path(__file__).parent.parent.parent / "Configs" / "constants.json"
+FAN_OUT_DISTRIBUTIONS = ("poisson", "geometric", "fixed")
+OPERATIONAL_STATE = "Operativo"
+# Activos por bloque generado/escrito
+CHUNK_SIZE = 50_000
+# Límite de filas de una hoja Excel (incluida la cabecera)
+EXCEL_MAX_ROWS = 1_048_576
+ASSETS_CSV = "assets.csv"
+DEPENDENCIES_CSV = "dependencies.csv"
+
+# Componentes de la semilla de cada generador
+_DOMAIN_STREAM, _ASSET_STREAM, _DEPENDENCY_STREAM = 0, 1, 2
+
+#===============================================[SPECIFICATION]===============================================
+@dataclass
+class CatalogSpec:
+    """
+    Parámetros del catálogo sintético.
+
+    - fan_out:            dependencias (proveedores) medias por activo
+    - fan_out_dist:       "poisson", "geometric" (cola larga) o "fixed"
+    - max_fan_out:        tope de dependencias por activo
+    - fan_in_skew:        1 = proveedores uniformes; >1 concentra las dependencias en pocos activos
+    - inter_domain_ratio: probabilidad de que una dependencia cruce de dominio
+    - cycle_density:      fracción de dependencias hacia activos posteriores (0 = grafo acíclico);
+                          no se aplica a los tipos de acyclic_dependency_types
+    - locality:           si > 0, los proveedores se eligen entre los `locality` activos del dominio
+                          más próximos al consumidor: valores pequeños generan cadenas profundas
+    """
+    n_assets: int
+    fan_out: float = 1.5
+    fan_out_dist: str = "poisson"
+    max_fan_out: int = 50
+    fan_in_skew: float = 2.0
+    inter_domain_ratio: float = 0.2
+    cycle_density: float = 0.0
+    locality: int = 0
+    seed: int = 0
+
+    def validate(self) -> None:
+        if self.n_assets < 1:
+            raise ValueError("El catálogo debe tener al menos un activo")
+        if self.fan_out_dist not in FAN_OUT_DISTRIBUTIONS:
+            raise ValueError(f"Distribución de fan-out no soportada: {self.fan_out_dist}")
+        if self.fan_out < 0 or self.max_fan_out < 0 or self.locality < 0 or self.fan_in_skew <= 0:
+            raise ValueError("fan_out, max_fan_out y locality deben ser >= 0 y fan_in_skew > 0")
+        for name in ("inter_domain_ratio", "cycle_density"):
+            if not 0.0 <= getattr(self, name) <= 1.0:
+                raise ValueError(f"{name} debe estar en [0, 1]")
+
+    @property
+    def spec_hash(self) -> str:
+        return hashlib.sha256(json.dumps(asdict(self), sort_keys=True).encode("utf-8")).hexdigest()
+
+#===============================================[GENERATION]===============================================
+def read_vocabularies() -> dict:
+    """
+    Dominios, tipos de activo, tipos de dependencia y tipos acíclicos de Configs/constants.json.
+    """
+    with open(CONSTANTS_PATH, "r", encoding="utf-8") as f:
+        constants = json.load(f)
+    return dict(
+        domains=list(constants["dominios"]),
+        asset_types=list(constants["asset_types"]),
+        dependency_types=list(constants["dependencies_types"]),
+        acyclic_types=list(constants.get(POLICY_KEY, [])),
+    )
+
+
+def _rng(spec: CatalogSpec, stream: int, chunk: int = 0) -> np.random.Generator:
+    return np.random.default_rng([spec.seed, stream, chunk])
+
+
+def asset_ids(start: int, stop: int, n_assets: int) -> list:
+    """
+    Identificadores de los activos [start, stop) de un catálogo de n_assets activos.
+    """
+    width = _id_width(n_assets)
+    return [f"asset_{i:0{width}d}" for i in range(start, stop)]
+
+
+def _id_width(n: int) -> int:
+    return max(3, len(str(max(n - 1, 0))))
+
+
+def assign_domains(spec: CatalogSpec, n_domains: int) -> np.ndarray:
+    """
+    Dominio (índice) de cada activo: (n_assets,) uint8.
+    """
+    return _rng(spec, _DOMAIN_STREAM).integers(0, n_domains, spec.n_assets, dtype=np.uint8)
+
+
+def iter_assets(spec: CatalogSpec, vocab: dict, domains: np.ndarray, chunk_size: int = CHUNK_SIZE):
+    """
+    Genera las filas de assets (tuplas en el orden de ASSET_COLUMNS) por bloques.
+    """
+    for chunk, start in enumerate(range(0, spec.n_assets, chunk_size)):
+        stop = min(start + chunk_size, spec.n_assets)
+        rng = _rng(spec, _ASSET_STREAM, chunk)
+        k = stop - start
+
+        types = rng.integers(0, len(vocab["asset_types"]), k)
+        criticality = np.round(rng.uniform(0.1, 1.0, k), 2)
+        # Dos cortes enteros en [0, 100]: reparto uniforme de las centésimas CIA que suma 100
+        cuts = np.sort(rng.integers(0, 101, (k, 2)), axis=1)
+        cia = np.stack([cuts[:, 0], cuts[:, 1] - cuts[:, 0], 100 - cuts[:, 1]], axis=1) / 100
+
+        ids = asset_ids(start, stop, spec.n_assets)
+        yield [
+            (asset_id, f"Activo {start + i}", vocab["asset_types"][t], vocab["domains"][d],
+             crit, c, integ, a, OPERATIONAL_STATE)
+            for i, (asset_id, t, d, crit, (c, integ, a)) in enumerate(zip(
+                ids, types.tolist(), domains[start:stop].tolist(), criticality.tolist(), cia.tolist()
+            ))
+        ]
+
+
+def _fan_out(spec: CatalogSpec, rng: np.random.Generator, k: int) -> np.ndarray:
+    if spec.fan_out_dist == "poisson":
+        counts = rng.poisson(spec.fan_out, k)
+    elif spec.fan_out_dist == "geometric":
+        # Geométrica en {0, 1, ...} con media fan_out
+        counts = rng.geometric(1.0 / (1.0 + spec.fan_out), k) - 1
+    else:
+        counts = np.full(k, int(round(spec.fan_out)))
+    return np.minimum(counts, spec.max_fan_out)
+
+
+def iter_dependencies(spec: CatalogSpec, vocab: dict, domains: np.ndarray, chunk_size: int = CHUNK_SIZE):
+    """
+    Genera las filas de dependencies (tuplas en el orden de DEPENDENCY_COLUMNS) por bloques de consumidores.
+
+    Cada consumidor i elige su número de proveedores según la distribución de fan-out. Cada
+    proveedor está en el dominio de i (o en otro, con probabilidad inter_domain_ratio) y es un
+    activo anterior a i (o posterior, con probabilidad cycle_density, lo que puede cerrar ciclos),
+    salvo si el tipo de la dependencia está en vocab["acyclic_types"]: esas siempre apuntan a un
+    activo anterior, así que nunca forman ciclos entre ellas. La elección está opcionalmente
+    limitada a los `locality` más próximos. Entre los candidatos se elige la posición
+    u^fan_in_skew (u uniforme): con sesgo > 1 los primeros candidatos acumulan la mayoría de
+    dependencias.
+    """
+    n_domains = len(vocab["domains"])
+    acyclic = np.isin(vocab["dependency_types"], vocab.get("acyclic_types", []))
+    members = [np.flatnonzero(domains == d) for d in range(n_domains)]
+    width = _id_width(spec.n_assets)
+    dep_width = _id_width(spec.n_assets * max(spec.max_fan_out, 1))
+    next_id = 0
+
+    for chunk, start in enumerate(range(0, spec.n_assets, chunk_size)):
+        stop = min(start + chunk_size, spec.n_assets)
+        rng = _rng(spec, _DEPENDENCY_STREAM, chunk)
+
+        consumers = np.repeat(np.arange(start, stop), _fan_out(spec, rng, stop - start))
+        m = len(consumers)
+        own = domains[consumers].astype(np.int64)
+        shift = rng.integers(1, max(n_domains, 2), m)
+        cross = (rng.random(m) < spec.inter_domain_ratio) & (n_domains > 1)
+        target = np.where(cross, (own + shift) % n_domains, own)
+        later = rng.random(m) < spec.cycle_density
+        u = rng.random(m) ** spec.fan_in_skew
+        dep_types = rng.integers(0, len(vocab["dependency_types"]), m)
+        later &= ~acyclic[dep_types]
+
+        providers = np.full(m, -1, dtype=np.int64)
+        for d in range(n_domains):
+            mask = target == d
+            idx = members[d]
+            if not mask.any() or not len(idx):
+                continue
+            # Candidatos: activos del dominio anteriores (o posteriores) al consumidor
+            below = np.searchsorted(idx, consumers[mask], side="left")
+            above = np.searchsorted(idx, consumers[mask], side="right")
+            count = np.where(later[mask], len(idx) - above, below)
+            if spec.locality:
+                count = np.minimum(count, spec.locality)
+            offset = np.where(later[mask], above, below - count)
+            pos = offset + np.minimum((u[mask] * count).astype(np.int64), np.maximum(count - 1, 0))
+            providers[mask] = np.where(count > 0, idx[np.minimum(pos, len(idx) - 1)], -1)
+
+        valid = (providers >= 0) & (providers != consumers)
+        pairs, first = np.unique(np.stack([consumers[valid], providers[valid]], axis=1), axis=0, return_index=True)
+        if not len(pairs):
+            continue
+
+        k = len(pairs)
+        dep_types = dep_types[valid][first]
+        couples = np.round(rng.uniform(0.0, 1.0, (k, 3)), 2)
+        rows = []
+        for (a, b), t, (cc, ci, ca) in zip(pairs.tolist(), dep_types.tolist(), couples.tolist()):
+            rows.append((
+                f"dep_{next_id:0{dep_width}d}", f"asset_{a:0{width}d}", f"asset_{b:0{width}d}",
+                vocab["dependency_types"][t], cc, ci, ca,
+            ))
+            next_id += 1
+        yield rows
+
+#===============================================[WRITERS]===============================================
+def _write_db(path: Path, spec: CatalogSpec, assets, dependencies) -> dict:
+    create_db.create_db(path, recreate=True)
+    con = sqlite3.connect(path)
+    counts = dict(assets=0, dependencies=0)
+    try:
+        con.execute("PRAGMA foreign_keys = ON;")
+        with con:
+            for table, columns, chunks in (("assets", ASSET_COLUMNS, assets),
+                                           ("dependencies", DEPENDENCY_COLUMNS, dependencies)):
+                sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))});"
+                for rows in chunks:
+                    con.executemany(sql, rows)
+                    counts[table] += len(rows)
+            stats = dict(assets_inserted=counts["assets"], deps_inserted=counts["dependencies"])
+            version = record_catalog_version(con, f"generate_catalog:{path.name}", spec.spec_hash, "full", stats, [])
+            analyze_catalog(con, version)
+    finally:
+        con.close()
+    return counts
+
+
+def _write_csv(directory: Path, assets, dependencies) -> dict:
+    directory.mkdir(parents=True, exist_ok=True)
+    counts = dict(assets=0, dependencies=0)
+    for name, table, columns, chunks in ((ASSETS_CSV, "assets", ASSET_COLUMNS, assets),
+                                         (DEPENDENCIES_CSV, "dependencies", DEPENDENCY_COLUMNS, dependencies)):
+        with open(directory / name, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for rows in chunks:
+                writer.writerows(rows)
+                counts[table] += len(rows)
+    return counts
+
+
+def _write_excel(path: Path, assets, dependencies) -> dict:
+    from openpyxl import Workbook
+
+    # Modo write-only: las filas se vuelcan a disco según se añaden
+    workbook = Workbook(write_only=True)
+    counts = dict(assets=0, dependencies=0)
+    for sheet, table, columns, chunks in (("Assets", "assets", ASSET_COLUMNS, assets),
+                                          ("Dependencies", "dependencies", DEPENDENCY_COLUMNS, dependencies)):
+        worksheet = workbook.create_sheet(sheet)
+        worksheet.append(columns)
+        for rows in chunks:
+            if counts[table] + len(rows) >= EXCEL_MAX_ROWS:
+                raise ValueError(f"La hoja {sheet} supera el límite de filas de Excel: usa .db o CSV")
+            for row in rows:
+                worksheet.append(row)
+            counts[table] += len(rows)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    workbook.save(path)
+    return counts
+
+
+def output_format(out: Path) -> str:
+    """
+    Formato de salida según la ruta: "db", "excel" o "csv" (directorio).
+    """
+    suffix = Path(out).suffix.lower()
+    if suffix in (".db", ".sqlite", ".sqlite3"):
+        return "db"
+    if suffix in (".xlsx", ".xlsm"):
+        return "excel"
+    if suffix == "":
+        return "csv"
+    raise ValueError(f"Formato de salida no soportado: {out} (usa .db, .xlsx o un directorio para CSV)")
+
+
+def generate_catalog(out: Path, spec: CatalogSpec, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Genera el catálogo descrito por `spec` en `out` (.db, .xlsx o directorio CSV).
+
+    Returns:
+        dict con "format", "assets" y "dependencies" (filas escritas)
+    """
+    spec.validate()
+    out = Path(out)
+    fmt = output_format(out)
+    if fmt == "excel" and spec.n_assets >= EXCEL_MAX_ROWS:
+        raise ValueError(f"{spec.n_assets} activos superan el límite de filas de Excel: usa .db o CSV")
+
+    vocab = read_vocabularies()
+    domains = assign_domains(spec, len(vocab["domains"]))
+    assets = iter_assets(spec, vocab, domains, chunk_size)
+    dependencies = iter_dependencies(spec, vocab, domains, chunk_size)
+
+    if fmt == "db":
+        counts = _write_db(out, spec, assets, dependencies)
+    elif fmt == "excel":
+        counts = _write_excel(out, assets, dependencies)
+    else:
+        counts = _write_csv(out, assets, dependencies)
+    return dict(format=fmt, **counts)
+
+#===============================================[MAIN]===============================================
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Genera catálogos MDO sintéticos (.db, .xlsx o CSV).")
+    parser.add_argument("--assets", type=int, required=True, help="Número de activos")
+    parser.add_argument("--out", required=True, help="Fichero .db / .xlsx, o directorio para CSV")
+    parser.add_argument("--fan-out", type=float, default=1.5, help="Dependencias medias por activo")
+    parser.add_argument("--fan-out-dist", choices=FAN_OUT_DISTRIBUTIONS, default="poisson",
+                        help="Distribución del número de dependencias por activo")
+    parser.add_argument("--max-fan-out", type=int, default=50, help="Máximo de dependencias por activo")
+    parser.add_argument("--fan-in-skew", type=float, default=2.0,
+                        help="Concentración de dependencias en activos hub (1 = uniforme)")
+    parser.add_argument("--inter-domain", type=float, default=0.2, help="Proporción de dependencias entre dominios")
+    parser.add_argument("--cycle-density", type=float, default=0.0,
+                        help="Fracción de dependencias hacia activos posteriores (0 = acíclico)")
+    parser.add_argument("--locality", type=int, default=0,
+                        help="Proveedores entre los N activos más próximos del dominio (0 = sin límite)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla")
+    args = parser.parse_args(argv)
+
+    spec = CatalogSpec(
+        n_assets=args.assets, fan_out=args.fan_out, fan_out_dist=args.fan_out_dist, max_fan_out=args.max_fan_out,
+        fan_in_skew=args.fan_in_skew, inter_domain_ratio=args.inter_domain, cycle_density=args.cycle_density,
+        locality=args.locality, seed=args.seed,
+    )
+    result = generate_catalog(Path(args.out), spec)
+    print(f"OK: catálogo {result['format']} en {args.out} "
+          f"({result['assets']} activos, {result['dependencies']} dependencias)")
+
+#===============================================[ENTRY_POINT]===============================================
+if __name__ == "__main__":
+    main()
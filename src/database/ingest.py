@@ -0,0 +1,240 @@
+"""
+Lectura por bloques de las fuentes del catálogo (CSV, Parquet, JSONL y Excel) y validación incremental.
+
+Fuentes admitidas por load_data.load_and_insert_data:
+- Un directorio con assets.<ext> y dependencies.<ext> (ext: csv, parquet o jsonl).
+- Un libro Excel con las hojas "Assets" y "Dependencies". Se convierte una sola vez (openpyxl en
+  modo read-only, fila a fila) a una caché columnar junto a la BD, en
+  <directorio de la BD>/catalog_cache/excel_<hash>/; las cargas siguientes del mismo fichero leen la caché.
+
+Cada tabla se lee en DataFrames de como mucho `chunk_size` filas. KnownAssetIds mantiene los asset_id
+ya vistos como hashes de 64 bits ordenados (8 bytes por activo, sin objetos str de Python) para
+detectar duplicados y comprobar las referencias de las dependencias bloque a bloque.
+"""
+
+#===============================================[IMPORTS]===============================================
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+#===============================================[CONSTANTS]===============================================
+DEFAULT_CHUNK_SIZE = 50_000
+CACHE_DIRNAME = "catalog_cache"
+TABLE_SHEETS = {"assets": "Assets", "dependencies": "Dependencies"}
+SOURCE_FORMATS = {".csv": "csv", ".parquet": "parquet", ".jsonl": "jsonl"}
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+# Ejemplos que se incluyen en los mensajes de error de validación
+MAX_REPORTED = 20
+
+#===============================================[SOURCES]===============================================
+def table_source(directory: Path, table: str) -> Path:
+    """
+    Fichero de la tabla `table` ("assets" o "dependencies") dentro de un directorio de catálogo.
+    """
+    found = [directory / f"{table}{suffix}" for suffix in SOURCE_FORMATS if (directory / f"{table}{suffix}").exists()]
+    if len(found) != 1:
+        raise ValueError(
+            f"{directory} debe contener exactamente un fichero {table}.csv, {table}.parquet o {table}.jsonl"
+            f" (encontrados: {[p.name for p in found]})"
+        )
+    return found[0]
+
+
+def hash_catalog_source(path: Path) -> str:
+    """
+    SHA-256 del origen del catálogo: del fichero, o de los ficheros de tablas de un directorio.
+    """
+    from src.database.catalog_version import hash_source_file
+
+    path = Path(path)
+    if not path.is_dir():
+        return hash_source_file(path)
+    h = hashlib.sha256()
+    for table in TABLE_SHEETS:
+        source = table_source(path, table)
+        h.update(f"{source.name}:{hash_source_file(source)}".encode())
+    return h.hexdigest()
+
+
+def resolve_sources(path: Path, cache_root: Path, source_hash: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Ficheros {"assets": Path, "dependencies": Path} del catálogo; un Excel se convierte antes a la caché.
+    """
+    path = Path(path)
+    if path.is_dir():
+        return {table: table_source(path, table) for table in TABLE_SHEETS}
+    if path.suffix.lower() in EXCEL_SUFFIXES:
+        return cached_excel_sources(path, Path(cache_root), source_hash, chunk_size)
+    raise ValueError(f"Origen de catálogo no soportado: {path} (usa un Excel o un directorio con CSV/Parquet/JSONL)")
+
+#===============================================[EXCEL_CACHE]===============================================
+def _cache_format() -> str:
+    try:
+        import pyarrow  # noqa: F401
+        return ".parquet"
+    except ImportError:
+        return ".csv"
+
+
+def cached_excel_sources(excel_path: Path, cache_root: Path, source_hash: str,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Convierte (una sola vez por versión del fichero) las hojas del Excel a Parquet, o a CSV si
+    pyarrow no está instalado. Las celdas se guardan como texto: los tipos se fijan al limpiar.
+    """
+    suffix = _cache_format()
+    cache_dir = cache_root / f"excel_{source_hash[:16]}"
+    sources = {table: cache_dir / f"{table}{suffix}" for table in TABLE_SHEETS}
+    if all(p.exists() for p in sources.values()):
+        return sources
+
+    from openpyxl import load_workbook
+
+    tmp_dir = cache_dir.with_name(f"{cache_dir.name}.tmp{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        for table, sheet in TABLE_SHEETS.items():
+            rows = workbook[sheet].iter_rows(values_only=True)
+            header = [str(c).strip() for c in next(rows)]
+            _write_chunks(tmp_dir / f"{table}{suffix}", header, rows, chunk_size)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    finally:
+        workbook.close()
+
+    # Escritura atómica: el directorio solo aparece completo
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    tmp_dir.rename(cache_dir)
+
+    # Las cachés de versiones anteriores del Excel ya no se usan
+    for directory in cache_root.glob("excel_*"):
+        if directory.is_dir() and directory != cache_dir and ".tmp" not in directory.name:
+            shutil.rmtree(directory, ignore_errors=True)
+    return sources
+
+
+def _row_blocks(rows, width: int, chunk_size: int):
+    """
+    Filas de una hoja (sin las vacías) en bloques de `chunk_size`, con las celdas como texto.
+    Siempre produce al menos un bloque (vacío si la hoja solo tiene cabecera).
+    """
+    block = []
+    for row in rows:
+        if all(v is None for v in row):
+            continue
+        block.append(tuple(None if v is None else str(v) for v in row[:width]))
+        if len(block) == chunk_size:
+            yield block
+            block = []
+    yield block
+
+
+def _write_chunks(path: Path, header: list, rows, chunk_size: int) -> None:
+    if path.suffix == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([(name, pa.string()) for name in header])
+        with pq.ParquetWriter(path, schema) as writer:
+            for block in _row_blocks(rows, len(header), chunk_size):
+                columns = list(zip(*block)) if block else [()] * len(header)
+                writer.write_table(pa.table([pa.array(col, pa.string()) for col in columns], schema=schema))
+    else:
+        for i, block in enumerate(_row_blocks(rows, len(header), chunk_size)):
+            pd.DataFrame(block, columns=header).to_csv(path, mode="a" if i else "w", header=not i, index=False)
+
+#===============================================[READERS]===============================================
+def iter_table(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    DataFrames de como mucho `chunk_size` filas de un fichero CSV, Parquet o JSONL.
+    En CSV todas las columnas se leen como texto (conserva identificadores como "001"); las celdas
+    vacías se leen como nulos, igual que con pandas.read_excel.
+    """
+    path = Path(path)
+    fmt = SOURCE_FORMATS.get(path.suffix.lower())
+    if fmt == "csv":
+        yield from pd.read_csv(path, dtype=str, chunksize=chunk_size)
+    elif fmt == "jsonl":
+        with pd.read_json(path, lines=True, dtype=False, precise_float=True, chunksize=chunk_size) as reader:
+            yield from reader
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Formato de tabla no soportado: {path}")
+
+#===============================================[CHUNKED_VALIDATION]===============================================
+def hash_ids(ids) -> np.ndarray:
+    """
+    Hash de 64 bits (vectorizado) de una serie de identificadores.
+    """
+    return pd.util.hash_pandas_object(pd.Series(ids, dtype=object).astype(str), index=False).to_numpy()
+
+
+class KnownAssetIds:
+    """
+    Conjunto de asset_id como hashes de 64 bits ordenados (8 bytes por activo).
+
+    Una colisión de hash (probabilidad ~n²/2^65, < 1e-7 con un millón de activos) solo podría
+    dar un duplicado falso o dejar pasar una referencia inexistente; esto último lo detecta
+    igualmente la comprobación de claves foráneas de la BD.
+    """
+
+    def __init__(self):
+        self._sorted = np.empty(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def contains(self, ids) -> np.ndarray:
+        h = hash_ids(ids)
+        pos = np.minimum(np.searchsorted(self._sorted, h), max(len(self._sorted) - 1, 0))
+        return (self._sorted[pos] == h) if len(self._sorted) else np.zeros(len(h), dtype=bool)
+
+    def add(self, ids) -> list:
+        """
+        Añade un bloque de asset_id. Retorna los que ya existían (o se repiten dentro del bloque).
+        """
+        ids = pd.Series(ids, dtype=object)
+        h = hash_ids(ids)
+        repeated = pd.Series(h).duplicated().to_numpy() | self.contains(ids)
+        # Los dos tramos ya vienen ordenados: la ordenación estable (timsort) los mezcla en tiempo lineal
+        self._sorted = np.sort(np.concatenate([self._sorted, np.unique(h)]), kind="stable")
+        return ids[repeated].unique().tolist()
+
+
+def validate_assets_chunk(assets_df: pd.DataFrame, known: KnownAssetIds) -> None:
+    """
+    Duplicados (contra los bloques anteriores) y suma CIA ~1 de un bloque de activos limpio.
+    """
+    duplicated = known.add(assets_df["asset_id"])
+    if duplicated:
+        raise ValueError(f"asset_id duplicado(s): {duplicated[:MAX_REPORTED]}")
+
+    s = assets_df["cia_c"] + assets_df["cia_i"] + assets_df["cia_a"]
+    bad = assets_df.loc[(s - 1.0).abs() > 0.01, ["asset_id", "cia_c", "cia_i", "cia_a"]]
+    if not bad.empty:
+        raise ValueError("Hay activos cuya suma CIA no es ~1:\n" + bad.head(MAX_REPORTED).to_string(index=False))
+
+
+def validate_dependencies_chunk(deps_df: pd.DataFrame, known: KnownAssetIds) -> None:
+    """
+    Integridad referencial de un bloque de dependencias contra todos los activos ya validados.
+    """
+    missing_from = sorted(set(deps_df.loc[~known.contains(deps_df["from_asset"]), "from_asset"]))
+    missing_to = sorted(set(deps_df.loc[~known.contains(deps_df["to_asset"]), "to_asset"]))
+    if missing_from or missing_to:
+        raise ValueError(
+            "Dependencias apuntan a activos inexistentes.\n"
+            f"from_asset no encontrados: {missing_from[:MAX_REPORTED]}\n"
+            f"to_asset no encontrados: {missing_to[:MAX_REPORTED]}"
+        )
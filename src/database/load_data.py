@@ -1,149 +1,353 @@
 #===============================================[IMPORTS]===============================================
+import logging
 import pandas as pd
 import sqlite3
 from pathlib import Path
 
-#===============================================[DATA_LOADING]===============================================
-def load_data_from_excel(excel_path: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+import src.database.analytics as analytics
+import src.database.create_db as create_db
+import src.database.ingest as ingest
+from src.database.create_db import ASSET_COLUMNS, DEPENDENCY_COLUMNS
+from src.database.catalog_version import (
+    get_catalog_version,
+    record_catalog_version,
+)
+from src.instrumentation.metrics import incr
+
+logger = logging.getLogger(__name__)
+
+#===============================================[CONSTANTS]===============================================
+ASSET_NUMERIC_COLUMNS = ["criticality", "cia_c", "cia_i", "cia_a"]
+DEPENDENCY_NUMERIC_COLUMNS = ["cia_couple_c", "cia_couple_i", "cia_couple_a"]
+ASSET_TEXT_COLUMNS = ["asset_id", "name", "asset_type", "domain", "operational_state"]
+DEPENDENCY_TEXT_COLUMNS = ["from_asset", "to_asset", "dependency_type"]
+ASSET_COLUMN_ALIASES = {"asset_id": "asset_id", "key": "asset_id", "id": "asset_id"}
+DEPENDENCY_COLUMN_ALIASES = {
+    "from_asset_id": "from_asset",
+    "to_asset_id": "to_asset",
+    "from": "from_asset",
+    "to": "to_asset",
+}
+LOAD_MODES = ("sync", "full", "bulk")
+
+#===============================================[CHUNKED_PIPELINE]===============================================
+# Preparación por tabla: alias de columnas, columnas de la BD, columnas de texto y numéricas
+TABLE_PIPELINE = {
+    "assets": (ASSET_COLUMN_ALIASES, ASSET_COLUMNS, ASSET_TEXT_COLUMNS, ASSET_NUMERIC_COLUMNS),
+    "dependencies": (DEPENDENCY_COLUMN_ALIASES, DEPENDENCY_COLUMNS, DEPENDENCY_TEXT_COLUMNS, DEPENDENCY_NUMERIC_COLUMNS),
+}
+
+def prepare_chunk(df: pd.DataFrame, table: str) -> pd.DataFrame:
     """
-    Carga datos desde archivo Excel.
-    Retorna tupla (assets_df, deps_df)
+    Mapeo de alias, selección de las columnas de la BD y limpieza (espacios en los campos de texto)
+    de un bloque de una tabla. Las columnas numéricas se convierten a float: las fuentes columnares
+    se leen como texto.
     """
-    dfs = pd.read_excel(excel_path, sheet_name=None)
-    assets_df = dfs["Assets"].copy()
-    deps_df = dfs["Dependencies"].copy()
-    return assets_df, deps_df
+    aliases, columns, text_columns, numeric_columns = TABLE_PIPELINE[table]
+    df = df.rename(columns=aliases)[columns].copy()
+    for col in text_columns:
+        df[col] = df[col].astype(str).str.strip()
+    for col in numeric_columns:
+        df[col] = pd.to_numeric(df[col]).astype(float)
+    return df
 
-#===============================================[COLUMN_MAPPING]===============================================
-def map_columns(assets_df: pd.DataFrame, deps_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+def iter_validated_chunks(sources: dict, known: ingest.KnownAssetIds, chunk_size: int):
     """
-    Mapea columnas de Excel a nombres esperados por SQLite.
+    Recorre las fuentes del catálogo bloque a bloque, primero activos y luego dependencias,
+    validando cada bloque (duplicados, suma CIA e integridad referencial; ver ingest.validate_*_chunk)
+    antes de producirlo: ("assets" | "dependencies", df).
+    `known` acumula los asset_id de los bloques ya validados.
     """
-    assets_df = assets_df.rename(columns={
-        "asset_id": "asset_id",
-        "key": "asset_id",
-        "id": "asset_id",
-    })
+    for chunk in ingest.iter_table(sources["assets"], chunk_size):
+        chunk = prepare_chunk(chunk, "assets")
+        ingest.validate_assets_chunk(chunk, known)
+        yield "assets", chunk
+    for chunk in ingest.iter_table(sources["dependencies"], chunk_size):
+        chunk = prepare_chunk(chunk, "dependencies")
+        ingest.validate_dependencies_chunk(chunk, known)
+        yield "dependencies", chunk
 
-    deps_df = deps_df.rename(columns={
-        "from_asset_id": "from_asset",
-        "to_asset_id": "to_asset",
-        "from": "from_asset",
-        "to": "to_asset",
-    })
-    
-    return assets_df, deps_df
-
-#===============================================[COLUMN_SELECTION]===============================================
-def select_required_columns(assets_df: pd.DataFrame, deps_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
-    """
-    Selecciona solo las columnas requeridas por SQLite.
-    """
-    assets_df = assets_df[[
-        "asset_id",
-        "name",
-        "asset_type",
-        "domain",
-        "criticality",
-        "cia_c",
-        "cia_i",
-        "cia_a",
-        "operational_state",
-    ]].copy()
-
-    deps_df = deps_df[[
-        "dependency_id",
-        "from_asset",
-        "to_asset",
-        "dependency_type",
-        "cia_couple_c",
-        "cia_couple_i",
-        "cia_couple_a",
-    ]].copy()
-    
-    return assets_df, deps_df
+#===============================================[BULK_INSERTION]===============================================
+# Perfil de la conexión durante la carga masiva: WAL y sin fsync por transacción
+BULK_PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = OFF;",
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA cache_size = -262144;",  # 256 MB de caché de páginas
+)
 
-#===============================================[DATA_CLEANING]===============================================
-def clean_data(assets_df: pd.DataFrame, deps_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+def _catalog_indexes(con: sqlite3.Connection) -> list:
     """
-    Limpia datos (elimina espacios extra).
+    Índices explícitos (CREATE INDEX) de assets y dependencies como (nombre, sql).
+    Los índices implícitos de las restricciones UNIQUE no tienen sql y no se pueden eliminar.
     """
-    for col in ["asset_id", "name", "asset_type", "domain", "operational_state"]:
-        assets_df[col] = assets_df[col].astype(str).str.strip()
+    return con.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name IN ('assets', 'dependencies') AND sql IS NOT NULL
+        ORDER BY name;
+    """).fetchall()
 
-    for col in ["from_asset", "to_asset", "dependency_type"]:
-        deps_df[col] = deps_df[col].astype(str).str.strip()
-    
-    return assets_df, deps_df
-
-#===============================================[VALIDATION]===============================================
-def validate_data(assets_df: pd.DataFrame, deps_df: pd.DataFrame) -> None:
-    """
-    Valida integridad de datos antes de cargar en BD.
-    Lanza excepciones si hay problemas.
-    """
-    if assets_df["asset_id"].duplicated().any():
-        dup = assets_df.loc[assets_df["asset_id"].duplicated(), "asset_id"].unique().tolist()
-        raise ValueError(f"asset_id duplicado(s): {dup}")
-
-    s = pd.to_numeric(assets_df["cia_c"]) + pd.to_numeric(assets_df["cia_i"]) + pd.to_numeric(assets_df["cia_a"])
-    bad = assets_df.loc[(s - 1.0).abs() > 0.01, ["asset_id", "cia_c", "cia_i", "cia_a"]]
-    if not bad.empty:
-        raise ValueError("Hay activos cuya suma CIA no es ~1:\n" + bad.to_string(index=False))
-
-    keys = set(assets_df["asset_id"].tolist())
-    missing_from = sorted(set(deps_df["from_asset"]) - keys)
-    missing_to = sorted(set(deps_df["to_asset"]) - keys)
-    if missing_from or missing_to:
-        raise ValueError(
-            "Dependencias apuntan a activos inexistentes.\n"
-            f"from_asset no encontrados: {missing_from}\n"
-            f"to_asset no encontrados: {missing_to}"
-        )
+def _restore_pragmas(con: sqlite3.Connection, previous: dict) -> None:
+    """
+    Restaura los PRAGMA de la conexión tras una carga masiva (haya terminado bien o no).
+    Un fallo al restaurar se registra sin ocultar el error de la carga.
+    """
+    for name, value in previous.items():
+        try:
+            con.execute(f"PRAGMA {name} = {value};")
+        except sqlite3.Error as error:
+            logger.warning("No se pudo restaurar PRAGMA %s = %s: %s", name, value, error)
+
+def _rows(df: pd.DataFrame, columns: list):
+    """
+    Filas de `df` como tuplas de tipos nativos de Python, columna a columna
+    (mucho más rápido que itertuples en tablas grandes).
+    """
+    return zip(*(df[c].tolist() for c in columns))
+
+def stream_insert_into_database(chunks, db_path: Path, source_path: Path, source_hash: str,
+                                bulk: bool = False, analyze: bool = True) -> dict:
+    """
+    Reemplaza todo el contenido del catálogo con los bloques ("assets" | "dependencies", df) de
+    `chunks` (todos los activos antes que las dependencias) en una única transacción, que también
+    registra la versión. Cada bloque se inserta con executemany y se descarta: la memoria depende
+    del tamaño del bloque, no del catálogo. Si `chunks` lanza una excepción (p. ej. un error de
+    validación en un bloque), la transacción se deshace y la BD queda como estaba. Con analyze=True
+    la analítica del grafo (src/database/analytics.py) se calcula en la misma transacción.
+
+    Con bulk=True (modo "bulk", catálogos grandes):
+    - WAL y synchronous=OFF solo durante la carga; al terminar (también si falla) se restauran el
+      modo de journal, synchronous y foreign_keys de la conexión.
+    - Los índices explícitos se eliminan antes de insertar y se recrean (desde sqlite_master) al final.
+    - Las claves foráneas se desactivan durante la inserción y se verifican en una sola pasada
+      (PRAGMA foreign_key_check) antes de confirmar; las restricciones CHECK y UNIQUE se siguen
+      comprobando fila a fila.
+    - ANALYZE al terminar, para que el planificador tenga estadísticas del nuevo catálogo.
+
+    Retorna dict con la versión registrada y los contadores.
+    """
+    con = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # Estos PRAGMA no tienen efecto dentro de una transacción
+        previous = {name: con.execute(f"PRAGMA {name};").fetchone()[0]
+                    for name in ("journal_mode", "synchronous", "foreign_keys")}
+        try:
+            con.execute(f"PRAGMA foreign_keys = {'OFF' if bulk else 'ON'};")
+            if bulk:
+                for pragma in BULK_PRAGMAS:
+                    con.execute(pragma)
+
+            con.execute("BEGIN;")
+            try:
+                indexes = _catalog_indexes(con) if bulk else []
+                for name, _ in indexes:
+                    con.execute(f'DROP INDEX "{name}";')
+
+                con.execute("DELETE FROM dependencies;")
+                con.execute("DELETE FROM assets;")
+                stats = dict(assets_inserted=0, deps_inserted=0)
+                inserts = dict(
+                    assets=(_insert_sql("assets", ASSET_COLUMNS), ASSET_COLUMNS, "assets_inserted"),
+                    dependencies=(_insert_sql("dependencies", DEPENDENCY_COLUMNS), DEPENDENCY_COLUMNS, "deps_inserted"),
+                )
+                for table, chunk in chunks:
+                    sql, columns, counter = inserts[table]
+                    con.executemany(sql, _rows(chunk, columns))
+                    stats[counter] += len(chunk)
+
+                for _, sql in indexes:
+                    con.execute(sql)
+
+                if bulk:
+                    violations = con.execute("PRAGMA foreign_key_check;").fetchmany(10)
+                    if violations:
+                        raise ValueError(f"Dependencias apuntan a activos inexistentes (tabla, rowid, tabla padre): {violations}")
+
+                version = record_catalog_version(con, source_path, source_hash, "full", stats, [])
+                if analyze:
+                    analytics.analyze_catalog(con, version)
+                con.execute("COMMIT;")
+            except BaseException:
+                con.execute("ROLLBACK;")
+                raise
+
+            if bulk:
+                con.execute("ANALYZE;")
+        finally:
+            if bulk:
+                _restore_pragmas(con, previous)
+    finally:
+        con.close()
+
+    return dict(version=version, changed=True, **stats)
+
+#===============================================[INCREMENTAL_SYNC]===============================================
+def _normalize(df: pd.DataFrame, numeric_columns: list) -> pd.DataFrame:
+    """
+    Normaliza tipos para comparar filas del Excel con filas leídas de SQLite.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in numeric_columns:
+            df[col] = pd.to_numeric(df[col]).astype(float)
+        else:
+            df[col] = df[col].astype(str)
+    return df
 
-#===============================================[DATABASE_INSERTION]===============================================
-def insert_into_database(assets_df: pd.DataFrame, deps_df: pd.DataFrame, db_path: Path) -> None:
+def diff_catalog_table(new_df: pd.DataFrame, old_df: pd.DataFrame, key: str, numeric_columns: list):
     """
-    Inserta datos validados en la base de datos SQLite.
+    Compara dos versiones de una tabla por su clave estable.
+    Retorna (inserts_df, updates_df, deleted_keys).
+    """
+    new_df = _normalize(new_df, numeric_columns)
+    old_df = _normalize(old_df, numeric_columns)
+
+    merged = new_df.merge(old_df, on=key, how="outer", suffixes=("", "_old"), indicator=True)
+
+    inserts = merged.loc[merged["_merge"] == "left_only", new_df.columns]
+    deleted_keys = merged.loc[merged["_merge"] == "right_only", key].tolist()
+
+    both = merged.loc[merged["_merge"] == "both"]
+    value_columns = [c for c in new_df.columns if c != key]
+    changed = pd.Series(False, index=both.index)
+    for col in value_columns:
+        changed |= both[col] != both[f"{col}_old"]
+    updates = both.loc[changed, new_df.columns]
+
+    return inserts, updates, deleted_keys
+
+def _update_sql(table: str, columns: list, key: str) -> str:
+    assignments = ", ".join(f"{c} = ?" for c in columns if c != key)
+    return f"UPDATE {table} SET {assignments} WHERE {key} = ?;"
+
+def _insert_sql(table: str, columns: list) -> str:
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)});"
+
+def _update_params(df: pd.DataFrame, columns: list, key: str):
+    value_columns = [c for c in columns if c != key]
+    return (tuple(row[c] for c in value_columns) + (row[key],) for row in df.to_dict("records"))
+
+def sync_into_database(assets_df: pd.DataFrame, deps_df: pd.DataFrame, db_path: Path,
+                       source_path: Path, source_hash: str, analyze: bool = True) -> dict:
+    """
+    Sincroniza la BD con el catálogo validado aplicando solo los cambios (inserts, updates, deletes)
+    calculados por asset_id / dependency_id, en una única transacción que además registra
+    la nueva versión del catálogo y su changelog (y, con analyze=True, recalcula la analítica del grafo).
+    Retorna dict con la versión y los contadores de cambios.
     """
     con = sqlite3.connect(db_path)
     try:
         con.execute("PRAGMA foreign_keys = ON;")
-        cur = con.cursor()
 
-        cur.execute("DELETE FROM dependencies;")
-        cur.execute("DELETE FROM assets;")
-        con.commit()
+        old_assets = pd.read_sql(f"SELECT {', '.join(ASSET_COLUMNS)} FROM assets;", con)
+        old_deps = pd.read_sql(f"SELECT {', '.join(DEPENDENCY_COLUMNS)} FROM dependencies;", con)
+        incr("sql_rows_read", len(old_assets) + len(old_deps))
+
+        a_ins, a_upd, a_del = diff_catalog_table(assets_df, old_assets, "asset_id", ASSET_NUMERIC_COLUMNS)
+        d_ins, d_upd, d_del = diff_catalog_table(deps_df, old_deps, "dependency_id", DEPENDENCY_NUMERIC_COLUMNS)
+
+        stats = dict(
+            assets_inserted=len(a_ins), assets_updated=len(a_upd), assets_deleted=len(a_del),
+            deps_inserted=len(d_ins), deps_updated=len(d_upd), deps_deleted=len(d_del),
+        )
+        changelog = (
+            [("assets", k, "insert") for k in a_ins["asset_id"]]
+            + [("assets", k, "update") for k in a_upd["asset_id"]]
+            + [("assets", k, "delete") for k in a_del]
+            + [("dependencies", k, "insert") for k in d_ins["dependency_id"]]
+            + [("dependencies", k, "update") for k in d_upd["dependency_id"]]
+            + [("dependencies", k, "delete") for k in d_del]
+        )
+
+        with con:
+            # Primero se eliminan dependencias y activos que ya no existen (liberan claves UNIQUE).
+            # Las dependencias modificadas también se borran y se reinsertan: actualizarlas fila a fila
+            # choca con UNIQUE(from_asset, to_asset, dependency_type) si dos de ellas intercambian su terna
+            con.executemany("DELETE FROM dependencies WHERE dependency_id = ?;",
+                            ((k,) for k in [*d_del, *d_upd["dependency_id"]]))
+            con.executemany("DELETE FROM assets WHERE asset_id = ?;", ((k,) for k in a_del))
+
+            con.executemany(_update_sql("assets", ASSET_COLUMNS, "asset_id"),
+                            _update_params(a_upd, ASSET_COLUMNS, "asset_id"))
+            con.executemany(_insert_sql("assets", ASSET_COLUMNS), a_ins.itertuples(index=False, name=None))
 
-        assets_df.to_sql("assets", con, if_exists="append", index=False)
-        deps_df.to_sql("dependencies", con, if_exists="append", index=False)
-        con.commit()
+            for df in (d_upd, d_ins):
+                con.executemany(_insert_sql("dependencies", DEPENDENCY_COLUMNS), df.itertuples(index=False, name=None))
 
+            version = record_catalog_version(con, source_path, source_hash, "sync", stats, changelog)
+            if analyze:
+                analytics.analyze_catalog(con, version)
     finally:
         con.close()
 
+    return dict(version=version, changed=True, **stats)
+
 #===============================================[MAIN_LOAD_DATA]===============================================
-def load_and_insert_data(excel_path: Path, db_path: Path) -> None:
+def load_and_insert_data(catalog_path: Path, db_path: Path, mode: str = "sync", force: bool = False,
+                         chunk_size: int = ingest.DEFAULT_CHUNK_SIZE, analyze: bool = True) -> dict:
     """
     Orquesta el flujo completo: carga, mapeo, limpieza, validación e inserción.
     Función principal para ser llamada desde otro módulo.
-    """
-    # Cargamos datos desde Excel
-    assets_df, deps_df = load_data_from_excel(excel_path)
-    
-    # Seleccionamos columnas necesarias
-    assets_df, deps_df = select_required_columns(assets_df, deps_df)
-    
-    # Limpiamos datos
-    assets_df, deps_df = clean_data(assets_df, deps_df)
-    
-    # Validamos datos
-    validate_data(assets_df, deps_df)
+
+    `catalog_path` es un Excel (hojas "Assets" y "Dependencies") o un directorio con
+    assets.{csv,parquet,jsonl} y dependencies.{csv,parquet,jsonl} (ver src/database/ingest.py).
+    El Excel se convierte una vez a una caché columnar junto a la BD. Las tablas se leen, limpian
+    y validan en bloques de `chunk_size` filas.
+
+    Modos:
+    - "sync" (por defecto): si el hash del origen coincide con la última versión cargada no hace nada;
+      si no, aplica solo las diferencias (ver sync_into_database). El diff necesita el catálogo
+      completo en memoria: los bloques validados se concatenan.
+    - "full": borra y reinserta todo el catálogo, bloque a bloque en una única transacción
+      (memoria acotada por `chunk_size`).
+    - "bulk": como "full", con el perfil de carga masiva de stream_insert_into_database (catálogos grandes).
+      La versión se registra con modo "full": el contenido resultante es el mismo.
+
+    Con analyze=True, cada carga recalcula la analítica del grafo (src/database/analytics.py) en su
+    transacción: un ciclo prohibido por la política acyclic_dependency_types rechaza la carga. Si el
+    catálogo no cambia pero la analítica falta o es de otra versión, se recalcula.
     
+    Retorna dict con la versión del catálogo y los contadores de cambios.
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Modo de carga no soportado: {mode}")
+
+    # Aplica el esquema (idempotente) por si la BD es anterior al versionado
+    create_db.create_db(Path(db_path), recreate=False)
+
+    source_hash = ingest.hash_catalog_source(catalog_path)
+    current = get_catalog_version(db_path)
+    if mode == "sync" and not force and current is not None and current["source_hash"] == source_hash:
+        logger.info("Catálogo sin cambios (versión %s): no se recarga %s", current["version"], catalog_path,
+                    extra=dict(version=current["version"]))
+        if analyze and analytics.analytics_version(db_path) != current["version"]:
+            analytics.refresh_graph_analytics(db_path)
+        return dict(version=current["version"], changed=False)
+
+    # Fuentes por tabla (un Excel se convierte a la caché columnar la primera vez)
+    sources = ingest.resolve_sources(catalog_path, Path(db_path).parent / ingest.CACHE_DIRNAME, source_hash, chunk_size)
+
+    # Lectura, limpieza y validación por bloques
+    chunks = iter_validated_chunks(sources, ingest.KnownAssetIds(), chunk_size)
+
     # Insertamos datos en BD
-    insert_into_database(assets_df, deps_df, db_path)
+    if mode == "sync":
+        tables = dict(assets=[], dependencies=[])
+        for table, chunk in chunks:
+            tables[table].append(chunk)
+        assets_df = pd.concat(tables["assets"], ignore_index=True)
+        deps_df = pd.concat(tables["dependencies"], ignore_index=True)
+        result = sync_into_database(assets_df, deps_df, db_path, catalog_path, source_hash, analyze)
+        n_assets, n_deps = len(assets_df), len(deps_df)
+    else:
+        result = stream_insert_into_database(chunks, db_path, catalog_path, source_hash, bulk=mode == "bulk",
+                                             analyze=analyze)
+        n_assets, n_deps = result["assets_inserted"], result["deps_inserted"]
+    
+    incr("catalog_rows_loaded", n_assets + n_deps)
+    logger.info("Datos cargados en %s (versión %s, modo %s): %d activos, %d dependencias",
+                db_path, result["version"], mode, n_assets, n_deps,
+                extra=dict(version=result["version"], mode=mode, assets=n_assets, dependencies=n_deps))
     
-    print(f"✓ Datos cargados exitosamente en {db_path}")
-    print(f"  - Activos: {len(assets_df)}")
-    print(f"  - Dependencias: {len(deps_df)}")
+    return result
 
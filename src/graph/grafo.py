@@ -2,11 +2,18 @@
 Este script recoge los datos de la DB creada en create_db.py y los usa para representarlos en un grafo
 """
 from pathlib import Path
+from functools import lru_cache
+import logging
 import sqlite3
 import json
 import networkx as nx
 
+from src.instrumentation.metrics import incr
+
+logger = logging.getLogger(__name__)
+
 #===============================================[CONSTANTS]===============================================
+@lru_cache(maxsize=None)
 def load_constants() -> dict:
     """
     Carga las constantes desde el archivo JSON de configuración.
@@ -16,11 +23,20 @@ def load_constants() -> dict:
         config = json.load(f)
     return config
 
-# Cargar configuración
-_config = load_constants()
-DOMINIOS = _config["dominios"]
-DEPENDENCIES_TYPES = _config["dependencies_types"]
-ASSET_TYPES = _config["asset_types"]
+# Configuración cargada en el primer acceso a DOMINIOS, DEPENDENCIES_TYPES o ASSET_TYPES
+_CONFIG_KEYS = {
+    "DOMINIOS": "dominios",
+    "DEPENDENCIES_TYPES": "dependencies_types",
+    "ASSET_TYPES": "asset_types",
+}
+
+def __getattr__(name):
+    """
+    Acceso perezoso a las constantes de configuración: evita leer el JSON al importar.
+    """
+    if name in _CONFIG_KEYS:
+        return load_constants()[_CONFIG_KEYS[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 #===============================================[DATABASE_FUNCTIONS]===============================================
@@ -185,94 +201,262 @@ def process_and_build_graph_domain(db_path: str, domain: str, all_assets: list,
     Retorna el grafo construido para el dominio especificado.
     """
     # Activos del dominio
-    print(f"\n{'='*60}")
-    print(f"Activos en el dominio '{domain}':")
-    print(f"{'='*60}")
-    
+    debug = logger.isEnabledFor(logging.DEBUG)
     assets = get_domain_assets(db_path, domain)
+    incr("sql_rows_read", len(assets))
     
-    if assets:
+    if debug:
         for asset in assets:
             # asset[1] = asset_id, asset[2] = name
-            print(f"  - {asset[1]}: {asset[2]}")
-            # Acumular en all_assets
-            all_assets.append(asset)
-    else:
-        print(f"  --> No hay activos en {domain}")
+            logger.debug("activo %s: %s", asset[1], asset[2], extra=dict(domain=domain))
+    # Acumular en all_assets
+    all_assets.extend(assets)
+    if not assets:
+        logger.info("No hay activos en %s", domain)
     
     # Dependencias internas del dominio
-    print(f"\n{'-'*60}")
-    print(f"Dependencias internas en '{domain}':")
-    print(f"{'-'*60}")
-    
     intraDomainDeps = get_domain_intra_dependencies(db_path, domain)
+    incr("sql_rows_read", len(intraDomainDeps))
     
-    if intraDomainDeps:
-        for dep in intraDomainDeps:
-            print(f"  {dep[1]} --> {dep[2]} ({dep[3]})")
-            # Acumular en all_deps_dict usando dep_pk como clave
-            dep_pk = dep[0]
-            if dep_pk not in all_deps_dict:
-                all_deps_dict[dep_pk] = dep
-    else:
-        print(f"  --> No hay dependencias internas en {domain}")
+    for dep in intraDomainDeps:
+        if debug:
+            logger.debug("dependencia interna %s --> %s (%s)", dep[1], dep[2], dep[3], extra=dict(domain=domain))
+        # Acumular en all_deps_dict usando dep_pk como clave
+        dep_pk = dep[0]
+        if dep_pk not in all_deps_dict:
+            all_deps_dict[dep_pk] = dep
+    if not intraDomainDeps:
+        logger.info("No hay dependencias internas en %s", domain)
         
     # Construcción del grafo intra-dominio
     G = build_intra_domain_graph(domain, assets, intraDomainDeps)
-    print(f"\n✓ Grafo construido para '{domain}':")
-    print(f"    - Nodos: {G.number_of_nodes()}")
-    print(f"    - Aristas: {G.number_of_edges()}")
+    logger.info("Grafo construido para '%s': %d nodos, %d aristas", domain, G.number_of_nodes(), G.number_of_edges(),
+                extra=dict(domain=domain, nodes=G.number_of_nodes(), edges=G.number_of_edges()))
     
     # Dependencias inter-dominio del dominio
-    print(f"\n{'-'*60}")
-    print(f"Dependencias inter-dominio que involucran a '{domain}':")
-    print(f"{'-'*60}")
-    
     interDomainDeps = get_domain_inter_dependencies(db_path, domain)
-    if interDomainDeps:
-        for dep in interDomainDeps:
-            print(f"  ({dep[7]}){dep[1]} --> ({dep[8]}){dep[2]} ({dep[3]})")
-            # Acumular en all_deps_dict usando dep_pk como clave
-            dep_pk = dep[0]
-            if dep_pk not in all_deps_dict:
-                all_deps_dict[dep_pk] = dep
-    else:
-        print(f"  --> No hay dependencias inter-dominio que involucren a {domain}")
+    incr("sql_rows_read", len(interDomainDeps))
+    for dep in interDomainDeps:
+        if debug:
+            logger.debug("dependencia inter-dominio (%s)%s --> (%s)%s (%s)", dep[7], dep[1], dep[8], dep[2], dep[3],
+                         extra=dict(domain=domain))
+        # Acumular en all_deps_dict usando dep_pk como clave
+        dep_pk = dep[0]
+        if dep_pk not in all_deps_dict:
+            all_deps_dict[dep_pk] = dep
+    if not interDomainDeps:
+        logger.info("No hay dependencias inter-dominio que involucren a %s", domain)
 
 
-def build_MDO_graph(db_path: str) -> nx.DiGraph:
-    """
-    Ejecuta el análisis completo del MDO: procesa todos los dominios,
-    construye el grafo global y realiza análisis de nodos afectados.
+def load_MDO_global_graph(db_path: str) -> nx.DiGraph:
     """
-    # Acumuladores globales
-    all_assets = []
-    all_deps_dict = {}  # Usar dict con dep_pk como clave para evitar duplicados
-    
-    # Procesar cada dominio
-    for dominio in DOMINIOS:
-        process_and_build_graph_domain(db_path, dominio, all_assets, all_deps_dict)
+    Construye el grafo global MDO en una sola pasada sobre la base de datos:
+    una única conexión y dos SELECT en streaming (assets y dependencies),
+    añadiendo nodos y aristas en bloque sin acumular listas intermedias.
     
-    # Convertir dict a lista (ya sin duplicados)
-    all_deps = list(all_deps_dict.values())
+    Los atributos de nodos y aristas son los mismos que en build_MDO_global_graph.
+    """
+    G = nx.DiGraph(domain="MDO Global")
+
+    con = sqlite3.connect(db_path)
+    try:
+        assets = con.execute("""
+            SELECT asset_id, name, asset_type, domain, criticality, cia_c, cia_i, cia_a, operational_state
+            FROM assets ORDER BY asset_pk;
+        """)
+        G.add_nodes_from(
+            (
+                asset_id,
+                {
+                    "name": name,
+                    "asset_type": asset_type,
+                    "domain": dom,
+                    "criticality": float(criticality),
+                    "cia_c": float(cia_c),
+                    "cia_i": float(cia_i),
+                    "cia_a": float(cia_a),
+                    "operational_state": operational_state,
+                },
+            )
+            for asset_id, name, asset_type, dom, criticality, cia_c, cia_i, cia_a, operational_state in assets
+        )
+
+        deps = con.execute("""
+            SELECT dependency_id, from_asset, to_asset, dependency_type, cia_couple_c, cia_couple_i, cia_couple_a
+            FROM dependencies ORDER BY dep_pk;
+        """)
+        G.add_edges_from(
+            (
+                from_asset,
+                to_asset,
+                {
+                    "dependency_id": dependency_id,
+                    "dependency_type": dependency_type,
+                    "cia_couple_c": float(cc),
+                    "cia_couple_i": float(ci),
+                    "cia_couple_a": float(ca),
+                    "weight": (float(cc)**2 + float(ci)**2 + float(ca)**2) ** 0.5,
+                },
+            )
+            for dependency_id, from_asset, to_asset, dependency_type, cc, ci, ca in deps
+        )
+    finally:
+        con.close()
+
+    incr("sql_rows_read", G.number_of_nodes() + G.number_of_edges())
+    return G
+
+
+def build_MDO_graph(db_path: str, use_snapshot: bool = False):
+    """
+    Construye el grafo global MDO con todos los activos y dependencias del catálogo.
     
+    La carga se hace en una sola pasada (ver load_MDO_global_graph); el análisis detallado
+    por dominio sigue disponible en process_and_build_graph_domain.
+    Con use_snapshot=True se retorna el GraphSnapshot del catálogo actual mapeado en memoria
+    (ver src/graph/snapshot.py), creándolo si aún no existe: sin SQL ni objetos por nodo/arista.
+    get_infected_nodes, graph_size, graph_node_ids y joint_decision.recommend_for_blast_radius
+    aceptan ambas formas; snapshot.to_networkx() da el nx.DiGraph si se necesita.
+    """
     # Construcción del grafo global MDO
-    print(f"\n{'='*60}")    
-    print(f"Construcción del grafo global MDO:")
-    print(f"{'='*60}")
-    
-    print(f"✓ Total de dependencias únicas: {len(all_deps)}")
-    
-    G_global = build_MDO_global_graph(all_assets, all_deps)
-    print(f"\n✓ Grafo global MDO construido:")
-    print(f"    - Nodos: {G_global.number_of_nodes()}")
-    print(f"    - Aristas: {G_global.number_of_edges()}")
+    if use_snapshot:
+        G_global = load_graph_snapshot(db_path)
+    else:
+        G_global = load_MDO_global_graph(db_path)
+    n_nodes, n_edges = graph_size(G_global)
+    incr("graph_nodes_built", n_nodes)
+    incr("graph_edges_built", n_edges)
+    logger.info("Grafo global MDO construido: %d nodos, %d aristas", n_nodes, n_edges,
+                extra=dict(nodes=n_nodes, edges=n_edges, snapshot=use_snapshot))
     
     return G_global
 
 
+def graph_size(graph) -> tuple:
+    """
+    (número de nodos, número de aristas) de un nx.DiGraph o de un GraphSnapshot.
+    """
+    if isinstance(graph, nx.DiGraph):
+        return graph.number_of_nodes(), graph.number_of_edges()
+    return graph.number_of_nodes, graph.number_of_edges
+
+
+def graph_node_ids(graph) -> list:
+    """
+    asset_id de todos los nodos de un nx.DiGraph o de un GraphSnapshot.
+    """
+    if isinstance(graph, nx.DiGraph):
+        return list(graph.nodes)
+    return graph.node_ids.tolist()
+
+
 
   
+#===============================================[SNAPSHOT_FUNCTIONS]===============================================
+def save_graph_snapshot(graph: nx.DiGraph, directory: Path, content_hash: str = ""):
+    """
+    Serializa un grafo MDO ya construido a un snapshot binario (arrays .npy) en `directory`.
+    """
+    from src.graph.snapshot import snapshot_from_graph, save_snapshot
+    return save_snapshot(snapshot_from_graph(graph, content_hash), directory)
+
+def load_graph_snapshot(db_path: str, mmap: bool = True):
+    """
+    Retorna el snapshot (GraphSnapshot) del catálogo actual de la BD, mapeado en memoria.
+    Se identifica por el hash de contenido de assets + dependencies y se crea si no existe.
+    """
+    from src.graph.snapshot import get_graph_snapshot
+    return get_graph_snapshot(db_path, mmap=mmap)
+
+
+#===============================================[GRAPH_ANALYTICS]===============================================
+# Lecturas de la analítica estructural calculada en cada carga (ver src/database/analytics.py):
+# consultas indexadas sobre asset_metrics / domain_bridges en lugar de recorrer el grafo.
+ASSET_METRICS_COLUMNS = ("fan_in", "fan_out", "depth", "scc_id", "scc_size", "is_orphan")
+
+def get_graph_analytics(db_path: str):
+    """
+    Resumen de la analítica del grafo (dict) si corresponde a la versión actual del catálogo;
+    None si la BD no la tiene o está desactualizada (p. ej. tras cargar con analyze=False).
+    """
+    con = sqlite3.connect(db_path)
+    try:
+        con.row_factory = sqlite3.Row
+        row = con.execute("""
+            SELECT g.* FROM graph_analytics g
+            WHERE g.version = (SELECT MAX(version) FROM catalog_versions);
+        """).fetchone()
+    except sqlite3.OperationalError:
+        # BD creada antes de existir la analítica
+        return None
+    finally:
+        con.close()
+    return None if row is None else dict(row)
+
+def get_asset_metrics(db_path: str, asset_ids=None) -> dict:
+    """
+    Métricas estructurales por activo: {asset_id: {fan_in, fan_out, depth, scc_id, scc_size, is_orphan}}.
+    Sin `asset_ids` retorna las de todo el catálogo.
+    """
+    sql = f"SELECT asset_id, {', '.join(ASSET_METRICS_COLUMNS)} FROM asset_metrics"
+    con = sqlite3.connect(db_path)
+    try:
+        if asset_ids is None:
+            rows = con.execute(sql + ";").fetchall()
+        else:
+            rows = con.execute(sql + " WHERE asset_id IN (SELECT value FROM json_each(?));",
+                               (json.dumps(list(asset_ids)),)).fetchall()
+    finally:
+        con.close()
+    incr("sql_rows_read", len(rows))
+    return {row[0]: dict(zip(ASSET_METRICS_COLUMNS, row[1:])) for row in rows}
+
+def get_dependency_cycles(db_path: str) -> list:
+    """
+    Ciclos de dependencias (componentes fuertemente conexas de más de un activo) como listas de asset_id.
+    """
+    con = sqlite3.connect(db_path)
+    try:
+        rows = con.execute("""
+            SELECT scc_id, asset_id FROM asset_metrics WHERE scc_size > 1 ORDER BY scc_id, asset_id;
+        """).fetchall()
+    finally:
+        con.close()
+    cycles = {}
+    for scc_id, asset_id in rows:
+        cycles.setdefault(scc_id, []).append(asset_id)
+    return list(cycles.values())
+
+def get_orphan_assets(db_path: str) -> list:
+    """
+    Activos sin dependencias en ningún sentido.
+    """
+    con = sqlite3.connect(db_path)
+    try:
+        rows = con.execute("SELECT asset_id FROM asset_metrics WHERE is_orphan = 1 ORDER BY asset_id;").fetchall()
+    finally:
+        con.close()
+    return [row[0] for row in rows]
+
+def get_domain_bridges(db_path: str, from_domain: str = None, to_domain: str = None) -> list:
+    """
+    Dependencias entre dominios distintos, opcionalmente filtradas por dominio consumidor y/o proveedor.
+    Retorna tuplas: (dependency_id, from_asset, to_asset, from_domain, to_domain, dependency_type)
+    """
+    con = sqlite3.connect(db_path)
+    try:
+        rows = con.execute("""
+            SELECT dependency_id, from_asset, to_asset, from_domain, to_domain, dependency_type
+            FROM domain_bridges
+            WHERE (:from_domain IS NULL OR from_domain = :from_domain)
+              AND (:to_domain IS NULL OR to_domain = :to_domain)
+            ORDER BY dependency_id;
+        """, dict(from_domain=from_domain, to_domain=to_domain)).fetchall()
+    finally:
+        con.close()
+    return rows
+
+
 #===============================================[ANALYSIS_FUNCTIONS]===============================================
 def get_infected_nodes(graph: nx.DiGraph, compromised_node: str):
     """
@@ -282,7 +466,14 @@ def get_infected_nodes(graph: nx.DiGraph, compromised_node: str):
     3. Y así sucesivamente hasta que no haya más nodos afectados o se alcance un bucle.
     
     Retorna: Dict[int, List[str]] donde la clave es el nivel de salto y el valor es la lista de nodos afectados en ese nivel.
+    
+    Para catálogos grandes existe un motor equivalente sobre arrays CSR en
+    src/graph/propagation.py (get_infected_nodes_csr), que es el que se usa si `graph` es un GraphSnapshot.
     """
+    if not isinstance(graph, nx.DiGraph):
+        from src.graph.propagation import get_infected_nodes_csr
+        return get_infected_nodes_csr(graph.reverse_csr, compromised_node)
+
     #=== Inicialización de variables ===#
     affected_nodes_by_level = {} # Dict[int, List[str]]
     visited_nodes = set() # Set[str] de los nodos que ya han sido visitados
@@ -295,7 +486,7 @@ def get_infected_nodes(graph: nx.DiGraph, compromised_node: str):
     try:
         graph.nodes[compromised_node] # Verificamos que el nodo exista en el grafo
     except KeyError:
-        print(f"Error: El nodo comprometido '{compromised_node}' no existe en el grafo.")
+        logger.error("El nodo comprometido '%s' no existe en el grafo.", compromised_node)
         return {}
     
     #=== Búsqueda de nodos afectados por niveles de salto ===#
@@ -308,18 +499,88 @@ def get_infected_nodes(graph: nx.DiGraph, compromised_node: str):
            
             for dependent_node in dependent_nodes:
                 if dependent_node in visited_nodes:
-                    continue # Ya hemos visitado este nodo, lo saltamos (evitamos bucles)
+                    continue # Ya visitado (o ya añadido a este nivel), lo saltamos (evitamos bucles y duplicados)
                 
-                if dependent_node not in next_level_nodes:
-                    next_level_nodes.append(dependent_node) # Añadimos a la lista de nodos para el siguiente nivel
-                    visited_nodes.add(dependent_node) # Marcamos el nodo como visitado
+                next_level_nodes.append(dependent_node) # Añadimos a la lista de nodos para el siguiente nivel
+                visited_nodes.add(dependent_node) # Marcamos el nodo como visitado
         
         if next_level_nodes: # Si hemos encontrado predecesores del nodo actual, los guardamos en el dict
             affected_nodes_by_level[level] = next_level_nodes
         
         current_level_nodes = next_level_nodes # Actualizamos los nodos del nivel actual para la siguiente iteración
     
-    return affected_nodes_by_level  
+    incr("bfs_levels", len(affected_nodes_by_level))
+    incr("bfs_nodes_visited", len(visited_nodes))
+    return affected_nodes_by_level
+
+
+# BFS por niveles dentro de SQLite sobre una tabla temporal de la conexión (no modifica la BD).
+# Cada nivel es una sentencia: los consumidores (to_asset -> from_asset, índice cubriente idx_deps_to_from)
+# de los activos del nivel anterior. La clave primaria de infected hace de conjunto de visitados:
+# INSERT OR IGNORE descarta los activos ya alcanzados (ciclos y duplicados) y conserva su nivel mínimo.
+INFECTED_TABLE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS infected (
+  asset_id TEXT PRIMARY KEY,
+  level    INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS temp.idx_infected_level ON infected(level);
+DELETE FROM temp.infected;
+"""
+INFECTED_LEVEL_SQL = """
+INSERT OR IGNORE INTO temp.infected (asset_id, level)
+SELECT d.from_asset, :level + 1
+FROM temp.infected f
+JOIN dependencies d ON d.to_asset = f.asset_id
+WHERE f.level = :level
+  AND (:types IS NULL OR d.dependency_type IN (SELECT value FROM json_each(:types)))
+  AND (:domains IS NULL OR EXISTS (
+        SELECT 1 FROM assets a
+        WHERE a.asset_id = d.from_asset AND a.domain IN (SELECT value FROM json_each(:domains))));
+"""
+
+
+def get_infected_nodes_sql(db_path: str, compromised_node: str, max_depth: int = None,
+                           dependency_types=None, domains=None) -> dict:
+    """
+    Equivalente a get_infected_nodes calculado dentro de SQLite sobre la tabla dependencies,
+    sin construir el grafo: para consultas puntuales desde otras herramientas. Solo se leen las
+    entradas del índice de los activos afectados.
+
+    - max_depth: nivel de salto máximo (por defecto, sin límite).
+    - dependency_types: si se indica, solo se propaga por dependencias de esos tipos.
+    - domains: si se indica, solo se propaga a activos de esos dominios (el comprometido siempre se incluye).
+
+    Retorna: Dict[int, List[str]] con los activos afectados por nivel de salto (ordenados por asset_id
+    dentro de cada nivel), o {} si el activo no existe.
+    """
+    params = dict(
+        types=None if dependency_types is None else json.dumps(list(dependency_types)),
+        domains=None if domains is None else json.dumps(list(domains)),
+    )
+    con = sqlite3.connect(db_path)
+    try:
+        if con.execute("SELECT 1 FROM assets WHERE asset_id = ?;", (compromised_node,)).fetchone() is None:
+            logger.error("El nodo comprometido '%s' no existe en el catálogo.", compromised_node)
+            return {}
+
+        con.executescript(INFECTED_TABLE_SQL)
+        con.execute("INSERT INTO temp.infected (asset_id, level) VALUES (?, 0);", (compromised_node,))
+        level = 0
+        while max_depth is None or level < max_depth:
+            if con.execute(INFECTED_LEVEL_SQL, dict(params, level=level)).rowcount == 0:
+                break
+            level += 1
+        rows = con.execute("SELECT asset_id, level FROM temp.infected ORDER BY level, asset_id;").fetchall()
+    finally:
+        con.close()
+
+    affected_nodes_by_level = {}
+    for asset_id, level in rows:
+        affected_nodes_by_level.setdefault(level, []).append(asset_id)
+    incr("sql_rows_read", len(rows))
+    incr("bfs_levels", len(affected_nodes_by_level))
+    incr("bfs_nodes_visited", len(rows))
+    return affected_nodes_by_level
     
 
 #===============================================[MAIN]===============================================
@@ -0,0 +1,187 @@
+"""
+Propagación vectorizada del impacto CIA ponderado sobre el grafo MDO.
+
+Dada una táctica ATT&CK y uno o varios activos comprometidos, calcula para todo el catálogo
+una puntuación de impacto en Confidencialidad, Integridad y Disponibilidad:
+
+1. Exposición: el compromiso se propaga de proveedor a consumidor atenuado en cada arista por
+   cia_couple_<d> x dependency_matrix[táctica][dependency_type]:
+       x_d = min(1, s + A_d · x_d)   (iterado hasta converger o hasta max_hops)
+   donde s es el indicador de activos comprometidos.
+2. Impacto: impacto_d(v) = x_d(v) · Impact_matrix[táctica][asset_type(v)] · criticality(v) · cia_d(v)
+
+Las tres dimensiones se resuelven a la vez con una matriz dispersa diagonal por bloques (3n x 3n):
+cada iteración es un único producto matriz-vector disperso.
+"""
+
+#===============================================[IMPORTS]===============================================
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+#===============================================[CONSTANTS]===============================================
+CONFIGS_DIR = Path(__file__).parent.parent.parent / "Configs"
+CIA_DIMENSIONS = ("C", "I", "A")
+
+#===============================================[CONFIGURATION]===============================================
+@lru_cache(maxsize=None)
+def load_dependency_matrix() -> dict:
+    """
+    Factor de propagación por táctica y tipo de dependencia (Configs/dependency_matrix.json).
+    """
+    with open(CONFIGS_DIR / "dependency_matrix.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+@lru_cache(maxsize=None)
+def load_impact_matrix() -> dict:
+    """
+    Factor de impacto por táctica y tipo de activo (Configs/Impact_matrix.json).
+    """
+    with open(CONFIGS_DIR / "Impact_matrix.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def normalize_tactic(tactic: str) -> str:
+    """
+    Normaliza el nombre de una táctica ATT&CK a las claves de las matrices de configuración:
+    "Initial Access" / "initial-access" -> "initial_access".
+    """
+    key = tactic.strip().lower().replace("-", "_").replace(" ", "_")
+    if key not in load_dependency_matrix():
+        raise ValueError(f"Táctica desconocida: {tactic}")
+    return key
+
+#===============================================[MODEL]===============================================
+@dataclass
+class ImpactModel:
+    """
+    Modelo de propagación CIA para una táctica sobre un GraphSnapshot.
+
+    matrix:      matriz dispersa (3n x 3n) diagonal por bloques [A_C, A_I, A_A];
+                 A_d[consumidor, proveedor] = cia_couple_d x factor de dependencia.
+    node_factor: factor de impacto del tipo de activo para la táctica (n,).
+    criticality: criticidad de cada activo (n,).
+    cia:         pesos CIA de cada activo (n, 3).
+    node_index:  {asset_id: índice}, compartido con el snapshot (se construye una vez por catálogo).
+    """
+    tactic: str
+    node_ids: np.ndarray
+    matrix: object
+    node_factor: np.ndarray
+    criticality: np.ndarray
+    cia: np.ndarray
+    node_index: dict
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+
+def build_impact_model(snapshot, tactic: str) -> ImpactModel:
+    """
+    Construye el modelo de propagación CIA de `tactic` a partir de un GraphSnapshot.
+    """
+    from scipy.sparse import block_diag, csr_matrix
+
+    tactic = normalize_tactic(tactic)
+    n = snapshot.number_of_nodes
+
+    dep_factors = load_dependency_matrix()[tactic]
+    dep_type_factor = np.array([dep_factors.get(t, 0.0) for t in snapshot.vocab["dependency_type"]], dtype=np.float64)
+    edge_factor = dep_type_factor[np.asarray(snapshot.dependency_type)] if snapshot.number_of_edges else np.zeros(0)
+
+    impact_factors = load_impact_matrix()[tactic]
+    type_factor = np.array([impact_factors.get(t, 1.0) for t in snapshot.vocab["asset_type"]], dtype=np.float64)
+    node_factor = type_factor[np.asarray(snapshot.asset_type)] if n else np.zeros(0)
+
+    rows = np.asarray(snapshot.edge_src)   # consumidor
+    cols = np.asarray(snapshot.edge_dst)   # proveedor
+    couple = np.asarray(snapshot.cia_couple)
+    blocks = [
+        csr_matrix((couple[:, d] * edge_factor, (rows, cols)), shape=(n, n))
+        for d in range(len(CIA_DIMENSIONS))
+    ]
+
+    return ImpactModel(
+        tactic=tactic,
+        node_ids=np.asarray(snapshot.node_ids),
+        matrix=block_diag(blocks, format="csr"),
+        node_factor=node_factor,
+        criticality=np.asarray(snapshot.criticality, dtype=np.float64),
+        cia=np.asarray(snapshot.cia, dtype=np.float64),
+        node_index=snapshot.node_index,
+    )
+
+
+_model_cache = {}
+
+def get_impact_model(snapshot, tactic: str) -> ImpactModel:
+    """
+    Devuelve (memoizado por hash de contenido del catálogo y táctica) el modelo de propagación.
+    """
+    key = (snapshot.content_hash, normalize_tactic(tactic))
+    if key not in _model_cache or not snapshot.content_hash:
+        _model_cache[key] = build_impact_model(snapshot, tactic)
+    return _model_cache[key]
+
+#===============================================[PROPAGATION]===============================================
+def propagate_cia_impact(model: ImpactModel, compromised_nodes, max_hops: int = None, tol: float = 1e-9) -> dict:
+    """
+    Propaga el compromiso de `compromised_nodes` (asset_id o lista de asset_id) por todo el catálogo.
+
+    Retorna dict con:
+    - "exposure": array (n, 3) con la exposición x_d de cada activo en [0, 1].
+    - "impact":   array (n, 3) con el impacto C/I/A ponderado.
+    - "iterations": número de productos matriz-vector realizados.
+    """
+    if isinstance(compromised_nodes, str):
+        compromised_nodes = [compromised_nodes]
+
+    n = model.number_of_nodes
+    index = model.node_index
+    missing = [a for a in compromised_nodes if a not in index]
+    if missing:
+        raise KeyError(f"Activos comprometidos inexistentes en el grafo: {missing}")
+
+    seed = np.zeros(n, dtype=np.float64)
+    seed[[index[a] for a in compromised_nodes]] = 1.0
+    seed = np.tile(seed, len(CIA_DIMENSIONS))   # [s, s, s] para C, I, A
+
+    x = seed.copy()
+    iterations = 0
+    limit = max_hops if max_hops is not None else n
+    while iterations < limit:
+        x_next = np.minimum(1.0, seed + model.matrix @ x)
+        iterations += 1
+        if np.abs(x_next - x).max(initial=0.0) <= tol:
+            x = x_next
+            break
+        x = x_next
+
+    exposure = x.reshape(len(CIA_DIMENSIONS), n).T
+    impact = exposure * (model.node_factor * model.criticality)[:, None] * model.cia
+    return dict(exposure=exposure, impact=impact, iterations=iterations)
+
+
+def get_cia_impact(snapshot, tactic: str, compromised_nodes, max_hops: int = None, min_score: float = 0.0) -> dict:
+    """
+    Impacto C/I/A por activo para una táctica y uno o varios activos comprometidos.
+
+    Retorna Dict[str, Dict[str, float]] {asset_id: {"C": ..., "I": ..., "A": ..., "total": ...}}
+    con los activos cuyo impacto total supera `min_score`, ordenados de mayor a menor impacto.
+    """
+    model = get_impact_model(snapshot, tactic)
+    result = propagate_cia_impact(model, compromised_nodes, max_hops=max_hops)
+
+    impact = result["impact"]
+    total = impact.sum(axis=1)
+    order = np.argsort(-total, kind="stable")
+    order = order[total[order] > min_score]
+
+    node_ids = model.node_ids
+    return {
+        str(node_ids[i]): dict(C=float(impact[i, 0]), I=float(impact[i, 1]), A=float(impact[i, 2]), total=float(total[i]))
+        for i in order.tolist()
+    }
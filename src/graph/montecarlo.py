@@ -0,0 +1,292 @@
+"""
+Simulador Monte Carlo de cascadas de compromiso sobre el grafo MDO.
+
+A diferencia del BFS por niveles (grafo.get_infected_nodes), que da por hecho que toda dependencia
+falla, aquí cada arista proveedor -> consumidor se activa con una probabilidad:
+
+    p_e = dependency_matrix[táctica][dependency_type] x max(cia_couple_c, cia_couple_i, cia_couple_a)
+
+(o el acoplamiento de una sola dimensión CIA si se indica). Cada ensayo es una cascada independiente
+(modelo de cascada independiente: cada arista se prueba una vez, cuando cae su proveedor).
+
+Los ensayos se simulan por lotes vectorizados (pares ensayo-activo dispersos) y los lotes se reparten
+en un pool de procesos con semillas derivadas de una SeedSequence, de modo que el resultado es
+reproducible e independiente del número de workers (salvo si se agota el presupuesto de tiempo).
+La simulación se detiene cuando el intervalo de confianza de todas las probabilidades es
+suficientemente estrecho, al llegar a max_trials o al agotar el presupuesto de tiempo.
+Cada cascada se sigue hasta que su frontera se vacía; con max_hops se corta antes y el resultado
+indica cuántos ensayos quedaron truncados.
+"""
+
+#===============================================[IMPORTS]===============================================
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.graph.impact import CIA_DIMENSIONS, load_dependency_matrix, normalize_tactic
+
+#===============================================[CONSTANTS]===============================================
+DEFAULT_BATCH_SIZE = 256
+# Límite de posiciones ensayos x activos del buffer de visitados de un lote
+MAX_BATCH_CELLS = 50_000_000
+Z_95 = 1.96
+
+#===============================================[WORKER]===============================================
+# Estado de cada proceso del pool (se recibe una vez en el initializer, no en cada tarea).
+# Solo lo usan los workers: en el propio proceso el grafo y la caché viven en el simulador.
+_worker_graph = None
+_worker_probabilities = {}
+
+def _init_worker(graph: dict) -> None:
+    global _worker_graph, _worker_probabilities
+    _worker_graph = graph
+    _worker_probabilities = {}
+
+
+def _edge_probabilities(graph: dict, cache: dict, type_factors: tuple, dimension) -> np.ndarray:
+    key = (type_factors, dimension)
+    if key not in cache:
+        couple = graph["couple"] if dimension is None else graph["couple_dims"][:, dimension]
+        cache[key] = np.asarray(type_factors, dtype=np.float64)[graph["dependency_type"]] * couple
+    return cache[key]
+
+
+def _merge_hops(codes: list, counts: list):
+    """
+    Reduce listas de histogramas dispersos (códigos salto * n + activo, conteos) a uno solo.
+    """
+    unique, inverse = np.unique(np.concatenate(codes), return_inverse=True)
+    return unique, np.bincount(inverse, weights=np.concatenate(counts), minlength=len(unique)).astype(np.int64)
+
+
+def _simulate_batch(graph: dict, p: np.ndarray, sources: np.ndarray, n_trials: int, max_hops,
+                    rng: np.random.Generator, visited: np.ndarray):
+    """
+    Simula `n_trials` cascadas desde `sources` hasta que se vacía su frontera (o hasta `max_hops` saltos).
+
+    El estado se representa de forma dispersa con claves ensayo * n + activo: en cada salto solo se
+    expanden (vía la adyacencia CSR proveedor -> aristas) los pares de la frontera.
+    `visited` es un buffer booleano de al menos n_trials * n posiciones, a False a la entrada y a la salida.
+
+    Retorna (codes, counts, truncated): histograma disperso activo x salto de compromisos
+    (código salto * n + activo) y número de ensayos cortados por max_hops con la frontera aún viva.
+    """
+    n = graph["n"]
+    indptr, edge_order, consumer = graph["indptr"], graph["edge_order"], graph["consumer"]
+
+    sources = np.unique(sources)
+    hop_codes, hop_counts = [sources], [np.full(len(sources), n_trials, dtype=np.int64)]
+    truncated = 0
+
+    frontier = (np.arange(n_trials, dtype=np.int64)[:, None] * n + sources[None, :]).ravel()
+    visited[frontier] = True
+    touched = [frontier]
+
+    hop = 0
+    while frontier.size:
+        if max_hops is not None and hop == max_hops:
+            truncated = len(np.unique(frontier // n))
+            break
+        hop += 1
+        f_trial, f_node = np.divmod(frontier, n)
+        starts = indptr[f_node]
+        counts = indptr[f_node + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            break
+
+        # Cada par (ensayo, proveedor) de la frontera prueba todas las aristas del proveedor
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        edges = edge_order[positions]
+        fired = rng.random(total) < p[edges]
+
+        keys = np.repeat(f_trial, counts)[fired] * n + consumer[edges[fired]]
+        keys = np.unique(keys)
+        keys = keys[~visited[keys]]
+
+        visited[keys] = True
+        touched.append(keys)
+        nodes, node_counts = np.unique(keys % n, return_counts=True)
+        hop_codes.append(hop * n + nodes)
+        hop_counts.append(node_counts)
+        frontier = keys
+
+    for keys in touched:
+        visited[keys] = False
+    return np.concatenate(hop_codes), np.concatenate(hop_counts), truncated
+
+
+def _run_task(graph: dict, probabilities: dict, type_factors: tuple, dimension, sources: np.ndarray,
+              n_trials: int, max_hops, seed: np.random.SeedSequence, batch_size: int):
+    p = _edge_probabilities(graph, probabilities, type_factors, dimension)
+    rng = np.random.default_rng(seed)
+
+    codes, counts = [], []
+    truncated = 0
+    visited = np.zeros(min(batch_size, n_trials) * graph["n"], dtype=bool)
+    done = 0
+    while done < n_trials:
+        size = min(batch_size, n_trials - done)
+        batch_codes, batch_counts, batch_truncated = _simulate_batch(graph, p, sources, size, max_hops, rng, visited)
+        codes.append(batch_codes)
+        counts.append(batch_counts)
+        truncated += batch_truncated
+        done += size
+    return _merge_hops(codes, counts) + (truncated,)
+
+
+def _run_worker_task(*args):
+    return _run_task(_worker_graph, _worker_probabilities, *args)
+
+#===============================================[SIMULATOR]===============================================
+class CascadeSimulator:
+    """
+    Simulador Monte Carlo reutilizable sobre un GraphSnapshot.
+
+    Mantiene vivo el pool de procesos (los arrays del grafo se envían una sola vez a cada worker),
+    de modo que cada alerta solo paga el coste de los ensayos. Con workers=1 los lotes se
+    ejecutan en el propio proceso.
+
+    Uso:
+        with CascadeSimulator(snapshot, workers=4) as sim:
+            result = sim.run("asset_003", "initial-access", seed=42)
+    """
+
+    def __init__(self, snapshot, workers: int = 1, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.node_ids = np.asarray(snapshot.node_ids)
+        self.node_index = {asset_id: i for i, asset_id in enumerate(self.node_ids.tolist())}
+        self.dependency_types = list(snapshot.vocab["dependency_type"])
+        self.workers = max(1, int(workers))
+
+        n = snapshot.number_of_nodes
+        couple_dims = np.asarray(snapshot.cia_couple, dtype=np.float64)
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_CELLS // max(1, n)))
+
+        # Aristas agrupadas por proveedor (CSR): edge_order[indptr[p]:indptr[p + 1]] son las de p
+        provider = np.asarray(snapshot.edge_dst, dtype=np.int64)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(provider, minlength=n), out=indptr[1:])
+
+        self._graph = dict(
+            n=n,
+            indptr=indptr,
+            edge_order=np.argsort(provider, kind="stable"),
+            consumer=np.asarray(snapshot.edge_src, dtype=np.int64),
+            dependency_type=np.asarray(snapshot.dependency_type, dtype=np.int64),
+            couple_dims=couple_dims,
+            couple=couple_dims.max(axis=1) if len(couple_dims) else np.zeros(0),
+        )
+        self._probabilities = {}
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self._graph,)
+            )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, compromised_nodes, tactic: str, dimension: str = None, seed: int = 0,
+            trials_per_task: int = 1000, min_trials: int = 1000, max_trials: int = 100_000,
+            ci_halfwidth: float = 0.01, time_budget: float = None, max_hops: int = None) -> dict:
+        """
+        Ejecuta la simulación hasta convergencia.
+
+        - compromised_nodes: asset_id o lista de asset_id comprometidos.
+        - dimension: "C", "I" o "A" para usar solo ese acoplamiento; None = el máximo de los tres.
+        - ci_halfwidth: semiamplitud máxima (IC 95 %) admitida en todas las probabilidades.
+        - time_budget: segundos máximos; al agotarse se devuelve el resultado parcial.
+        - max_hops: saltos máximos por cascada; None = hasta que se vacía la frontera.
+
+        Retorna dict con:
+        - "probability": {asset_id: P(comprometido)} para los activos con probabilidad > 0.
+        - "hop_distribution": {asset_id: {salto: P(comprometido en ese salto)}}.
+        - "trials", "converged", "ci_halfwidth", "elapsed".
+        - "truncated": ensayos cortados por max_hops con la cascada aún activa (0 sin max_hops);
+          si es > 0, las probabilidades están sesgadas a la baja.
+        """
+        start = time.perf_counter()
+        if isinstance(compromised_nodes, str):
+            compromised_nodes = [compromised_nodes]
+        missing = [a for a in compromised_nodes if a not in self.node_index]
+        if missing:
+            raise KeyError(f"Activos comprometidos inexistentes en el grafo: {missing}")
+        sources = np.array([self.node_index[a] for a in compromised_nodes], dtype=np.int64)
+
+        factors = load_dependency_matrix()[normalize_tactic(tactic)]
+        type_factors = tuple(float(factors.get(t, 0.0)) for t in self.dependency_types)
+        dim = None if dimension is None else CIA_DIMENSIONS.index(dimension)
+
+        n = self._graph["n"]
+        counts = np.zeros(n, dtype=np.int64)
+        hop_codes, hop_counts = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        trials = truncated = 0
+        halfwidth = 1.0
+        converged = False
+        seeds = np.random.SeedSequence(seed)
+
+        while trials < max_trials and not converged:
+            # Una ronda = una tarea por worker; la tarea k-ésima siempre recibe la k-ésima semilla derivada
+            round_trials = []
+            pending = max_trials - trials
+            while len(round_trials) < self.workers and pending > 0:
+                round_trials.append(min(trials_per_task, pending))
+                pending -= round_trials[-1]
+            task_seeds = seeds.spawn(len(round_trials))
+            args = [(type_factors, dim, sources, t, max_hops, s, self.batch_size) for t, s in zip(round_trials, task_seeds)]
+
+            if self._executor is None:
+                results = [_run_task(self._graph, self._probabilities, *a) for a in args]
+            else:
+                results = list(self._executor.map(_run_worker_task, *zip(*args)))
+
+            # La convergencia se evalúa tras cada tarea, en orden: el resultado no depende de workers
+            for n_task, (task_codes, task_counts, task_truncated) in zip(round_trials, results):
+                counts += np.bincount(task_codes % n, weights=task_counts, minlength=n).astype(np.int64)
+                hop_codes, hop_counts = _merge_hops([hop_codes, task_codes], [hop_counts, task_counts])
+                trials += n_task
+                truncated += task_truncated
+
+                p_hat = counts / trials
+                halfwidth = float(Z_95 * np.sqrt(p_hat * (1 - p_hat) / trials).max(initial=0.0))
+                if trials >= min_trials and halfwidth <= ci_halfwidth:
+                    converged = True
+                    break
+
+            if time_budget is not None and time.perf_counter() - start >= time_budget:
+                break
+
+        p_hat = counts / trials
+        hit = np.flatnonzero(counts)
+        order = hit[np.argsort(-p_hat[hit], kind="stable")]
+        node_ids = self.node_ids
+        hop_distribution = {str(node_ids[i]): {} for i in order.tolist()}
+        for code, c in zip(hop_codes.tolist(), hop_counts.tolist()):
+            hop, i = divmod(code, n)
+            hop_distribution[str(node_ids[i])][hop] = float(c / trials)
+        return dict(
+            probability={str(node_ids[i]): float(p_hat[i]) for i in order.tolist()},
+            hop_distribution=hop_distribution,
+            trials=trials,
+            converged=converged,
+            truncated=truncated,
+            ci_halfwidth=halfwidth,
+            elapsed=time.perf_counter() - start,
+        )
+
+
+def simulate_cascade(snapshot, compromised_nodes, tactic: str, workers: int = 1, **kwargs) -> dict:
+    """
+    Atajo para una simulación aislada (crea y cierra el simulador). Ver CascadeSimulator.run.
+    """
+    with CascadeSimulator(snapshot, workers=workers) as simulator:
+        return simulator.run(compromised_nodes, tactic, **kwargs)
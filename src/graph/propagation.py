@@ -0,0 +1,145 @@
+"""
+Motor de propagación sobre una adyacencia inversa en formato CSR (NumPy).
+
+Alternativa a grafo.get_infected_nodes para catálogos grandes: los nodos se identifican por
+índices enteros, la adyacencia inversa (proveedor -> consumidores) se guarda en dos arrays
+(indptr, indices) y el BFS por niveles trabaja con fronteras vectorizadas y un mapa de visitados.
+"""
+
+#===============================================[IMPORTS]===============================================
+import logging
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+
+from src.instrumentation.metrics import incr
+
+logger = logging.getLogger(__name__)
+
+#===============================================[CSR]===============================================
+@dataclass
+class ReverseCSR:
+    """
+    Adyacencia inversa del grafo MDO en formato CSR.
+
+    Para el proveedor p, sus consumidores directos (nodos que dependen de p) son
+    indices[indptr[p]:indptr[p + 1]], en el mismo orden en que se añadieron las aristas.
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    node_ids: np.ndarray
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @cached_property
+    def node_index(self) -> dict:
+        """
+        Diccionario asset_id -> índice de nodo (se construye en el primer uso).
+        """
+        return {asset_id: i for i, asset_id in enumerate(self.node_ids.tolist())}
+
+
+def build_reverse_csr(edge_src: np.ndarray, edge_dst: np.ndarray, node_ids: np.ndarray) -> ReverseCSR:
+    """
+    Construye la adyacencia inversa a partir de la lista de aristas (src = consumidor, dst = proveedor).
+    La ordenación estable conserva el orden de inserción de las aristas de cada proveedor.
+    """
+    n = len(node_ids)
+    edge_src = np.asarray(edge_src, dtype=np.int32)
+    edge_dst = np.asarray(edge_dst, dtype=np.int64)
+
+    order = np.argsort(edge_dst, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edge_dst, minlength=n), out=indptr[1:])
+
+    return ReverseCSR(indptr=indptr, indices=edge_src[order], node_ids=np.asarray(node_ids))
+
+
+def reverse_csr_from_snapshot(snapshot) -> ReverseCSR:
+    """
+    Construye la adyacencia inversa desde un GraphSnapshot (ver src/graph/snapshot.py).
+    """
+    return build_reverse_csr(snapshot.edge_src, snapshot.edge_dst, snapshot.node_ids)
+
+
+def reverse_csr_from_graph(graph) -> ReverseCSR:
+    """
+    Construye la adyacencia inversa desde un nx.DiGraph del MDO.
+    """
+    node_ids = list(graph.nodes)
+    index = {asset_id: i for i, asset_id in enumerate(node_ids)}
+    m = graph.number_of_edges()
+    edge_src = np.fromiter((index[u] for u, _ in graph.edges), dtype=np.int32, count=m)
+    edge_dst = np.fromiter((index[v] for _, v in graph.edges), dtype=np.int32, count=m)
+    return build_reverse_csr(edge_src, edge_dst, np.asarray(node_ids, dtype=str))
+
+#===============================================[PROPAGATION]===============================================
+def gather_consumers(csr: ReverseCSR, frontier: np.ndarray) -> np.ndarray:
+    """
+    Retorna (con repeticiones) los consumidores directos de todos los nodos de la frontera.
+    """
+    starts = csr.indptr[frontier]
+    counts = csr.indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=csr.indices.dtype)
+
+    # Posiciones en `indices` de cada segmento [start, start + count) concatenadas
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+    return csr.indices[offsets]
+
+
+def infected_levels(csr: ReverseCSR, source: int, max_depth: int = None, target: int = None) -> dict:
+    """
+    BFS por niveles desde el índice `source` sobre la adyacencia inversa.
+    Retorna Dict[int, np.ndarray] con los índices de nodo alcanzados en cada nivel de salto.
+    Dentro de cada nivel los nodos mantienen el orden de descubrimiento.
+    Con `target`, el BFS se detiene en el nivel que lo alcanza (el último del resultado).
+    """
+    visited = np.zeros(csr.number_of_nodes, dtype=bool)
+    visited[source] = True
+    frontier = np.array([source], dtype=np.int64)
+    levels = {0: frontier}
+
+    level = 0
+    while frontier.size and (max_depth is None or level < max_depth) and (target is None or not visited[target]):
+        candidates = gather_consumers(csr, frontier)
+        candidates = candidates[~visited[candidates]]
+        if candidates.size == 0:
+            break
+
+        # Únicos en orden de primera aparición
+        unique, first = np.unique(candidates, return_index=True)
+        frontier = unique[np.argsort(first, kind="stable")].astype(np.int64)
+
+        visited[frontier] = True
+        level += 1
+        levels[level] = frontier
+
+    return levels
+
+
+def get_infected_nodes_csr(csr: ReverseCSR, compromised_node: str, return_indices: bool = False,
+                           max_depth: int = None) -> dict:
+    """
+    Equivalente a grafo.get_infected_nodes sobre la adyacencia CSR.
+
+    Retorna: Dict[int, List[str]] con los nodos afectados por nivel de salto
+    (nivel 0 = nodo comprometido), o Dict[int, np.ndarray] de índices si return_indices=True.
+    """
+    source = csr.node_index.get(compromised_node)
+    if source is None:
+        logger.error("El nodo comprometido '%s' no existe en el grafo.", compromised_node)
+        return {}
+
+    levels = infected_levels(csr, source, max_depth=max_depth)
+    incr("bfs_levels", len(levels))
+    incr("bfs_nodes_visited", sum(len(idx) for idx in levels.values()))
+    if return_indices:
+        return levels
+
+    node_ids = csr.node_ids
+    return {level: node_ids[idx].tolist() for level, idx in levels.items()}
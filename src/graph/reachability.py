@@ -0,0 +1,413 @@
+"""
+Índice de alcanzabilidad precalculado para consultas de radio de impacto.
+
+Se construye una vez por versión del catálogo (clave: hash de contenido) y se guarda junto a la BD:
+- condensación en componentes fuertemente conexas (SCC) de la adyacencia inversa,
+- etiquetado por intervalos de la condensación: cada componente recibe su número post-orden de
+  un DFS y guarda las componentes que alcanza como intervalos disjuntos de esos números (los
+  subárboles del DFS son contiguos, así que en grafos casi arborescentes basta un intervalo),
+- opcionalmente, la tabla de niveles de salto de cada activo (resultado del BFS para todos los orígenes;
+  cuadrática, solo para catálogos pequeños). Sin ella los niveles se calculan por origen con el BFS CSR.
+
+Con ello "¿Y se ve afectado por X?" es una búsqueda binaria en los intervalos de X, "¿qué activos
+afecta X?" se lee de los intervalos (post-orden -> componente -> activos) sin recorrer aristas y los
+conteos para todo el catálogo son sumas de prefijos. Los niveles de salto sí necesitan un BFS desde X
+(salvo con la tabla de niveles). Si el etiquetado supera `max_intervals` (grafos muy densos en
+alcanzabilidad) no se guarda y las consultas recurren al BFS CSR.
+"""
+
+#===============================================[IMPORTS]===============================================
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+from src.database.catalog_version import get_content_hash
+from src.graph.propagation import ReverseCSR, build_reverse_csr, infected_levels
+from src.graph.snapshot import (
+    SNAPSHOT_DIRNAME,
+    get_graph_snapshot,
+    load_arrays,
+    prune_stale,
+    save_arrays,
+    snapshot_path,
+    snapshot_prefix,
+)
+
+#===============================================[CONSTANTS]===============================================
+REACHABILITY_FORMAT_VERSION = 2
+REACHABILITY_PREFIX = "reach"
+# Límite de intervalos del etiquetado (8 bytes cada uno en disco, ~200 durante la construcción);
+# por encima se omite y las consultas usan el BFS CSR
+DEFAULT_MAX_INTERVALS = 8_000_000
+
+INDEX_FIELDS = ("node_ids", "indptr", "indices", "component", "component_size",
+                "post", "reach_indptr", "reach_lo", "reach_hi")
+LEVEL_FIELDS = ("levels_indptr", "levels_nodes", "levels_hops")
+
+#===============================================[INDEX]===============================================
+@dataclass
+class ReachabilityIndex:
+    """
+    Índice de alcanzabilidad del grafo MDO.
+
+    component (n,):        componente fuertemente conexa de cada activo.
+    component_size (C,):   número de activos de cada componente.
+    post (C,):             número post-orden de cada componente en el DFS de la condensación.
+    reach_*:               intervalos (CSR por componente) de números post-orden alcanzables:
+                           la componente c afecta a las de post en [reach_lo[k], reach_hi[k]] para
+                           k en reach_indptr[c]:reach_indptr[c + 1]. Vacíos si se superó el límite.
+    levels_*:              tabla de niveles (CSR por activo origen): para el activo i,
+                           levels_nodes[levels_indptr[i]:levels_indptr[i + 1]] son los activos afectados
+                           en orden BFS y levels_hops el nivel de salto de cada uno. Vacía si no se calculó.
+    """
+    node_ids: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    component: np.ndarray
+    component_size: np.ndarray
+    post: np.ndarray
+    reach_indptr: np.ndarray
+    reach_lo: np.ndarray
+    reach_hi: np.ndarray
+    levels_indptr: np.ndarray = None
+    levels_nodes: np.ndarray = None
+    levels_hops: np.ndarray = None
+    content_hash: str = ""
+
+    @property
+    def has_levels(self) -> bool:
+        return self.levels_indptr is not None and len(self.levels_indptr) == len(self.node_ids) + 1
+
+    @property
+    def has_reach(self) -> bool:
+        return len(self.reach_indptr) == len(self.component_size) + 1
+
+    @cached_property
+    def node_index(self) -> dict:
+        return {asset_id: i for i, asset_id in enumerate(self.node_ids.tolist())}
+
+    @cached_property
+    def csr(self) -> ReverseCSR:
+        return ReverseCSR(indptr=self.indptr, indices=self.indices, node_ids=self.node_ids)
+
+    @cached_property
+    def component_by_post(self) -> np.ndarray:
+        order = np.empty(len(self.post), dtype=np.int64)
+        order[self.post] = np.arange(len(self.post))
+        return order
+
+    @cached_property
+    def members(self):
+        """(members_indptr, members): activos de cada componente en formato CSR."""
+        members_indptr = np.zeros(len(self.component_size) + 1, dtype=np.int64)
+        np.cumsum(self.component_size, out=members_indptr[1:])
+        return members_indptr, np.argsort(self.component, kind="stable")
+
+    def _index(self, asset_id: str) -> int:
+        try:
+            return self.node_index[asset_id]
+        except KeyError:
+            raise KeyError(f"El activo '{asset_id}' no existe en el índice de alcanzabilidad.") from None
+
+    #=================={Consultas puntuales}========================#
+    def is_affected(self, compromised_node: str, asset_id: str) -> bool:
+        """
+        True si `asset_id` depende (directa o transitivamente) de `compromised_node`.
+        Un activo se considera afectado por sí mismo (nivel 0).
+        """
+        source, target = self._index(compromised_node), self._index(asset_id)
+        if not self.has_reach:
+            levels = infected_levels(self.csr, source, target=target)
+            return bool(np.any(levels[max(levels)] == target))
+        cx = self.component[source]
+        label = self.post[self.component[target]]
+        start, end = self.reach_indptr[cx], self.reach_indptr[cx + 1]
+        k = start + np.searchsorted(self.reach_lo[start:end], label, side="right") - 1
+        return bool(k >= start and label <= self.reach_hi[k])
+
+    def affected_nodes(self, compromised_node: str, return_indices: bool = False) -> list:
+        """
+        Activos afectados por `compromised_node` (incluido él mismo), sin niveles de salto.
+        Con el etiquetado se leen de los intervalos: post-orden -> componente -> activos, en tiempo
+        proporcional al resultado; sin él, BFS CSR. Orden: por componente, no por nivel.
+        """
+        source = self._index(compromised_node)
+        if not self.has_reach:
+            idx = np.concatenate(list(infected_levels(self.csr, source).values()))
+        else:
+            cx = self.component[source]
+            start, end = self.reach_indptr[cx], self.reach_indptr[cx + 1]
+            lo = np.asarray(self.reach_lo[start:end], dtype=np.int64)
+            components = self.component_by_post[_ranges(lo, np.asarray(self.reach_hi[start:end]) - lo + 1)]
+            members_indptr, members = self.members
+            idx = members[_ranges(members_indptr[components], self.component_size[components])]
+
+        if return_indices:
+            return idx
+        return self.node_ids[idx].tolist()
+
+    def affected_levels(self, compromised_node: str, return_indices: bool = False) -> dict:
+        """
+        Activos afectados por `compromised_node` agrupados por nivel de salto, con la misma forma
+        que grafo.get_infected_nodes: Dict[int, List[str]] (o índices si return_indices=True).
+        Usa la tabla de niveles precalculada; si no existe, un BFS CSR completo desde el origen
+        (los intervalos no guardan distancias). Para el conjunto sin niveles, ver affected_nodes.
+        """
+        source = self._index(compromised_node)
+        if not self.has_levels:
+            levels = infected_levels(self.csr, source)
+        else:
+            start, end = self.levels_indptr[source], self.levels_indptr[source + 1]
+            nodes = np.asarray(self.levels_nodes[start:end])
+            hops = np.asarray(self.levels_hops[start:end])
+            # La tabla está en orden BFS: los niveles son tramos contiguos
+            bounds = np.flatnonzero(np.diff(hops)) + 1
+            levels = {int(chunk_hops[0]): chunk for chunk, chunk_hops in zip(np.split(nodes, bounds), np.split(hops, bounds))}
+
+        if return_indices:
+            return levels
+        return {level: self.node_ids[idx].tolist() for level, idx in levels.items()}
+
+    def hop_level(self, compromised_node: str, asset_id: str):
+        """
+        Nivel de salto al que `asset_id` se ve afectado por `compromised_node`, o None si no le afecta.
+        Con la tabla de niveles es una búsqueda en la fila del origen. Si no, los intervalos descartan
+        sin recorrer el grafo los activos no afectados y el nivel sale de un BFS CSR que se detiene al
+        alcanzar `asset_id`.
+        """
+        source, target = self._index(compromised_node), self._index(asset_id)
+        if self.has_levels:
+            start, end = self.levels_indptr[source], self.levels_indptr[source + 1]
+            hit = np.flatnonzero(np.asarray(self.levels_nodes[start:end]) == target)
+            return int(self.levels_hops[start + hit[0]]) if hit.size else None
+        if self.has_reach and not self.is_affected(compromised_node, asset_id):
+            return None
+        levels = infected_levels(self.csr, source, target=target)
+        level = max(levels)
+        return level if np.any(levels[level] == target) else None
+
+    #=================={Consultas masivas}========================#
+    def affected_counts(self) -> np.ndarray:
+        """
+        Número de activos afectados (sin contar el propio activo) por el compromiso de cada activo.
+        Con el etiquetado, suma de prefijos de los tamaños de componente sobre cada intervalo;
+        sin él, un BFS CSR por activo.
+        """
+        if not self.has_reach:
+            return np.array([sum(len(idx) for idx in infected_levels(self.csr, i).values()) - 1
+                             for i in range(len(self.node_ids))], dtype=np.int64)
+        n_components = len(self.component_size)
+        prefix = np.zeros(n_components + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.post, weights=self.component_size, minlength=n_components).astype(np.int64),
+                  out=prefix[1:])
+        spans = prefix[np.asarray(self.reach_hi, dtype=np.int64) + 1] - prefix[self.reach_lo]
+        counts = np.add.reduceat(spans, self.reach_indptr[:-1]) if len(spans) else np.zeros(n_components, dtype=np.int64)
+        return counts[self.component] - 1
+
+    def bulk_affected_levels(self):
+        """
+        Generador (asset_id, {nivel: [asset_id, ...]}) para todos los activos del catálogo.
+        """
+        for asset_id in self.node_ids.tolist():
+            yield asset_id, self.affected_levels(asset_id)
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenación de arange(s, s + l) para cada par (s, l), sin bucle en Python."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(np.asarray(starts, dtype=np.int64) - offsets, lengths) + np.arange(lengths.sum())
+
+#===============================================[CONSTRUCTION]===============================================
+def strongly_connected_components(csr: ReverseCSR):
+    """
+    Componentes fuertemente conexas de la adyacencia inversa (las mismas que las del grafo original).
+    Retorna (n_components, labels).
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n = csr.number_of_nodes
+    data = np.ones(len(csr.indices), dtype=np.int8)
+    matrix = csr_matrix((data, csr.indices, csr.indptr), shape=(n, n))
+    n_components, labels = connected_components(matrix, directed=True, connection="strong")
+    return n_components, labels.astype(np.int32)
+
+
+def condensation_reach(csr: ReverseCSR, labels: np.ndarray, n_components: int,
+                       max_intervals: int = DEFAULT_MAX_INTERVALS):
+    """
+    Etiquetado por intervalos de la condensación (DAG de componentes, aristas proveedor -> consumidor).
+
+    Un DFS iterativo numera las componentes en post-orden: el subárbol de c ocupa [low[c], post[c]].
+    En post-orden todos los sucesores de c ya están etiquetados, así que
+    reach[c] = [low[c], post[c]] ∪ reach[sucesores de c], fusionando los intervalos solapados o contiguos.
+    Retorna (post, reach_indptr, reach_lo, reach_hi), con los tres últimos vacíos si el total de
+    intervalos supera `max_intervals`.
+    """
+    # Aristas proveedor -> consumidor entre componentes distintas, sin repetir
+    providers = np.repeat(np.arange(csr.number_of_nodes), np.diff(csr.indptr))
+    cp = labels[providers].astype(np.int64)
+    cu = labels[csr.indices].astype(np.int64)
+    mask = cp != cu
+    pairs = np.unique(cp[mask] * n_components + cu[mask])
+    cp, cu = pairs // n_components, pairs % n_components
+
+    succ_indptr = np.zeros(n_components + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cp, minlength=n_components), out=succ_indptr[1:])
+    succ_indptr = succ_indptr.tolist()
+    succ = cu.tolist()  # ya ordenado por cp al venir de np.unique
+
+    # DFS iterativo desde las raíces (sin proveedores dentro de la condensación)
+    post = [-1] * n_components
+    low = [0] * n_components
+    order = []
+    counter = 0
+    roots = np.flatnonzero(np.bincount(cu, minlength=n_components) == 0).tolist()
+    for root in roots:
+        low[root] = counter
+        post[root] = -2  # en la pila
+        stack = [(root, succ_indptr[root])]
+        while stack:
+            c, k = stack[-1]
+            if k < succ_indptr[c + 1]:
+                stack[-1] = (c, k + 1)
+                s = succ[k]
+                if post[s] == -1:
+                    low[s] = counter
+                    post[s] = -2
+                    stack.append((s, succ_indptr[s]))
+            else:
+                stack.pop()
+                post[c] = counter
+                order.append(c)
+                counter += 1
+
+    # Intervalos en post-orden: los de los sucesores ya están calculados
+    reach = [None] * n_components
+    total = 0
+    for c in order:
+        lo, hi = low[c], post[c]
+        # Los intervalos contenidos en el subárbol de c ya están cubiertos por [lo, hi]
+        outside = [iv for s in succ[succ_indptr[c]:succ_indptr[c + 1]] for iv in reach[s]
+                   if iv[0] < lo or iv[1] > hi]
+        if not outside:
+            merged = [(lo, hi)]
+        else:
+            outside.append((lo, hi))
+            outside.sort()
+            merged = [outside[0]]
+            for a, b in outside[1:]:
+                if a <= merged[-1][1] + 1:
+                    if b > merged[-1][1]:
+                        merged[-1] = (merged[-1][0], b)
+                else:
+                    merged.append((a, b))
+        reach[c] = merged
+        total += len(merged)
+        if total > max_intervals:
+            empty = np.zeros(0, dtype=np.int32)
+            return np.asarray(post, dtype=np.int32), np.zeros(0, dtype=np.int64), empty, empty
+
+    reach_indptr = np.zeros(n_components + 1, dtype=np.int64)
+    np.cumsum([len(r) for r in reach], out=reach_indptr[1:])
+    flat = np.array([iv for r in reach for iv in r], dtype=np.int32).reshape(-1, 2)
+    return np.asarray(post, dtype=np.int32), reach_indptr, flat[:, 0].copy(), flat[:, 1].copy()
+
+
+def all_levels_table(csr: ReverseCSR):
+    """
+    Ejecuta el BFS por niveles desde cada activo y concatena los resultados en formato CSR.
+    Retorna (levels_indptr, levels_nodes, levels_hops).
+    """
+    n = csr.number_of_nodes
+    nodes_chunks, hops_chunks = [], []
+    levels_indptr = np.zeros(n + 1, dtype=np.int64)
+    for source in range(n):
+        levels = infected_levels(csr, source)
+        for level, idx in levels.items():
+            nodes_chunks.append(idx.astype(np.int32))
+            hops_chunks.append(np.full(len(idx), level, dtype=np.uint16))
+        levels_indptr[source + 1] = levels_indptr[source] + sum(len(idx) for idx in levels.values())
+
+    levels_nodes = np.concatenate(nodes_chunks) if nodes_chunks else np.zeros(0, dtype=np.int32)
+    levels_hops = np.concatenate(hops_chunks) if hops_chunks else np.zeros(0, dtype=np.uint16)
+    return levels_indptr, levels_nodes, levels_hops
+
+
+def build_reachability_index(snapshot, with_levels: bool = False,
+                             max_intervals: int = DEFAULT_MAX_INTERVALS) -> ReachabilityIndex:
+    """
+    Construye el índice a partir de un GraphSnapshot (ver src/graph/snapshot.py).
+    with_levels=True añade la tabla de niveles de todos los orígenes (coste cuadrático: solo para
+    catálogos pequeños); sin ella affected_levels usa el BFS CSR desde el origen pedido.
+    """
+    csr = build_reverse_csr(snapshot.edge_src, snapshot.edge_dst, snapshot.node_ids)
+    n_components, labels = strongly_connected_components(csr)
+    post, reach_indptr, reach_lo, reach_hi = condensation_reach(csr, labels, n_components, max_intervals)
+
+    index = ReachabilityIndex(
+        node_ids=np.asarray(snapshot.node_ids),
+        indptr=csr.indptr,
+        indices=csr.indices,
+        component=labels,
+        component_size=np.bincount(labels, minlength=n_components).astype(np.int64),
+        post=post,
+        reach_indptr=reach_indptr,
+        reach_lo=reach_lo,
+        reach_hi=reach_hi,
+        content_hash=snapshot.content_hash,
+    )
+    if with_levels:
+        index.levels_indptr, index.levels_nodes, index.levels_hops = all_levels_table(csr)
+    return index
+
+#===============================================[PERSISTENCE]===============================================
+def save_reachability_index(index: ReachabilityIndex, directory: Path) -> Path:
+    arrays = {name: getattr(index, name) for name in INDEX_FIELDS}
+    if index.has_levels:
+        arrays.update({name: getattr(index, name) for name in LEVEL_FIELDS})
+    meta = dict(
+        format_version=REACHABILITY_FORMAT_VERSION,
+        content_hash=index.content_hash,
+        with_levels=index.has_levels,
+        number_of_components=len(index.component_size),
+    )
+    return save_arrays(directory, arrays, meta)
+
+
+def load_reachability_index(directory: Path, mmap: bool = True) -> ReachabilityIndex:
+    arrays, meta = load_arrays(directory, INDEX_FIELDS, mmap=mmap)
+    if meta.get("format_version") != REACHABILITY_FORMAT_VERSION:
+        raise ValueError(f"Formato de índice no soportado en {directory}: {meta.get('format_version')}")
+    if meta.get("with_levels"):
+        level_arrays, _ = load_arrays(directory, LEVEL_FIELDS, mmap=mmap)
+        arrays.update(level_arrays)
+    return ReachabilityIndex(**arrays, content_hash=meta["content_hash"])
+
+
+def get_reachability_index(db_path: str, with_levels: bool = False, snapshot_dir: Path = None,
+                           mmap: bool = True) -> ReachabilityIndex:
+    """
+    Retorna el índice de alcanzabilidad de la versión actual del catálogo.
+    Si no existe uno para el hash de contenido de la BD (o falta la tabla de niveles pedida)
+    se reconstruye desde el snapshot del grafo, se guarda junto a la BD y se eliminan los
+    índices de versiones anteriores.
+    """
+    if snapshot_dir is None:
+        snapshot_dir = Path(db_path).parent / SNAPSHOT_DIRNAME
+    content_hash = get_content_hash(db_path)
+    prefix = snapshot_prefix(db_path, REACHABILITY_PREFIX)
+    directory = snapshot_path(content_hash, snapshot_dir, prefix=prefix)
+
+    if (directory / "meta.json").exists():
+        index = load_reachability_index(directory, mmap=mmap)
+        if index.has_levels or not with_levels:
+            return index
+
+    snapshot = get_graph_snapshot(db_path, snapshot_dir=snapshot_dir, mmap=mmap)
+    index = build_reachability_index(snapshot, with_levels=with_levels)
+    save_reachability_index(index, directory)
+    prune_stale(snapshot_dir, prefix, keep=directory)
+    return load_reachability_index(directory, mmap=mmap) if mmap else index
@@ -0,0 +1,357 @@
+"""
+Snapshot binario del grafo global MDO.
+
+El grafo se guarda como un conjunto de arrays NumPy (.npy) -atributos de nodos y lista de aristas
+por índices enteros- en un directorio identificado por el hash de contenido del catálogo
+(ver src/database/catalog_version.py). Al recargarlo con memory-mapping:
+- no se ejecuta SQL ni se crean diccionarios por nodo/arista,
+- varios procesos que abren el mismo snapshot comparten las páginas del fichero.
+Los directorios se nombran <tipo>_<identidad de la BD>_<hash>: varias BD en el mismo directorio
+no comparten ni eliminan los snapshots de las demás.
+"""
+
+#===============================================[IMPORTS]===============================================
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+from src.database.catalog_version import get_content_hash
+from src.instrumentation.metrics import incr
+
+#===============================================[CONSTANTS]===============================================
+SNAPSHOT_FORMAT_VERSION = 1
+# Los snapshots se guardan junto a la BD, en <directorio de la BD>/snapshots/
+SNAPSHOT_DIRNAME = "snapshots"
+
+# Arrays que componen el snapshot (nombre de fichero = nombre del atributo)
+ARRAY_FIELDS = (
+    "node_ids", "node_names", "asset_type", "domain", "operational_state", "criticality", "cia",
+    "edge_src", "edge_dst", "edge_ids", "dependency_type", "cia_couple", "weight",
+)
+
+#===============================================[SNAPSHOT]===============================================
+@dataclass
+class GraphSnapshot:
+    """
+    Grafo MDO en forma de arrays.
+
+    Nodos (n):   node_ids, node_names, asset_type/domain/operational_state (códigos),
+                 criticality (n,), cia (n, 3) con columnas C, I, A.
+    Aristas (m): edge_src/edge_dst (índices de nodo; src = consumidor, dst = proveedor),
+                 edge_ids, dependency_type (códigos), cia_couple (m, 3), weight (m,).
+    vocab: {columna categórica: lista de valores} para decodificar los códigos.
+    """
+    node_ids: np.ndarray
+    node_names: np.ndarray
+    asset_type: np.ndarray
+    domain: np.ndarray
+    operational_state: np.ndarray
+    criticality: np.ndarray
+    cia: np.ndarray
+    edge_src: np.ndarray
+    edge_dst: np.ndarray
+    edge_ids: np.ndarray
+    dependency_type: np.ndarray
+    cia_couple: np.ndarray
+    weight: np.ndarray
+    vocab: dict = field(default_factory=dict)
+    content_hash: str = ""
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def number_of_edges(self) -> int:
+        return len(self.edge_src)
+
+    @cached_property
+    def node_index(self) -> dict:
+        """
+        Diccionario asset_id -> índice de nodo (se construye en el primer uso).
+        """
+        return {asset_id: i for i, asset_id in enumerate(self.node_ids.tolist())}
+
+    @cached_property
+    def reverse_csr(self):
+        """
+        Adyacencia inversa CSR para la propagación (ver src/graph/propagation.py), construida en el primer uso.
+        """
+        from src.graph.propagation import reverse_csr_from_snapshot
+        return reverse_csr_from_snapshot(self)
+
+    def decode(self, column: str, codes) -> list:
+        """
+        Traduce códigos de una columna categórica a sus valores originales.
+        """
+        values = self.vocab[column]
+        return [values[c] for c in np.asarray(codes).tolist()]
+
+    def to_networkx(self):
+        """
+        Reconstruye el nx.DiGraph equivalente al de grafo.load_MDO_global_graph.
+        """
+        import networkx as nx
+
+        G = nx.DiGraph(domain="MDO Global")
+        node_ids = self.node_ids.tolist()
+        asset_types = self.decode("asset_type", self.asset_type)
+        domains = self.decode("domain", self.domain)
+        states = self.decode("operational_state", self.operational_state)
+        G.add_nodes_from(
+            (
+                node_ids[i],
+                {
+                    "name": name,
+                    "asset_type": asset_types[i],
+                    "domain": domains[i],
+                    "criticality": crit,
+                    "cia_c": c,
+                    "cia_i": ii,
+                    "cia_a": a,
+                    "operational_state": states[i],
+                },
+            )
+            for i, (name, crit, (c, ii, a)) in enumerate(
+                zip(self.node_names.tolist(), self.criticality.tolist(), self.cia.tolist())
+            )
+        )
+
+        dep_types = self.decode("dependency_type", self.dependency_type)
+        G.add_edges_from(
+            (
+                node_ids[src],
+                node_ids[dst],
+                {
+                    "dependency_id": dep_id,
+                    "dependency_type": dep_types[k],
+                    "cia_couple_c": cc,
+                    "cia_couple_i": ci,
+                    "cia_couple_a": ca,
+                    "weight": w,
+                },
+            )
+            for k, (src, dst, dep_id, (cc, ci, ca), w) in enumerate(zip(
+                self.edge_src.tolist(), self.edge_dst.tolist(), self.edge_ids.tolist(),
+                self.cia_couple.tolist(), self.weight.tolist(),
+            ))
+        )
+        return G
+
+
+def _encode_categorical(values: list):
+    """
+    Codifica una lista de strings como (códigos int16, vocabulario ordenado).
+    """
+    vocab, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return codes.astype(np.int16), vocab.tolist()
+
+
+def _string_array(values: list) -> np.ndarray:
+    # dtype 'U' de ancho fijo: se puede mapear en memoria sin deserializar objetos Python
+    return np.asarray(values, dtype=str) if values else np.zeros(0, dtype="<U1")
+
+
+def snapshot_from_db(db_path: str, content_hash: str = None) -> GraphSnapshot:
+    """
+    Construye el snapshot directamente desde la BD (dos SELECT), sin pasar por networkx.
+    """
+    con = sqlite3.connect(db_path)
+    try:
+        assets = con.execute("""
+            SELECT asset_id, name, asset_type, domain, criticality, cia_c, cia_i, cia_a, operational_state
+            FROM assets ORDER BY asset_pk;
+        """).fetchall()
+        deps = con.execute("""
+            SELECT dependency_id, from_asset, to_asset, dependency_type, cia_couple_c, cia_couple_i, cia_couple_a
+            FROM dependencies ORDER BY dep_pk;
+        """).fetchall()
+    finally:
+        con.close()
+    incr("sql_rows_read", len(assets) + len(deps))
+
+    node_ids = [row[0] for row in assets]
+    index = {asset_id: i for i, asset_id in enumerate(node_ids)}
+
+    vocab = {}
+    asset_type, vocab["asset_type"] = _encode_categorical([row[2] for row in assets])
+    domain, vocab["domain"] = _encode_categorical([row[3] for row in assets])
+    operational_state, vocab["operational_state"] = _encode_categorical([row[8] for row in assets])
+    dependency_type, vocab["dependency_type"] = _encode_categorical([row[3] for row in deps])
+
+    cia_couple = np.array([row[4:7] for row in deps], dtype=np.float64).reshape(-1, 3)
+
+    return GraphSnapshot(
+        node_ids=_string_array(node_ids),
+        node_names=_string_array([row[1] for row in assets]),
+        asset_type=asset_type,
+        domain=domain,
+        operational_state=operational_state,
+        criticality=np.array([row[4] for row in assets], dtype=np.float64),
+        cia=np.array([row[5:8] for row in assets], dtype=np.float64).reshape(-1, 3),
+        edge_src=np.array([index[row[1]] for row in deps], dtype=np.int32),
+        edge_dst=np.array([index[row[2]] for row in deps], dtype=np.int32),
+        edge_ids=_string_array([row[0] for row in deps]),
+        dependency_type=dependency_type,
+        cia_couple=cia_couple,
+        weight=np.sqrt((cia_couple ** 2).sum(axis=1)),
+        vocab=vocab,
+        content_hash=content_hash or get_content_hash(db_path),
+    )
+
+
+def snapshot_from_graph(G, content_hash: str = "") -> GraphSnapshot:
+    """
+    Construye el snapshot a partir de un nx.DiGraph ya construido (p. ej. el de build_MDO_graph).
+    """
+    node_ids = list(G.nodes)
+    index = {asset_id: i for i, asset_id in enumerate(node_ids)}
+    nodes = [G.nodes[n] for n in node_ids]
+    edges = list(G.edges(data=True))
+
+    vocab = {}
+    asset_type, vocab["asset_type"] = _encode_categorical([d["asset_type"] for d in nodes])
+    domain, vocab["domain"] = _encode_categorical([d["domain"] for d in nodes])
+    operational_state, vocab["operational_state"] = _encode_categorical([d["operational_state"] for d in nodes])
+    dependency_type, vocab["dependency_type"] = _encode_categorical([d["dependency_type"] for _, _, d in edges])
+
+    return GraphSnapshot(
+        node_ids=_string_array(node_ids),
+        node_names=_string_array([d["name"] for d in nodes]),
+        asset_type=asset_type,
+        domain=domain,
+        operational_state=operational_state,
+        criticality=np.array([d["criticality"] for d in nodes], dtype=np.float64),
+        cia=np.array([(d["cia_c"], d["cia_i"], d["cia_a"]) for d in nodes], dtype=np.float64).reshape(-1, 3),
+        edge_src=np.array([index[u] for u, _, _ in edges], dtype=np.int32),
+        edge_dst=np.array([index[v] for _, v, _ in edges], dtype=np.int32),
+        edge_ids=_string_array([d["dependency_id"] for _, _, d in edges]),
+        dependency_type=dependency_type,
+        cia_couple=np.array(
+            [(d["cia_couple_c"], d["cia_couple_i"], d["cia_couple_a"]) for _, _, d in edges], dtype=np.float64
+        ).reshape(-1, 3),
+        weight=np.array([d["weight"] for _, _, d in edges], dtype=np.float64),
+        vocab=vocab,
+        content_hash=content_hash,
+    )
+
+#===============================================[PERSISTENCE]===============================================
+def snapshot_prefix(db_path: str, kind: str = "graph") -> str:
+    """
+    Prefijo de los directorios de snapshot de una BD: `kind` + hash de su ruta absoluta.
+    """
+    db_key = hashlib.sha256(str(Path(db_path).resolve()).encode()).hexdigest()[:8]
+    return f"{kind}_{db_key}"
+
+
+def snapshot_path(content_hash: str, snapshot_dir: Path, prefix: str = "graph") -> Path:
+    return Path(snapshot_dir) / f"{prefix}_{content_hash[:16]}"
+
+
+def save_arrays(directory: Path, arrays: dict, meta: dict) -> Path:
+    """
+    Guarda un conjunto de arrays como un directorio de ficheros .npy + meta.json.
+    Se escribe en un directorio temporal propio del proceso y se renombra al final (escritura atómica).
+    """
+    directory = Path(directory)
+    tmp_dir = directory.with_name(f"{directory.name}.tmp{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    if directory.exists():
+        shutil.rmtree(directory, ignore_errors=True)
+    try:
+        tmp_dir.rename(directory)
+    except OSError:
+        # Otro proceso ha publicado el mismo directorio entre medias: se conserva el suyo
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not (directory / "meta.json").exists():
+            raise
+    return directory
+
+
+def load_arrays(directory: Path, names, mmap: bool = True):
+    """
+    Carga los arrays `names` y el meta.json de un directorio guardado con save_arrays.
+    Con mmap=True los arrays se mapean en memoria (solo lectura) en lugar de copiarse.
+    Retorna (arrays, meta).
+    """
+    directory = Path(directory)
+    with open(directory / "meta.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    mmap_mode = "r" if mmap else None
+    arrays = {
+        name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+        for name in names
+    }
+    return arrays, meta
+
+
+def prune_stale(snapshot_dir: Path, prefix: str, keep: Path) -> None:
+    """
+    Elimina los directorios `<prefix>_*` de versiones anteriores del catálogo, salvo `keep`
+    y los temporales de escrituras en curso de otros procesos.
+    (Los procesos que aún los tengan mapeados conservan sus páginas hasta cerrarlos.)
+    """
+    for directory in Path(snapshot_dir).glob(f"{prefix}_*"):
+        if directory.is_dir() and ".tmp" not in directory.name and directory.resolve() != Path(keep).resolve():
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def save_snapshot(snapshot: GraphSnapshot, directory: Path) -> Path:
+    """
+    Guarda el snapshot como un directorio de ficheros .npy + meta.json.
+    """
+    meta = dict(
+        format_version=SNAPSHOT_FORMAT_VERSION,
+        content_hash=snapshot.content_hash,
+        vocab=snapshot.vocab,
+        number_of_nodes=snapshot.number_of_nodes,
+        number_of_edges=snapshot.number_of_edges,
+    )
+    return save_arrays(directory, {name: getattr(snapshot, name) for name in ARRAY_FIELDS}, meta)
+
+
+def load_snapshot(directory: Path, mmap: bool = True) -> GraphSnapshot:
+    """
+    Carga un snapshot guardado con save_snapshot (mapeado en memoria si mmap=True).
+    """
+    arrays, meta = load_arrays(directory, ARRAY_FIELDS, mmap=mmap)
+    if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Formato de snapshot no soportado en {directory}: {meta.get('format_version')}")
+    return GraphSnapshot(**arrays, vocab=meta["vocab"], content_hash=meta["content_hash"])
+
+
+def get_graph_snapshot(db_path: str, snapshot_dir: Path = None, mmap: bool = True) -> GraphSnapshot:
+    """
+    Retorna el snapshot del catálogo actual: si ya existe uno para el hash de contenido
+    de la BD se mapea en memoria; si no, se construye desde la BD y se guarda.
+    Por defecto los snapshots se guardan en el directorio "snapshots" junto a la BD.
+    """
+    if snapshot_dir is None:
+        snapshot_dir = Path(db_path).parent / SNAPSHOT_DIRNAME
+    content_hash = get_content_hash(db_path)
+    prefix = snapshot_prefix(db_path)
+    directory = snapshot_path(content_hash, snapshot_dir, prefix=prefix)
+
+    if (directory / "meta.json").exists():
+        return load_snapshot(directory, mmap=mmap)
+
+    snapshot = snapshot_from_db(db_path, content_hash)
+    save_snapshot(snapshot, directory)
+    prune_stale(snapshot_dir, prefix, keep=directory)
+    return load_snapshot(directory, mmap=mmap) if mmap else snapshot
@@ -0,0 +1,222 @@
+"""
+Instrumentación del motor: logging estructurado por niveles, tiempos por etapa y contadores.
+
+- Logging: los módulos usan logging.getLogger(__name__); configure_logging() fija el nivel
+  (WARNING por defecto, es decir, silencioso) y el formato ("text" o "json", una línea JSON por
+  registro con los campos pasados en `extra`).
+- Etapas: `with stage("paso_3_grafo"):` registra tiempo de pared, tiempo de CPU y memoria:
+  pico de RSS durante la etapa y su crecimiento sobre el RSS al empezarla. En Linux el pico es el
+  de la propia etapa (se reinicia VmHWM al empezarla); en otras plataformas es el pico acumulado
+  del proceso desde su arranque (ru_maxrss), y una etapa que no lo supera registra crecimiento 0.
+- Contadores: `incr("sql_rows_read", n)`. Son sumas en un dict: baratos en los bucles calientes.
+- Exportación por ejecución: export_metrics(path) escribe JSON (.json) o el formato text-file de
+  Prometheus (cualquier otra extensión, p. ej. .prom para el textfile collector de node_exporter).
+
+Solo usa la biblioteca estándar: importarlo no penaliza el arranque del motor.
+"""
+
+#===============================================[IMPORTS]===============================================
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+#===============================================[CONSTANTS]===============================================
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+LOG_FORMATS = ("text", "json")
+DEFAULT_LOG_LEVEL = "WARNING"
+# Logger raíz de los módulos del motor: las librerías externas se quedan en DEFAULT_LOG_LEVEL
+ENGINE_LOGGER = "src"
+PROMETHEUS_PREFIX = "cyberrecom"
+# Atributos estándar de logging.LogRecord (el resto son campos de `extra`)
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+#===============================================[LOGGING]===============================================
+class JsonFormatter(logging.Formatter):
+    """
+    Un objeto JSON por línea: ts, level, logger, message y los campos de `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = dict(
+            ts=round(record.created, 6),
+            level=record.levelname,
+            logger=record.name,
+            message=record.getMessage(),
+        )
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = DEFAULT_LOG_LEVEL, fmt: str = "text", stream=None) -> None:
+    """
+    Configura el nivel y el formato de los mensajes del motor (por defecto a stderr).
+    """
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Formato de log no soportado: {fmt}")
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(DEFAULT_LOG_LEVEL)
+    logging.getLogger(ENGINE_LOGGER).setLevel(level.upper())
+
+#===============================================[METRICS]===============================================
+def _proc_status_mb(field: str):
+    """
+    Campo de memoria de /proc/self/status (MB), o None fuera de Linux.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Reinicia el pico de RSS del proceso (VmHWM de Linux). False si la plataforma no lo permite.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _max_rss_mb() -> float:
+    """
+    Pico de memoria residente del proceso (MB), o 0 si la plataforma no lo expone.
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB; macOS, en bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class Metrics:
+    """
+    Registro de etapas y contadores de una ejecución.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.started_at = time.time()
+        self.stages = {}
+        self.counters = {}
+        # Pico observado por cada etapa abierta (las anidadas reinician VmHWM)
+        self._open_peaks = []
+
+    def _peak_rss_mb(self) -> float:
+        """
+        Pico de RSS desde el último reinicio (Linux) o desde el arranque del proceso; lo propaga
+        a las etapas abiertas.
+        """
+        peak = _proc_status_mb("VmHWM") or _max_rss_mb()
+        self._open_peaks[:] = [max(p, peak) for p in self._open_peaks]
+        return peak
+
+    def incr(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Mide el bloque como etapa `name`. Si la etapa se repite, los tiempos se acumulan.
+        """
+        self._peak_rss_mb()
+        per_stage = _reset_peak_rss()
+        rss_before = _proc_status_mb("VmRSS") if per_stage else _max_rss_mb()
+        self._open_peaks.append(rss_before)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._peak_rss_mb()
+            peak = self._open_peaks.pop()
+            entry = self.stages.setdefault(name, dict(calls=0, wall_seconds=0.0, cpu_seconds=0.0,
+                                                      peak_rss_mb=0.0, rss_growth_mb=0.0))
+            entry["calls"] += 1
+            entry["wall_seconds"] += wall
+            entry["cpu_seconds"] += cpu
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], peak)
+            entry["rss_growth_mb"] = max(entry["rss_growth_mb"], peak - rss_before)
+            logging.getLogger(__name__).info(
+                "etapa %s: %.3fs pared, %.3fs CPU", name, wall, cpu,
+                extra=dict(stage=name, wall_seconds=wall, cpu_seconds=cpu, peak_rss_mb=peak),
+            )
+
+    def to_dict(self) -> dict:
+        return dict(
+            started_at=self.started_at,
+            pid=os.getpid(),
+            stages={name: dict(entry) for name, entry in self.stages.items()},
+            counters=dict(self.counters),
+        )
+
+    def to_prometheus(self) -> str:
+        """
+        Métricas en el formato de exposición de texto de Prometheus.
+        """
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_run_started_timestamp_seconds Inicio de la ejecución (epoch).",
+            f"# TYPE {p}_run_started_timestamp_seconds gauge",
+            f"{p}_run_started_timestamp_seconds {self.started_at:.3f}",
+        ]
+        for field, help_text in (("wall_seconds", "Tiempo de pared por etapa."),
+                                 ("cpu_seconds", "Tiempo de CPU por etapa."),
+                                 ("peak_rss_mb", "Pico de RSS durante la etapa (MB; fuera de Linux, pico acumulado del proceso)."),
+                                 ("rss_growth_mb", "Pico de RSS de la etapa menos el RSS al empezarla (MB)."),
+                                 ("calls", "Ejecuciones de la etapa.")):
+            metric = f"{p}_stage_{field}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+            lines += [f'{metric}{{stage="{name}"}} {entry[field]}' for name, entry in self.stages.items()]
+        for name, value in sorted(self.counters.items()):
+            metric = f"{p}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path) -> None:
+        """
+        Escribe las métricas en `path`: JSON si la extensión es .json; si no, Prometheus.
+        """
+        path = Path(path)
+        text = json.dumps(self.to_dict(), indent=2) + "\n" if path.suffix == ".json" else self.to_prometheus()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        # Escritura atómica: el textfile collector nunca lee un fichero a medias
+        os.replace(tmp, path)
+
+#===============================================[REGISTRO GLOBAL]===============================================
+METRICS = Metrics()
+
+def incr(name: str, value: float = 1) -> None:
+    METRICS.incr(name, value)
+
+
+def stage(name: str):
+    return METRICS.stage(name)
+
+
+def export_metrics(path) -> None:
+    METRICS.export(path)
@@ -0,0 +1,240 @@
+"""
+Plantilla compilada de la red bayesiana parametrizada por los atributos de cada activo.
+
+La estructura y las CPTs base salen de bn_CPDs.json (vía red_bayes.get_inference_engine()); cada
+activo aporta un vector de parámetros:
+
+    [p_threat, criticality, w_C, w_I, w_A]
+
+- p_threat:    prior P(Threat=yes) = confianza x Impact_matrix[táctica][asset_type].
+- criticality: interpola la CPT de Risk | Threat. Con REFERENCE_CRITICALITY (0.5) se usa la CPT base;
+               hacia 0 se desplaza al primer estado de Risk (low) y hacia 1 al último (high).
+- w_C/I/A:     pesos CIA del activo, ponderan el impacto residual esperado de cada dimensión.
+
+Como CM es raíz y Risk no depende de CM, P(d_res | CM) = sum_r P(r) · P(d_res | r, CM) tiene forma
+cerrada: instanciar la red de miles de activos es rellenar arrays (k, ...), sin crear objetos de
+pgmpy. Los vectores de parámetros repetidos se deduplican y sus resultados se memoizan (LRU).
+"""
+
+#========================================[IMPORTS]========================================#
+from collections import OrderedDict
+
+import numpy as np
+
+import src.risk.red_bayes as red_bayes
+from src.risk.influence_diagram import RES_NODES, read_constants
+from src.graph.impact import load_impact_matrix, normalize_tactic
+
+#========================================[CONSTANTES]========================================#
+REFERENCE_CRITICALITY = 0.5
+PARAMETER_NAMES = ("p_threat", "criticality", "w_C", "w_I", "w_A")
+# Decimales con los que se redondean los parámetros para deduplicar y memoizar
+PARAMETER_DECIMALS = 6
+
+#========================================[PLANTILLA]========================================#
+class BNTemplate:
+    """
+    Red bayesiana compilada: CPTs base como arrays y evaluación vectorizada por lotes de activos.
+    """
+
+    def __init__(self, cpd_data: dict, cpd_hash: str = "", cache_size: int = 65536):
+        self.cpd_hash = cpd_hash
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+        self.threat_states = list(cpd_data["Threat"]["states"])
+        self.risk_states = list(cpd_data["Risk"]["states"])
+        self.countermeasures = list(cpd_data["CM"]["states"])
+        self.states = list(cpd_data[RES_NODES[0]]["states"])
+        if any(cpd_data[node]["states"] != self.states for node in RES_NODES):
+            raise ValueError("Los nodos residuales deben compartir los mismos estados")
+
+        n_risk, n_cm = len(self.risk_states), len(self.countermeasures)
+        # Risk | Threat: (n_risk, n_threat)
+        self.risk_cpt = np.array(cpd_data["Risk"]["values"], dtype=np.float64)
+        # d_res | Risk, CM: (3, n_estados, n_risk, n_cm), columnas ordenadas (Risk, CM)
+        self.res_cpts = np.array([cpd_data[node]["values"] for node in RES_NODES], dtype=np.float64)
+        self.res_cpts = self.res_cpts.reshape(len(RES_NODES), len(self.states), n_risk, n_cm)
+
+        levels = read_constants()["impact_levels"]
+        self.levels = np.array([float(levels[state]) for state in self.states])
+
+    #=================={Instanciación}========================#
+    def threat_prior(self, p_threat: np.ndarray) -> np.ndarray:
+        """
+        Prior de Threat (k, n_threat): [1 - p, p] para los estados [no, yes].
+        """
+        p_threat = np.clip(np.asarray(p_threat, dtype=np.float64), 0.0, 1.0)
+        return np.stack([1.0 - p_threat, p_threat], axis=-1)
+
+    def risk_tables(self, criticality: np.ndarray) -> np.ndarray:
+        """
+        CPTs de Risk | Threat interpoladas por criticidad: (k, n_risk, n_threat).
+        """
+        c = np.clip(np.asarray(criticality, dtype=np.float64), 0.0, 1.0)[:, None, None]
+        n_risk = len(self.risk_states)
+        lowest = np.eye(n_risk)[0][:, None]
+        highest = np.eye(n_risk)[-1][:, None]
+
+        below = c <= REFERENCE_CRITICALITY
+        t = np.where(below, c / REFERENCE_CRITICALITY, (c - REFERENCE_CRITICALITY) / (1.0 - REFERENCE_CRITICALITY))
+        target = np.where(below, lowest, highest)
+        base = self.risk_cpt[None, :, :]
+        return np.where(below, t * base + (1.0 - t) * target, (1.0 - t) * base + t * target)
+
+    def to_cpd_data(self, params) -> dict:
+        """
+        CPDs (formato bn_CPDs.json) de la red de un activo, p. ej. para construirla con
+        red_bayes.bayesian_network_construction(cpd_data, threat_confidence=params[0]).
+        """
+        params = np.asarray(params, dtype=np.float64)
+        risk = self.risk_tables(params[None, 1])[0]
+        cpd_data = {
+            "Threat": {"states": self.threat_states, "values": self.threat_prior(params[0]).tolist()},
+            "CM": {"states": self.countermeasures, "values": [1.0 / len(self.countermeasures)] * len(self.countermeasures)},
+            "Risk": {"states": self.risk_states, "values": risk.tolist()},
+        }
+        for d, node in enumerate(RES_NODES):
+            cpd_data[node] = {
+                "states": self.states,
+                "values": self.res_cpts[d].reshape(len(self.states), -1).tolist(),
+            }
+        return cpd_data
+
+    #=================={Evaluación}========================#
+    def _compute(self, params: np.ndarray) -> tuple:
+        """
+        Evalúa k vectores de parámetros (sin caché). Retorna (probabilidades, impacto esperado, impacto ponderado).
+        """
+        prior = self.threat_prior(params[:, 0])                       # (k, n_threat)
+        risk = np.einsum("krt,kt->kr", self.risk_tables(params[:, 1]), prior)
+        probabilities = np.einsum("kr,dsrc->kcds", risk, self.res_cpts)
+        expected = probabilities @ self.levels                        # (k, n_cm, 3)
+        weighted = np.einsum("kcd,kd->kc", expected, params[:, 2:5])
+        return probabilities, expected, weighted
+
+    def evaluate(self, params) -> dict:
+        """
+        Evalúa la red para cada fila de `params` (k, 5).
+
+        Las filas idénticas (tras redondear a PARAMETER_DECIMALS) se calculan una sola vez y los
+        resultados se memoizan entre llamadas.
+
+        Returns:
+            dict con:
+            - "probabilities":   (k, n_cm, 3, n_estados) P(d_res | CM) de cada activo
+            - "expected_impact": (k, n_cm, 3) impacto residual esperado por dimensión
+            - "weighted_impact": (k, n_cm) impacto esperado ponderado por los pesos CIA
+            - "best":            (k,) índice de la contramedida de menor impacto ponderado
+            - "unique":          número de vectores de parámetros distintos
+        """
+        params = np.round(np.atleast_2d(np.asarray(params, dtype=np.float64)), PARAMETER_DECIMALS)
+        unique, inverse = np.unique(params, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        keys = [row.tobytes() for row in unique]
+        cached = [self._cache.get(key) for key in keys]
+        missing = np.array([i for i, entry in enumerate(cached) if entry is None], dtype=np.int64)
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        k, n_cm = len(unique), len(self.countermeasures)
+        probabilities = np.empty((k, n_cm, len(RES_NODES), len(self.states)))
+        expected = np.empty((k, n_cm, len(RES_NODES)))
+        weighted = np.empty((k, n_cm))
+        outputs = (probabilities, expected, weighted)
+
+        for i, entry in enumerate(cached):
+            if entry is not None:
+                self._cache.move_to_end(keys[i])
+                for out, value in zip(outputs, entry):
+                    out[i] = value
+        if len(missing):
+            for out, value in zip(outputs, self._compute(unique[missing])):
+                out[missing] = value
+            for i in missing.tolist():
+                self._cache[keys[i]] = (probabilities[i], expected[i], weighted[i])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        probabilities, expected, weighted = probabilities[inverse], expected[inverse], weighted[inverse]
+
+        return dict(
+            probabilities=probabilities,
+            expected_impact=expected,
+            weighted_impact=weighted,
+            best=np.argmin(weighted, axis=1),
+            unique=len(unique),
+        )
+
+    def cache_info(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, size=len(self._cache), maxsize=self.cache_size)
+
+
+_template = None
+
+def get_bn_template() -> BNTemplate:
+    """
+    Devuelve la plantilla compilada, recompilándola si cambian las CPDs de bn_CPDs.json.
+    """
+    global _template
+    engine = red_bayes.get_inference_engine()
+    if _template is None or _template.cpd_hash != engine.cpd_hash:
+        _template = BNTemplate(engine.cpd_data, engine.cpd_hash)
+    return _template
+
+#========================================[PARÁMETROS DE ACTIVOS]========================================#
+def asset_parameters(snapshot, tactic: str, nodes=None, confidence: float = None) -> np.ndarray:
+    """
+    Vectores de parámetros (k, 5) de los activos `nodes` (índices de nodo; por defecto, todos)
+    de un GraphSnapshot para una táctica.
+    """
+    if confidence is None:
+        confidence = red_bayes.confidence
+    nodes = np.arange(snapshot.number_of_nodes) if nodes is None else np.asarray(nodes, dtype=np.int64)
+
+    factors = load_impact_matrix()[normalize_tactic(tactic)]
+    type_factor = np.array([factors.get(t, 1.0) for t in snapshot.vocab["asset_type"]], dtype=np.float64)
+
+    params = np.empty((len(nodes), len(PARAMETER_NAMES)), dtype=np.float64)
+    params[:, 0] = confidence * type_factor[np.asarray(snapshot.asset_type)[nodes]]
+    params[:, 1] = np.asarray(snapshot.criticality, dtype=np.float64)[nodes]
+    params[:, 2:5] = np.asarray(snapshot.cia, dtype=np.float64)[nodes]
+    return params
+
+
+def evaluate_assets(snapshot, tactic: str, asset_ids=None, confidence: float = None) -> dict:
+    """
+    Instancia y evalúa la red de cada activo afectado.
+
+    Returns:
+        Dict[str, dict] {asset_id: {"countermeasure": mejor contramedida,
+                                    "weighted_impact": {cm: valor},
+                                    "expected_impact": {cm: {"C_res": ..., "I_res": ..., "A_res": ...}}}}
+    """
+    if asset_ids is None:
+        nodes = np.arange(snapshot.number_of_nodes)
+    else:
+        index = snapshot.node_index
+        missing = [a for a in asset_ids if a not in index]
+        if missing:
+            raise KeyError(f"Activos inexistentes en el grafo: {missing}")
+        nodes = np.array([index[a] for a in asset_ids], dtype=np.int64)
+
+    template = get_bn_template()
+    result = template.evaluate(asset_parameters(snapshot, tactic, nodes, confidence))
+    cms = template.countermeasures
+
+    node_ids = np.asarray(snapshot.node_ids)[nodes].tolist()
+    return {
+        str(asset_id): {
+            "countermeasure": cms[best],
+            "weighted_impact": dict(zip(cms, weighted)),
+            "expected_impact": {cm: dict(zip(RES_NODES, impacts)) for cm, impacts in zip(cms, expected)},
+        }
+        for asset_id, best, weighted, expected in zip(
+            node_ids, result["best"].tolist(), result["weighted_impact"].tolist(), result["expected_impact"].tolist()
+        )
+    }
@@ -1,99 +1,403 @@
 #========================================[IMPORTS]============================================#
-import pyagrum as gum
 import json
+import logging
+import zlib
+from dataclasses import dataclass
 from pathlib import Path
+from functools import lru_cache
+
+import numpy as np
+
+from src.instrumentation.metrics import incr
+
+logger = logging.getLogger(__name__)
 
 
 #=============================[JSON READING]===========================================#
+@lru_cache(maxsize=None)
 def read_constants():
-    with open(Path(__file__).parent.parent.parent / "configs" / "bn_CPDs.json", "r") as f:
+    with open(Path(__file__).parent.parent.parent / "Configs" / "bn_CPDs.json", "r") as f:
         return json.load(f)
     
+@lru_cache(maxsize=None)
 def read_impact_levels():
-    with open(Path(__file__).parent.parent.parent / "configs" / "constants.json", "r") as f:
+    with open(Path(__file__).parent.parent.parent / "Configs" / "constants.json", "r") as f:
         return json.load(f)["impact_levels"]
 
 
 #=============================[CONSTANTS]===========================================#
-CPDS = read_constants()
-IMPACT_LEVELS = read_impact_levels()
+# CPDS e IMPACT_LEVELS se leen en el primer acceso (ver __getattr__)
 confidence = 0.2
 
+def __getattr__(name):
+    """
+    Acceso perezoso a las constantes del módulo: evita leer los JSON al importar.
+    """
+    if name == "CPDS":
+        return read_constants()
+    if name == "IMPACT_LEVELS":
+        return read_impact_levels()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 #========================================[ID DEFINITION]========================================#
 def make_lvar(name, desc, states):
     """
     Función utilizada para crear las variables labelizadas de los nodos del diagrama de influencia.
     """
+    import pyagrum as gum
+
     v = gum.LabelizedVariable(name, desc, len(states))
     for i, s in enumerate(states):
         v.changeLabel(i, s)
     return v
 
 
-def create_and_solve_dimension(dimension_name, node_name, display_name):
+class CompiledInfluenceDiagram:
+    """
+    Diagrama de influencia de una dimensión CIA construido una sola vez:
+        Threat -> Risk -> Residual_Impact <- CM,  Residual_Impact -> Utility
+
+    Para reevaluarlo solo se actualizan la prior de Threat, las filas de las CPTs o las utilidades
+    (set_*) y se vuelve a resolver. solve() usa pyAgrum (ShaferShenoyLIMIDInference);
+    solve_closed_form() resuelve la misma estructura con productos de matrices (ver solve_id_closed_form).
+    """
+
+    def __init__(self, dimension_name: str, node_name: str, cpds: dict = None, impact_levels: dict = None,
+                 threat_confidence: float = None):
+        import pyagrum as gum
+
+        self.dimension_name = dimension_name
+        self.node_name = node_name
+        self.cpds = cpds if cpds is not None else read_constants()
+        self.impact_levels = impact_levels if impact_levels is not None else read_impact_levels()
+
+        self.threat_states = self.cpds["Threat"]["states"]
+        self.risk_states = self.cpds["Risk"]["states"]
+        self.cm_states = self.cpds["CM"]["states"]
+        self.res_states = self.cpds[node_name]["states"]
+
+        #=================={Nodos y arcos}========================#
+        self.diagram = gum.InfluenceDiagram()
+        self.decision_node = self.diagram.addDecisionNode(make_lvar("CM", "Countermeasure", self.cm_states))
+        self.threat_node = self.diagram.addChanceNode(make_lvar("Threat", "Threat", self.threat_states))
+        self.risk_node = self.diagram.addChanceNode(make_lvar("Risk", "Risk", self.risk_states))
+        self.res_node = self.diagram.addChanceNode(make_lvar(node_name, f"Residual {dimension_name}", self.res_states))
+        self.utility_node = self.diagram.addUtilityNode(
+            gum.LabelizedVariable(f"U_{dimension_name}", f"Utility {dimension_name}", 1)
+        )
+        self.diagram.addArc(self.threat_node, self.risk_node)
+        self.diagram.addArc(self.risk_node, self.res_node)
+        self.diagram.addArc(self.decision_node, self.res_node)
+        self.diagram.addArc(self.res_node, self.utility_node)
+
+        #=================={Parámetros como arrays}========================#
+        n_risk, n_cm = len(self.risk_states), len(self.cm_states)
+        # risk_cpt[r, t] = P(Risk=r | Threat=t); res_cpt[s, r, cm] = P(res=s | Risk=r, CM=cm)
+        self.risk_cpt = np.array(self.cpds["Risk"]["values"], dtype=np.float64)
+        self.res_cpt = np.array(self.cpds[node_name]["values"], dtype=np.float64).reshape(-1, n_risk, n_cm)
+        self.utilities = np.array([-float(self.impact_levels[s]) for s in self.res_states])
+        self.threat_prior = np.zeros(len(self.threat_states))
+
+        self.set_threat_prior(confidence if threat_confidence is None else threat_confidence)
+        self.set_risk_cpt(self.risk_cpt)
+        self.set_res_cpt(self.res_cpt)
+        self.set_utilities(self.utilities)
+        self._inference = None
+
+    #=================={Actualización de parámetros}========================#
+    def set_threat_prior(self, p_threat: float) -> None:
+        self.threat_prior = np.array([1.0 - p_threat, p_threat])
+        self.diagram.cpt(self.threat_node)[{}] = self.threat_prior.tolist()
+        self._inference = None
+
+    def set_risk_cpt(self, risk_cpt) -> None:
+        """
+        risk_cpt[r, t] = P(Risk=r | Threat=t), mismo formato que bn_CPDs.json.
+        """
+        self.risk_cpt = np.array(risk_cpt, dtype=np.float64)
+        for t_idx, t_lab in enumerate(self.threat_states):
+            self.diagram.cpt(self.risk_node)[{"Threat": t_lab}] = self.risk_cpt[:, t_idx].tolist()
+        self._inference = None
+
+    def set_res_cpt(self, res_cpt) -> None:
+        """
+        res_cpt[s, r, cm] = P(res=s | Risk=r, CM=cm) (o la matriz de bn_CPDs.json, columnas (Risk, CM)).
+        """
+        self.res_cpt = np.array(res_cpt, dtype=np.float64).reshape(-1, len(self.risk_states), len(self.cm_states))
+        for r_idx, r in enumerate(self.risk_states):
+            for c_idx, cm in enumerate(self.cm_states):
+                self.diagram.cpt(self.res_node)[{"Risk": r, "CM": cm}] = self.res_cpt[:, r_idx, c_idx].tolist()
+        self._inference = None
+
+    def set_utilities(self, utilities) -> None:
+        """
+        Utilidad de cada estado residual (por defecto, -IMPACT_LEVELS[estado]).
+        """
+        self.utilities = np.array(utilities, dtype=np.float64)
+        for state, u in zip(self.res_states, self.utilities.tolist()):
+            self.diagram.utility(self.utility_node)[{self.node_name: state}] = u
+        self._inference = None
+
+    #=================={Resolución}========================#
+    @property
+    def inference(self):
+        """
+        Motor ShaferShenoyLIMIDInference resuelto con los parámetros actuales.
+        """
+        import pyagrum as gum
+
+        if self._inference is None:
+            self._inference = gum.ShaferShenoyLIMIDInference(self.diagram)
+            self._inference.makeInference()
+        return self._inference
+
+    def solve(self) -> dict:
+        """
+        Resuelve con pyAgrum. Retorna dict con "decision", "meu" y "variance".
+        """
+        ie = self.inference
+        decision = np.asarray(ie.optimalDecision(self.decision_node).toarray())
+        meu = ie.MEU()
+        return dict(decision=self.cm_states[int(np.argmax(decision))], meu=meu["mean"], variance=meu["variance"])
+
+    def solve_closed_form(self) -> dict:
+        """
+        Resuelve con el solver exacto especializado. Retorna dict con "decision", "meu", "variance"
+        y "expected_utility" ({cm: EU}).
+        """
+        result = solve_id_closed_form(self.threat_prior, self.risk_cpt, self.res_cpt, self.utilities)
+        best = int(result["best"][0])
+        return dict(
+            decision=self.cm_states[best],
+            meu=float(result["meu"][0]),
+            variance=float(result["variance"][0]),
+            expected_utility=dict(zip(self.cm_states, result["expected_utility"][0].tolist())),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_compiled_diagram(dimension_name: str, node_name: str) -> CompiledInfluenceDiagram:
+    """
+    Diagrama compilado (memoizado) de una dimensión CIA.
+    """
+    return CompiledInfluenceDiagram(dimension_name, node_name)
+
+#========================================[SOLVER EXACTO]========================================#
+def solve_id_closed_form(threat_prior, risk_cpt, res_cpt, utilities) -> dict:
+    """
+    Solver exacto del diagrama Threat -> Risk -> Res <- CM -> U, vectorizado sobre k casos.
+
+        P(r)      = sum_t P(r | t) · P(t)
+        P(s | cm) = sum_r P(s | r, cm) · P(r)
+        EU(cm)    = sum_s P(s | cm) · U(s)
+
+    La decisión óptima es argmax_cm EU(cm) (en empate, la primera contramedida) y la varianza es la
+    de la utilidad bajo esa decisión.
+
+    Args:
+        threat_prior: (n_threat,) o (k, n_threat)
+        risk_cpt:     (n_risk, n_threat) o (k, n_risk, n_threat)
+        res_cpt:      (n_estados, n_risk, n_cm) o (k, n_estados, n_risk, n_cm)
+        utilities:    (n_estados,) o (k, n_estados)
+
+    Returns:
+        dict con arrays "expected_utility" (k, n_cm), "best" (k,), "meu" (k,) y "variance" (k,)
+    """
+    threat_prior = np.atleast_2d(np.asarray(threat_prior, dtype=np.float64))
+    risk_cpt = np.asarray(risk_cpt, dtype=np.float64)
+    res_cpt = np.asarray(res_cpt, dtype=np.float64)
+    utilities = np.atleast_2d(np.asarray(utilities, dtype=np.float64))
+    if risk_cpt.ndim == 2:
+        risk_cpt = risk_cpt[None]
+    if res_cpt.ndim == 3:
+        res_cpt = res_cpt[None]
+
+    risk = np.einsum("krt,kt->kr", risk_cpt, threat_prior)
+    res = np.einsum("ksrc,kr->kcs", res_cpt, risk)                 # P(s | cm): (k, n_cm, n_estados)
+    expected_utility = np.einsum("kcs,ks->kc", res, utilities)
+
+    best = np.argmax(expected_utility, axis=1)
+    rows = np.arange(len(best))
+    meu = expected_utility[rows, best]
+    variance = np.einsum("ks,ks->k", res[rows, best], utilities ** 2) - meu ** 2
+    return dict(expected_utility=expected_utility, best=best, meu=meu, variance=variance)
+
+
+def cross_check_closed_form(n_cases: int = 200, seed: int = 0, node_name: str = "C_res", tol: float = 1e-9,
+                            n_confidences: int = 11) -> dict:
+    """
+    Compara el solver exacto con pyAgrum en el diagrama compilado de `node_name`:
+    - con los parámetros reales de la dimensión (CPTs de bn_CPDs.json y utilidades de impact_levels)
+      en `n_confidences` confianzas de Threat entre 0 y 1,
+    - y en `n_cases` parametrizaciones aleatorias (prior de Threat, CPTs de Risk y del nodo residual,
+      utilidades). La semilla combina `seed` y `node_name`: cada dimensión prueba casos distintos.
+
+    Returns:
+        dict con "real_cases", "cases", "decision_mismatches", "max_meu_error" y "max_variance_error".
+        Lanza AssertionError si alguna diferencia supera `tol` o cambia la decisión.
+    """
+    rng = np.random.default_rng([seed, zlib.crc32(node_name.encode())])
+    compiled = CompiledInfluenceDiagram(node_name[0], node_name)
+    n_threat, n_risk, n_cm = len(compiled.threat_states), len(compiled.risk_states), len(compiled.cm_states)
+    n_states = len(compiled.res_states)
+
+    def random_case():
+        compiled.set_threat_prior(float(rng.random()))
+        compiled.set_risk_cpt(rng.dirichlet(np.ones(n_risk), size=n_threat).T)
+        compiled.set_res_cpt(np.moveaxis(rng.dirichlet(np.ones(n_states), size=(n_risk, n_cm)), -1, 0))
+        compiled.set_utilities(-np.sort(rng.random(n_states) * 10))
+
+    real_cases = [lambda p=p: compiled.set_threat_prior(p) for p in np.linspace(0.0, 1.0, n_confidences).tolist()]
+
+    mismatches, meu_error, variance_error = 0, 0.0, 0.0
+    for set_case in real_cases + [random_case] * n_cases:
+        set_case()
+        reference, fast = compiled.solve(), compiled.solve_closed_form()
+        mismatches += reference["decision"] != fast["decision"]
+        meu_error = max(meu_error, abs(reference["meu"] - fast["meu"]))
+        variance_error = max(variance_error, abs(reference["variance"] - fast["variance"]))
+
+    if mismatches or meu_error > tol or variance_error > tol:
+        raise AssertionError(f"Solver exacto y pyAgrum difieren en {node_name}: {mismatches} decisiones, "
+                             f"MEU {meu_error}, varianza {variance_error}")
+    return dict(real_cases=len(real_cases), cases=n_cases, decision_mismatches=mismatches,
+                max_meu_error=meu_error, max_variance_error=variance_error)
+
+#========================================[TABLA DE DECISIÓN POR CONFIANZA]========================================#
+@dataclass
+class ConfidenceDecisionTable:
+    """
+    Decisión óptima precalculada sobre una rejilla de confianzas P(Threat=yes) ∈ [0, 1].
+
+    La confianza solo entra en la prior de Threat, de modo que EU(cm) es lineal en ella: la
+    interpolación lineal entre puntos de la rejilla es exacta y la decisión óptima es constante
+    entre breakpoints (confianzas en las que se cruzan las rectas de la mejor contramedida).
+
+    grid:             (g,) confianzas de la rejilla
+    expected_utility: (g, n_cm) EU de cada contramedida (= -impacto residual esperado)
+    breakpoints:      [(confianza, cm_anterior, cm_siguiente), ...] ordenados
+    """
+    node_name: str
+    countermeasures: list
+    grid: np.ndarray
+    expected_utility: np.ndarray
+    breakpoints: list
+
+    def expected_utility_at(self, confidences) -> np.ndarray:
+        """
+        EU interpolada (k, n_cm) para un array de confianzas, sin ejecutar inferencia.
+        """
+        c = np.clip(np.atleast_1d(np.asarray(confidences, dtype=np.float64)), self.grid[0], self.grid[-1])
+        hi = np.clip(np.searchsorted(self.grid, c, side="right"), 1, len(self.grid) - 1)
+        lo = hi - 1
+        t = ((c - self.grid[lo]) / (self.grid[hi] - self.grid[lo]))[:, None]
+        return (1.0 - t) * self.expected_utility[lo] + t * self.expected_utility[hi]
+
+    def decide_many(self, confidences) -> dict:
+        """
+        Decisiones para un array de confianzas: {"best": (k,), "meu": (k,), "expected_utility": (k, n_cm)}.
+        """
+        eu = self.expected_utility_at(confidences)
+        best = np.argmax(eu, axis=1)
+        return dict(best=best, meu=eu[np.arange(len(best)), best], expected_utility=eu)
+
+    def decide(self, confidence: float) -> dict:
+        """
+        Decisión óptima, MEU e impacto residual esperado por contramedida para una confianza.
+        """
+        result = self.decide_many([confidence])
+        return dict(
+            decision=self.countermeasures[int(result["best"][0])],
+            meu=float(result["meu"][0]),
+            expected_impact=dict(zip(self.countermeasures, (-result["expected_utility"][0]).tolist())),
+        )
+
+
+def build_decision_table(node_name: str, grid_size: int = 1001, cpds: dict = None,
+                         impact_levels: dict = None) -> ConfidenceDecisionTable:
     """
-    Crea un diagrama de influencia para una dimensión CIA (Confidentiality, Integrity, Availability)
-    y lo resuelve para encontrar la contramedida (CM) óptima que minimice el impacto residual.
+    Resuelve (con solve_id_closed_form, en un único lote) el diagrama de `node_name` para cada
+    confianza de una rejilla uniforme en [0, 1] y localiza los breakpoints exactos.
+    """
+    cpds = cpds if cpds is not None else read_constants()
+    impact_levels = impact_levels if impact_levels is not None else read_impact_levels()
+    n_risk, n_cm = len(cpds["Risk"]["states"]), len(cpds["CM"]["states"])
+
+    grid = np.linspace(0.0, 1.0, grid_size)
+    result = solve_id_closed_form(
+        np.stack([1.0 - grid, grid], axis=1),
+        np.array(cpds["Risk"]["values"], dtype=np.float64),
+        np.array(cpds[node_name]["values"], dtype=np.float64).reshape(-1, n_risk, n_cm),
+        np.array([-float(impact_levels[s]) for s in cpds[node_name]["states"]]),
+    )
+    eu, best = result["expected_utility"], result["best"]
+
+    # Cruce exacto de las dos rectas en cada tramo donde cambia la decisión
+    breakpoints = []
+    for i in np.flatnonzero(best[1:] != best[:-1]).tolist():
+        a, b = best[i], best[i + 1]
+        gap0 = eu[i, a] - eu[i, b]
+        gap1 = eu[i + 1, a] - eu[i + 1, b]
+        t = gap0 / (gap0 - gap1) if gap0 != gap1 else 0.0
+        crossing = float(grid[i] + t * (grid[i + 1] - grid[i]))
+        breakpoints.append((crossing, cpds["CM"]["states"][a], cpds["CM"]["states"][b]))
+
+    return ConfidenceDecisionTable(
+        node_name=node_name,
+        countermeasures=list(cpds["CM"]["states"]),
+        grid=grid,
+        expected_utility=eu,
+        breakpoints=breakpoints,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_decision_table(node_name: str, grid_size: int = 1001) -> ConfidenceDecisionTable:
+    """
+    Tabla de decisión (memoizada) de un nodo residual con las CPDs de bn_CPDs.json.
+    """
+    return build_decision_table(node_name, grid_size)
+
+#========================================[RESOLUCIÓN POR DIMENSIÓN]========================================#
+def create_and_solve_dimension(dimension_name, node_name, display_name, threat_confidence=None):
+    """
+    Resuelve el diagrama de influencia de una dimensión CIA (Confidentiality, Integrity, Availability)
+    para encontrar la contramedida (CM) óptima que minimice el impacto residual.
     
-    El diagrama sigue la estructura:
-        Threat -> Risk -> Residual_Impact <- CM -> Utility
+    El diagrama (ver CompiledInfluenceDiagram) se construye una sola vez por dimensión; en cada
+    llamada solo se actualiza la prior de Threat y se vuelve a resolver.
     
     Args:
         dimension_name (str): Letra de la dimensión ("C", "I" o "A") para la utilidad y labels
         node_name (str): Nombre del nodo residual ("C_res", "I_res" o "A_res")
-        display_name (str): Nombre legible para imprimir ("CONFIDENTIALITY", "INTEGRITY", "AVAILABILITY")
+        display_name (str): Nombre legible para los logs ("CONFIDENTIALITY", "INTEGRITY", "AVAILABILITY")
+        threat_confidence (float): P(Threat=yes) de esta llamada (por defecto, `confidence`)
     
     Returns:
         tuple: (inference_engine, decision_node) donde:
             - inference_engine: objeto de inferencia con la solución del diagrama
             - decision_node: nodo de decisión CM del diagrama
     """
-    #=================={Inicialización diagrama de influencia y nodos}========================#
-    ID = gum.InfluenceDiagram()
+    threat_confidence = confidence if threat_confidence is None else threat_confidence
+    compiled = get_compiled_diagram(dimension_name, node_name)
+    if compiled.threat_prior[1] != threat_confidence:
+        compiled.set_threat_prior(threat_confidence)
+    ie = compiled.inference
+    incr("id_solves")
     
-    # Nodos
-    CM = ID.addDecisionNode(make_lvar("CM", "Countermeasure", CPDS["CM"]["states"]))
-    threat = ID.addChanceNode(make_lvar("Threat", "Threat", CPDS["Threat"]["states"]))
-    risk = ID.addChanceNode(make_lvar("Risk", "Risk", CPDS["Risk"]["states"]))
-    res = ID.addChanceNode(make_lvar(node_name, f"Residual {dimension_name}", CPDS[node_name]["states"]))
-    utility = ID.addUtilityNode(gum.LabelizedVariable(f"U_{dimension_name}", f"Utility {dimension_name}", 1))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("%s: MEU=%s, decisión óptima=%s", display_name, ie.MEU(), ie.optimalDecision(compiled.decision_node),
+                    extra=dict(dimension=dimension_name, threat_confidence=threat_confidence))
     
-    #=================={Definición de arcos (dependencias)}========================#
-    ID.addArc(threat, risk)
-    ID.addArc(risk, res)
-    ID.addArc(CM, res)
-    ID.addArc(res, utility)
-    
-    #=================={Asignación de distribuciones de probabilidad}========================#
-    ID.cpt(threat)[{}] = [1 - confidence, confidence]
-    
-    for t_idx, t_lab in enumerate(CPDS["Threat"]["states"]):
-        dist = [CPDS["Risk"]["values"][r_idx][t_idx] for r_idx in range(len(CPDS["Risk"]["states"]))]
-        ID.cpt(risk)[{"Threat": t_lab}] = dist
-    
-    col = 0
-    for r in CPDS["Risk"]["states"]:
-        for cm in CPDS["CM"]["states"]:
-            dist = [CPDS[node_name]["values"][i][col] for i in range(len(CPDS[node_name]["states"]))]
-            ID.cpt(res)[{"Risk": r, "CM": cm}] = dist
-            col += 1
-    
-    #=================={Asignación de valores de utilidad}========================#
-    for state in CPDS[node_name]["states"]:
-        ID.utility(utility)[{node_name: state}] = -IMPACT_LEVELS[state]
-    
-    #=================={Inferencia y obtención de decisión óptima}========================#
-    ie = gum.ShaferShenoyLIMIDInference(ID)
-    ie.makeInference()
-    
-    print(f"\n=== {display_name} ===")
-    print(f"MEU: {ie.MEU()}")
-    print(f"Optimal decision: {ie.optimalDecision(CM)}")
-    
-    return ie, CM
+    return ie, compiled.decision_node
 
 #========================================[INFERENCIA PARA CADA DIMENSIÓN CIA]========================================#
-# Crear soluciones para cada dimensión
-ie_C, _ = create_and_solve_dimension("C", "C_res", "CONFIDENTIALITY")
-ie_I, _ = create_and_solve_dimension("I", "I_res", "INTEGRITY")
-ie_A, _ = create_and_solve_dimension("A", "A_res", "AVAILABILITY")
+if __name__ == "__main__":
+    from src.instrumentation.metrics import configure_logging
+
+    configure_logging("INFO")
+    # Crear soluciones para cada dimensión
+    ie_C, _ = create_and_solve_dimension("C", "C_res", "CONFIDENTIALITY")
+    ie_I, _ = create_and_solve_dimension("I", "I_res", "INTEGRITY")
+    ie_A, _ = create_and_solve_dimension("A", "A_res", "AVAILABILITY")
+
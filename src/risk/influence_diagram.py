@@ -1,8 +1,18 @@
-import red_bayes
+import src.risk.red_bayes as red_bayes
 import json
+import logging
 from pathlib import Path
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#========================================[CONSTANTES DEL MODELO]========================================#
+RES_NODES = ("C_res", "I_res", "A_res")
 
 #========================================[LECTURA DE CONFIGURACIÓN]========================================#
+@lru_cache(maxsize=None)
 def read_constants():
     """
     Lee las constantes de niveles de impacto desde el archivo de configuración.
@@ -10,10 +20,11 @@ def read_constants():
     Returns:
         dict: diccionario con todas las constantes del proyecto
     """
-    with open(Path(__file__).parent.parent.parent / "configs" / "constants.json", "r") as f:
+    with open(Path(__file__).parent.parent.parent / "Configs" / "constants.json", "r") as f:
         constants = json.load(f)
     return constants
 
+@lru_cache(maxsize=None)
 def read_cms():
     """
     Lee los nombres de las contramedidas disponibles desde el archivo CPDs.
@@ -21,64 +32,159 @@ def read_cms():
     Returns:
         list: lista de estados/nombres de contramedidas
     """
-    with open(Path(__file__).parent.parent.parent / "configs" / "bn_CPDs.json", "r") as f:
+    with open(Path(__file__).parent.parent.parent / "Configs" / "bn_CPDs.json", "r") as f:
         cms = json.load(f)["CM"]["states"]
     return cms
 
 
 #========================================[CONSTANTES]========================================#
-IMPACT_LEVELS = read_constants()["impact_levels"]
-print(f"Constantes de impacto: {IMPACT_LEVELS}")
+# IMPACT_LEVELS y COUNTERMEASURES se leen en el primer acceso (ver __getattr__)
+def __getattr__(name):
+    """
+    Acceso perezoso a las constantes del módulo: evita leer los JSON al importar.
+    """
+    if name == "IMPACT_LEVELS":
+        return read_constants()["impact_levels"]
+    if name == "COUNTERMEASURES":
+        return read_cms()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+#========================================[API TENSORIAL]========================================#
+def _factor_array(factor, variables: list, cpd_data: dict) -> np.ndarray:
+    """
+    Valores de un factor de pgmpy con los ejes en el orden de `variables` y los estados en el
+    orden de bn_CPDs.json.
+    """
+    values = np.transpose(factor.values, [factor.variables.index(v) for v in variables])
+    for axis, var in enumerate(variables):
+        order = [factor.state_names[var].index(state) for state in cpd_data[var]["states"]]
+        values = np.take(values, order, axis=axis)
+    return values
+
+
+def _risk_given_cm(engine, evidence: dict, cpd_data: dict, confidence: float = None) -> np.ndarray:
+    """
+    P(Risk | CM, evidencia) como array (n_risk, n_cm) a partir de una única consulta conjunta.
+    """
+    n_risk = len(cpd_data["Risk"]["states"])
+    n_cm = len(cpd_data["CM"]["states"])
+    free = [v for v in ("Risk", "CM") if v not in evidence]
+
+    if free:
+        factor = engine.query(variables=free, evidence=evidence, joint=True, threat_confidence=confidence)
+        joint = _factor_array(factor, free, cpd_data)
+    else:
+        joint = np.ones(())
+    # Las variables observadas se reintroducen como ejes con masa en el estado observado
+    if "Risk" in evidence:
+        joint = np.expand_dims(joint, 0) * np.eye(n_risk)[cpd_data["Risk"]["states"].index(evidence["Risk"])].reshape(
+            (n_risk,) + (1,) * joint.ndim)
+    if "CM" in evidence:
+        one_hot = np.eye(n_cm)[cpd_data["CM"]["states"].index(evidence["CM"])]
+        joint = np.expand_dims(joint, -1) * one_hot
+
+    # Normalizar por columna de CM: P(Risk, CM | e) -> P(Risk | CM, e)
+    mass = joint.sum(axis=0, keepdims=True)
+    return np.divide(joint, mass, out=np.zeros_like(joint, dtype=np.float64), where=mass > 0)
+
+
+def residual_impact_tensor(evidence: dict = None, engine=None, confidence: float = None) -> dict:
+    """
+    Distribuciones residuales CIA de todas las contramedidas en una sola contracción.
+
+        P(d_res | CM, e) = sum_risk P(Risk | CM, e) · P(d_res | Risk, CM)
+
+    P(Risk | CM, e) sale de una única consulta conjunta (memoizada por el motor) y se contrae con las
+    CPTs de C_res, I_res y A_res apiladas en un tensor (3, n_estados, n_risk, n_cm).
+
+    Args:
+        evidence: evidencia adicional, p. ej. {"Threat": "yes"} (puede incluir CM o nodos *_res)
+        engine: motor de inferencia (por defecto, red_bayes.get_inference_engine())
+        confidence: P(Threat=yes) para esta consulta (por defecto, la del motor)
+
+    Returns:
+        dict con:
+        - "countermeasures": lista de contramedidas (orden de bn_CPDs.json)
+        - "dimensions": RES_NODES
+        - "states": estados de los nodos residuales (low, medium, high)
+        - "probabilities": array (n_cm, 3, n_estados) con P(d_res = estado | CM, e)
+        - "expected_impact": array (n_cm, 3) con sum(prob x IMPACT_LEVELS[estado])
+    """
+    engine = engine or red_bayes.get_inference_engine()
+    evidence = dict(evidence or {})
+    cpd_data = engine.cpd_data
+
+    states = cpd_data[RES_NODES[0]]["states"]
+    if any(cpd_data[node]["states"] != states for node in RES_NODES):
+        raise ValueError("Los nodos residuales deben compartir los mismos estados")
+    n_risk = len(cpd_data["Risk"]["states"])
+    n_cm = len(cpd_data["CM"]["states"])
+
+    # CPTs apiladas: columnas ordenadas (Risk, CM) como en bn_CPDs.json
+    cpts = np.array([cpd_data[node]["values"] for node in RES_NODES], dtype=np.float64)
+    cpts = cpts.reshape(len(RES_NODES), len(states), n_risk, n_cm)
+
+    # d_res es independiente del resto de nodos residuales dado (Risk, CM): basta con P(Risk | CM, e)
+    risk_given_cm = _risk_given_cm(engine, evidence, cpd_data, confidence)
+
+    probabilities = np.einsum("rc,dsrc->cds", risk_given_cm, cpts)
+    for d, node in enumerate(RES_NODES):
+        if node in evidence:
+            probabilities[:, d, :] = np.eye(len(states))[states.index(evidence[node])]
+
+    levels = np.array([float(read_constants()["impact_levels"][state]) for state in states])
+    return dict(
+        countermeasures=list(cpd_data["CM"]["states"]),
+        dimensions=RES_NODES,
+        states=list(states),
+        probabilities=probabilities,
+        expected_impact=probabilities @ levels,
+    )
+
+
+def rank_countermeasures(evidence: dict = None, weights=(1.0, 1.0, 1.0), engine=None, confidence: float = None) -> list:
+    """
+    Ordena las contramedidas de menor a mayor impacto residual esperado ponderado por CIA.
+    La evidencia no puede fijar CM: es la variable que se ordena.
+
+    Returns:
+        list: [(contramedida, impacto_ponderado), ...] de mejor a peor
+    """
+    if evidence and "CM" in evidence:
+        raise ValueError("rank_countermeasures ordena todas las contramedidas: la evidencia no puede incluir CM")
+    tensor = residual_impact_tensor(evidence, engine=engine, confidence=confidence)
+    scores = tensor["expected_impact"] @ np.asarray(weights, dtype=np.float64)
+    order = np.argsort(scores, kind="stable")
+    return [(tensor["countermeasures"][i], float(scores[i])) for i in order]
 
-COUNTERMEASURES = read_cms()
-print(f"Contramedidas disponibles: {COUNTERMEASURES}")
 
 #========================================[CÁLCULO DE IMPACTO NUMÉRICO]========================================#
-def calculate_numeric_impact():
+def calculate_numeric_impact(evidence: dict = None, confidence: float = None):
     """
     Calcula un impacto numérico ponderado para cada contramedida a partir de las probabilidades
     de los resultados residuales en las dimensiones CIA (Confidentiality, Integrity, Availability).
     
-    El impacto se calcula como: suma de (probabilidad x nivel_impacto) para cada estado.
+    El impacto se calcula como: suma de (probabilidad x nivel_impacto) para cada estado,
+    para todas las contramedidas a la vez (ver residual_impact_tensor).
     
     Returns:
         dict: diccionario con estructura {contramedida: {"C_res": valor, "I_res": valor, "A_res": valor}}
     """
-    #=================={Inicialización del modelo y diccionario de impactos}========================#
-    infer = red_bayes.bayesian_network_construction()
+    tensor = residual_impact_tensor(evidence, confidence=confidence)
     numeric_impacts = {}
 
-    #=================={Evaluación de cada contramedida}========================#
-    for cm in COUNTERMEASURES:
-        print(f"\nEvaluando impacto para la contramedida: {cm}")
-        
-        #--- Consultamos los valores de C_res, I_res y A_res condicionados a la contramedida ---
-        c_res = infer.query(variables=["C_res"], evidence={"CM": cm})
-        c_res_levels = red_bayes.get_cia_res_levels(c_res)
-
-        i_res = infer.query(variables=["I_res"], evidence={"CM": cm})
-        i_res_levels = red_bayes.get_cia_res_levels(i_res)
-
-        a_res = infer.query(variables=["A_res"], evidence={"CM": cm})
-        a_res_levels = red_bayes.get_cia_res_levels(a_res)
-        
-        #--- Calculamos impactos ponderando cada nivel por su probabilidad ---
-        c_res_impact = sum(prob * int(IMPACT_LEVELS[level]) for level, prob in c_res_levels.items())
-        numeric_impacts[cm] = {"C_res": c_res_impact}
-        print(f"Impacto numérico de C_res: {c_res_impact}")
-        
-        i_res_impact = sum(prob * int(IMPACT_LEVELS[level]) for level, prob in i_res_levels.items())
-        numeric_impacts[cm]["I_res"] = i_res_impact
-        print(f"Impacto numérico de I_res: {i_res_impact}")
-        
-        a_res_impact = sum(prob * int(IMPACT_LEVELS[level]) for level, prob in a_res_levels.items())
-        numeric_impacts[cm]["A_res"] = a_res_impact
-        print(f"Impacto numérico de A_res: {a_res_impact}")
-        
+    for cm, impacts in zip(tensor["countermeasures"], tensor["expected_impact"].tolist()):
+        numeric_impacts[cm] = dict(zip(tensor["dimensions"], impacts))
+        logger.debug("Impacto numérico de %s: %s", cm, numeric_impacts[cm], extra=dict(countermeasure=cm))
+
     return numeric_impacts
 
 
 #========================================[EJECUCIÓN]========================================#
-impacts = calculate_numeric_impact()
-print("\nImpactos numéricos calculados para cada contramedida:")
-print(impacts)
\ No newline at end of file
+if __name__ == "__main__":
+    print(f"Constantes de impacto: {read_constants()['impact_levels']}")
+    print(f"Contramedidas disponibles: {read_cms()}")
+
+    impacts = calculate_numeric_impact()
+    print("\nImpactos numéricos calculados para cada contramedida:")
+    print(impacts)
@@ -0,0 +1,126 @@
+"""
+Decisión conjunta CIA para todos los activos del radio de impacto.
+
+En lugar de resolver tres diagramas de influencia independientes (C, I, A) que pueden recomendar
+contramedidas distintas, cada activo se evalúa con una única utilidad multiobjetivo:
+
+    U(cm | activo) = -criticality · sum_d w_d · E[impacto_d | cm]
+
+donde w_d son los pesos cia_c/cia_i/cia_a del activo y E[impacto_d | cm] sale de la red bayesiana
+parametrizada por el activo (ver src/risk/bn_template.py). Todos los activos afectados se
+resuelven en una sola pasada vectorizada; los perfiles repetidos se calculan una vez.
+"""
+
+#========================================[IMPORTS]========================================#
+import numpy as np
+
+import src.risk.red_bayes as red_bayes
+from src.risk.bn_template import PARAMETER_NAMES, get_bn_template
+from src.risk.influence_diagram import RES_NODES
+from src.graph.impact import load_impact_matrix, normalize_tactic
+from src.graph.snapshot import GraphSnapshot
+
+#========================================[PERFILES DE ACTIVOS]========================================#
+def asset_profiles_from_graph(G, asset_ids) -> dict:
+    """
+    Extrae de un nx.DiGraph del MDO (o de un GraphSnapshot) los atributos que usa la decisión conjunta.
+
+    Returns:
+        dict con "asset_type" (lista), "criticality" (k,) y "cia" (k, 3)
+    """
+    if isinstance(G, GraphSnapshot):
+        idx = np.array([G.node_index[a] for a in asset_ids], dtype=np.int64)
+        return dict(
+            asset_type=G.decode("asset_type", G.asset_type[idx]),
+            criticality=np.asarray(G.criticality[idx], dtype=np.float64),
+            cia=np.asarray(G.cia[idx], dtype=np.float64).reshape(-1, 3),
+        )
+    nodes = [G.nodes[a] for a in asset_ids]
+    return dict(
+        asset_type=[n.get("asset_type") for n in nodes],
+        criticality=np.array([n.get("criticality", 1.0) for n in nodes], dtype=np.float64),
+        cia=np.array([[n.get("cia_c", 0.0), n.get("cia_i", 0.0), n.get("cia_a", 0.0)] for n in nodes], dtype=np.float64),
+    )
+
+
+def joint_parameters(asset_types, criticality, cia, confidence: float = None, tactic: str = None) -> np.ndarray:
+    """
+    Vectores de parámetros de la plantilla bayesiana (k, 5) para un lote de activos.
+    Con `tactic`, la prior de amenaza se escala por Impact_matrix[táctica][asset_type].
+    """
+    if confidence is None:
+        confidence = red_bayes.confidence
+    factor = np.ones(len(asset_types))
+    if tactic is not None:
+        factors = load_impact_matrix()[normalize_tactic(tactic)]
+        factor = np.array([factors.get(t, 1.0) for t in asset_types], dtype=np.float64)
+
+    params = np.empty((len(asset_types), len(PARAMETER_NAMES)), dtype=np.float64)
+    params[:, 0] = confidence * factor
+    params[:, 1] = criticality
+    params[:, 2:5] = cia
+    return params
+
+#========================================[DECISIÓN CONJUNTA]========================================#
+def solve_joint_decision(asset_types, criticality, cia, confidence: float = None, tactic: str = None) -> dict:
+    """
+    Resuelve la decisión conjunta de k activos en una sola pasada.
+
+    Returns:
+        dict con:
+        - "countermeasures": lista de contramedidas
+        - "utility":         (k, n_cm) utilidad conjunta de cada contramedida
+        - "ranking":         (k, n_cm) índices de contramedida de mejor a peor
+        - "expected_impact": (k, n_cm, 3) impacto residual esperado por dimensión
+    """
+    criticality = np.asarray(criticality, dtype=np.float64)
+    template = get_bn_template()
+    result = template.evaluate(joint_parameters(asset_types, criticality, cia, confidence, tactic))
+
+    utility = -criticality[:, None] * result["weighted_impact"]
+    return dict(
+        countermeasures=template.countermeasures,
+        utility=utility,
+        ranking=np.argsort(-utility, axis=1, kind="stable"),
+        expected_impact=result["expected_impact"],
+    )
+
+
+def recommend_for_blast_radius(G, affected_nodes: dict, confidence: float = None, tactic: str = None) -> dict:
+    """
+    Contramedida recomendada para cada activo del radio de impacto.
+
+    Args:
+        G: nx.DiGraph del MDO o GraphSnapshot
+        affected_nodes: resultado de grafo.get_infected_nodes ({nivel: [asset_id, ...]})
+        confidence: confianza de la amenaza (por defecto, red_bayes.confidence)
+        tactic: táctica ATT&CK opcional para escalar la amenaza por tipo de activo
+
+    Returns:
+        Dict[str, dict] {asset_id: {"level": nivel,
+                                    "countermeasure": mejor contramedida,
+                                    "ranking": [(cm, utilidad), ...] de mejor a peor,
+                                    "expected_impact": {"C_res": ..., "I_res": ..., "A_res": ...} de la mejor}}
+    """
+    levels = {asset_id: level for level, nodes in affected_nodes.items() for asset_id in nodes}
+    asset_ids = list(levels)
+    if not asset_ids:
+        return {}
+
+    profiles = asset_profiles_from_graph(G, asset_ids)
+    result = solve_joint_decision(
+        profiles["asset_type"], profiles["criticality"], profiles["cia"], confidence=confidence, tactic=tactic
+    )
+    cms = result["countermeasures"]
+
+    recommendations = {}
+    for i, asset_id in enumerate(asset_ids):
+        ranking = result["ranking"][i].tolist()
+        best = ranking[0]
+        recommendations[asset_id] = {
+            "level": levels[asset_id],
+            "countermeasure": cms[best],
+            "ranking": [(cms[c], float(result["utility"][i, c])) for c in ranking],
+            "expected_impact": dict(zip(RES_NODES, result["expected_impact"][i, best].tolist())),
+        }
+    return recommendations
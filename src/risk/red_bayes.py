@@ -1,23 +1,43 @@
 #========================================[IMPORTS]========================================#
 from pathlib import Path
-from pgmpy.models import DiscreteBayesianNetwork
-from pgmpy.factors.discrete import TabularCPD
-from pgmpy.inference import VariableElimination
+from functools import lru_cache
+from collections import OrderedDict
 
+import hashlib
 import json
+import os
+import time
+
+import numpy as np
+
+from src.instrumentation.metrics import incr
 
 #========================================[CONFIGURACIÓN]========================================#
 confidence = 0.2
 
-bn_cpds_path = Path(__file__).parent.parent.parent / "configs" / "bn_CPDs.json"
-with open(bn_cpds_path, "r") as data:
-    cpd_data = json.load(data)
+bn_cpds_path = Path(__file__).parent.parent.parent / "Configs" / "bn_CPDs.json"
+
+@lru_cache(maxsize=None)
+def get_cpd_data() -> dict:
+    """
+    Lee (una sola vez) las CPDs de la red bayesiana desde el archivo JSON.
+    """
+    with open(bn_cpds_path, "r") as data:
+        return json.load(data)
+
+def read_cpd_file(path: Path) -> tuple:
+    """
+    Lee un archivo de CPDs y retorna (cpd_data, sha256 del contenido).
+    """
+    raw = Path(path).read_bytes()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()
 
 
 #========================================[MODELO DE RED BAYESIANA]========================================#
-def bayesian_network_construction():
+def bayesian_network_construction(cpd_data: dict = None, threat_confidence: float = None):
     """
-    Construye un modelo de red bayesiana discreta a partir de las CPDs definidas en el archivo JSON.
+    Construye un modelo de red bayesiana discreta a partir de las CPDs definidas en el archivo JSON
+    (o de `cpd_data` si se indica). La prior de Threat usa `threat_confidence` (por defecto, `confidence`).
     
     La red bayesiana representa las relaciones probabilísticas entre:
     - Threat: probabilidad de que haya una amenaza
@@ -28,6 +48,15 @@ def bayesian_network_construction():
     Returns:
         VariableElimination: motor de inferencia para realizar consultas sobre la red
     """
+    # pgmpy es costoso de importar: solo se carga cuando se construye la red
+    from pgmpy.models import DiscreteBayesianNetwork
+    from pgmpy.factors.discrete import TabularCPD
+    from pgmpy.inference import VariableElimination
+
+    if cpd_data is None:
+        cpd_data = get_cpd_data()
+    if threat_confidence is None:
+        threat_confidence = confidence
     
     #=================={Definición de estructura de grafo}========================#
     """
@@ -51,7 +80,7 @@ def bayesian_network_construction():
     cpd_threat = TabularCPD(
         variable="Threat",
         variable_card=len(cpd_data["Threat"]["states"]),
-        values=[[1 - confidence], [confidence]],
+        values=[[1 - threat_confidence], [threat_confidence]],
         state_names={"Threat": cpd_data["Threat"]["states"]}
     )
 
@@ -187,12 +216,194 @@ def get_cia_res_levels(cia_res_query):
     return cia_res
 
 
+#========================================[MOTOR DE INFERENCIA]========================================#
+class BayesianEngine:
+    """
+    Motor de inferencia de larga vida sobre la red bayesiana, con caché de consultas.
+
+    - La red (CPDs, check_model y VariableElimination) solo se reconstruye cuando cambia el
+      contenido de bn_CPDs.json o la confianza de la amenaza.
+    - Las consultas se memoizan por (variables, evidencia congelada) con expulsión LRU, de modo
+      que repetir P(C_res | CM=firewall) es una búsqueda en diccionario.
+    - Los factores devueltos se comparten entre llamadas: deben tratarse como de solo lectura.
+
+    Expone query(...) con la misma firma que VariableElimination, por lo que es intercambiable
+    con el motor que devolvía antes get_inference_engine().
+    """
+
+    def __init__(self, cpds_path: Path = bn_cpds_path, threat_confidence: float = None,
+                 cache_size: int = 1024, check_interval: float = 1.0):
+        """
+        - threat_confidence: prior P(Threat=yes); None = la variable de módulo `confidence`.
+        - cache_size: número máximo de consultas memoizadas.
+        - check_interval: segundos mínimos entre comprobaciones de cambios en el archivo de CPDs.
+        """
+        self.cpds_path = Path(cpds_path)
+        self.threat_confidence = threat_confidence
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+
+        self._cache = OrderedDict()
+        self._infer = None
+        self._cpd_data = None
+        self._file_stat = None
+        self._file_hash = None
+        self._built_confidence = None
+        self._last_check = float("-inf")
+
+    #=================={Estado del modelo}========================#
+    @property
+    def confidence(self) -> float:
+        return confidence if self.threat_confidence is None else self.threat_confidence
+
+    @property
+    def cpd_data(self) -> dict:
+        self._ensure_current()
+        return self._cpd_data
+
+    @property
+    def cpd_hash(self) -> str:
+        """
+        SHA-256 del archivo de CPDs con el que se construyó la red actual.
+        """
+        self._ensure_current()
+        return self._file_hash
+
+    @property
+    def model(self):
+        """
+        DiscreteBayesianNetwork actual (reconstruido si las CPDs han cambiado).
+        """
+        self._ensure_current()
+        return self._infer.model
+
+    def invalidate(self) -> None:
+        """
+        Fuerza la relectura de las CPDs y la reconstrucción de la red en la próxima consulta.
+        """
+        self._infer = None
+        self._file_stat = None
+        self._cache.clear()
+
+    def _ensure_current(self) -> None:
+        now = time.monotonic()
+        if self._infer is not None and self._built_confidence == self.confidence \
+                and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        stat = os.stat(self.cpds_path)
+        stat = (stat.st_mtime_ns, stat.st_size)
+        file_changed = stat != self._file_stat
+        if file_changed:
+            cpd_data, file_hash = read_cpd_file(self.cpds_path)
+            self._file_stat = stat
+            # Un cambio de mtime sin cambio de contenido no invalida nada
+            file_changed = file_hash != self._file_hash
+            if file_changed:
+                self._cpd_data, self._file_hash = cpd_data, file_hash
+
+        if self._infer is None or file_changed or self._built_confidence != self.confidence:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._infer = bayesian_network_construction(self._cpd_data, self.confidence)
+        self._built_confidence = self.confidence
+        self._cache.clear()
+        self.builds += 1
+        incr("bn_builds")
+
+    #=================={Consultas}========================#
+    def query(self, variables, evidence: dict = None, joint: bool = True, threat_confidence: float = None, **kwargs):
+        """
+        Consulta memoizada equivalente a VariableElimination.query.
+
+        threat_confidence permite fijar P(Threat=yes) solo para esta consulta sin reconstruir la red:
+        como Threat es raíz, cambiar su prior equivale a reponderar la consulta conjunta con Threat
+        (memoizada) por P'(Threat) / P(Threat) y normalizar.
+        """
+        self._ensure_current()
+        evidence = evidence or {}
+        if threat_confidence is not None and (threat_confidence == self._built_confidence or "Threat" in evidence):
+            threat_confidence = None
+
+        key = (tuple(variables), frozenset(evidence.items()), joint, threat_confidence)
+        incr("inference_calls")
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            incr("inference_cache_hits")
+            return cached
+
+        self.misses += 1
+        incr("inference_cache_misses")
+        if threat_confidence is None:
+            kwargs.setdefault("show_progress", False)
+            result = self._infer.query(variables=list(variables), evidence=evidence or None, joint=joint, **kwargs)
+        elif not joint:
+            result = {v: self.query([v], evidence, threat_confidence=threat_confidence, **kwargs) for v in variables}
+        else:
+            result = self._reweight_threat(variables, evidence, threat_confidence, **kwargs)
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _reweight_threat(self, variables, evidence: dict, threat_confidence: float, **kwargs):
+        from pgmpy.factors.discrete import DiscreteFactor
+
+        states = self._cpd_data["Threat"]["states"]
+        base = self._built_confidence
+        if not 0.0 < base < 1.0:
+            # Con prior degenerada no se puede reponderar: red temporal con la confianza pedida
+            kwargs.setdefault("show_progress", False)
+            infer = bayesian_network_construction(self._cpd_data, threat_confidence)
+            return infer.query(variables=list(variables), evidence=evidence or None, **kwargs)
+
+        with_threat = list(variables) if "Threat" in variables else list(variables) + ["Threat"]
+        result = self.query(with_threat, evidence, **kwargs).copy()
+        ratio = DiscreteFactor(
+            ["Threat"], [len(states)], [(1 - threat_confidence) / (1 - base), threat_confidence / base],
+            state_names={"Threat": states},
+        )
+        result.product(ratio, inplace=True)
+        if "Threat" not in variables:
+            result.marginalize(["Threat"], inplace=True)
+        result.normalize(inplace=True)
+
+        # product() puede reordenar los ejes: se devuelven en el orden de la consulta
+        order = [v for v in with_threat if v in variables]
+        if list(result.variables) != order:
+            result = DiscreteFactor(
+                order, [result.get_cardinality([v])[v] for v in order],
+                np.transpose(result.values, [result.variables.index(v) for v in order]),
+                state_names={v: result.state_names[v] for v in order},
+            )
+        return result
+
+    def cache_info(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, builds=self.builds,
+                    size=len(self._cache), maxsize=self.cache_size)
+
+
 #========================================[INICIALIZACIÓN]========================================#
-infer = bayesian_network_construction()
+@lru_cache(maxsize=None)
+def get_inference_engine() -> BayesianEngine:
+    """
+    Devuelve el motor de inferencia compartido (BayesianEngine), creado en el primer uso.
+    """
+    return BayesianEngine()
 
 #--- (Ejemplos de uso comentados) ---
 """
 # Obtener distribuciones de impacto residual
+infer = get_inference_engine()
 c_res = infer.query(variables=["C_res"])
 print("\nP(C_res):")
 print(c_res)
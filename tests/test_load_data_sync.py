@@ -0,0 +1,61 @@
+#===============================================[IMPORTS]===============================================
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.database import load_data
+from src.database.generate_catalog import CatalogSpec, generate_catalog
+
+#===============================================[HELPERS]===============================================
+DEPENDENCY_TRIPLE = ["from_asset", "to_asset", "dependency_type"]
+
+@pytest.fixture
+def catalog(tmp_path: Path) -> Path:
+    """Catálogo CSV sintético pequeño (con ciclos permitidos por la política) cargado en modo full."""
+    directory = tmp_path / "catalog"
+    generate_catalog(directory, CatalogSpec(300, cycle_density=0.2, seed=7))
+    load_data.load_and_insert_data(directory, tmp_path / "catalog.db", mode="full")
+    return directory
+
+def edit_dependencies(directory: Path, edit) -> None:
+    deps = pd.read_csv(directory / "dependencies.csv")
+    edit(deps)
+    deps.to_csv(directory / "dependencies.csv", index=False)
+
+def dependency_rows(db_path: Path) -> list:
+    con = sqlite3.connect(db_path)
+    try:
+        return con.execute(f"SELECT {', '.join(load_data.DEPENDENCY_COLUMNS)} FROM dependencies "
+                           "ORDER BY dependency_id;").fetchall()
+    finally:
+        con.close()
+
+def assert_sync_matches_full(directory: Path, db_path: Path, tmp_path: Path) -> dict:
+    result = load_data.load_and_insert_data(directory, db_path, mode="sync")
+    full_db = tmp_path / "full" / "catalog.db"
+    full_db.parent.mkdir()
+    load_data.load_and_insert_data(directory, full_db, mode="full")
+    assert dependency_rows(db_path) == dependency_rows(full_db)
+    return result
+
+#===============================================[TESTS]===============================================
+def test_sync_swapped_dependency_triples(catalog: Path, tmp_path: Path):
+    # dep 0 y dep 1 intercambian (from_asset, to_asset, dependency_type): el primer UPDATE en sitio
+    # chocaría con UNIQUE(from_asset, to_asset, dependency_type) de la fila aún sin actualizar
+    def swap(deps):
+        deps.loc[[0, 1], DEPENDENCY_TRIPLE] = deps.loc[[1, 0], DEPENDENCY_TRIPLE].to_numpy()
+
+    edit_dependencies(catalog, swap)
+    result = assert_sync_matches_full(catalog, tmp_path / "catalog.db", tmp_path)
+    assert result["deps_updated"] == 2
+
+def test_sync_renamed_dependency_id(catalog: Path, tmp_path: Path):
+    # Misma terna con otro dependency_id: la fila antigua se borra antes de insertar la nueva
+    def rename(deps):
+        deps.loc[0, "dependency_id"] = "dep_renamed"
+
+    edit_dependencies(catalog, rename)
+    result = assert_sync_matches_full(catalog, tmp_path / "catalog.db", tmp_path)
+    assert (result["deps_inserted"], result["deps_deleted"]) == (1, 1)